@@ -10,8 +10,18 @@ Routes are organized in separate blueprint modules in the routes package.
 """
 
 from flask import Flask
-from database import init_database, add_sample_data
+from storage import init_database, add_sample_data, schema_is_current
 from routes import register_blueprints
+from json_provider import FastJSONProvider
+from profiling import init_profiling, init_query_tracing
+from replicas import init_read_replicas
+from catalog_snapshot import init_catalog_snapshot
+from group_commit import init_group_commit
+from services.search_index import enable_search_index
+from services.book_cache import enable_book_cache
+from services.search_cache import MAX_BYTES, MAX_ENTRIES, enable_search_cache
+from services.single_flight import enable_single_flight
+from services.suggest_index import get_suggest_index
 
 
 def create_app():
@@ -24,15 +34,61 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
-    init_database()
+    # orjson-backed JSON responses when installed (LIBRARY_JSON_ENCODER overrides)
+    app.json = FastJSONProvider(app)
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    # Fast startup (LIBRARY_FAST_STARTUP=1) skips schema setup and seeding
+    # when the database already has the current schema
+    fast_startup = os.environ.get('LIBRARY_FAST_STARTUP', '').lower() in ('1', 'true', 'yes')
+    if not (fast_startup and schema_is_current()):
+        # Initialize the database
+        init_database()
+        
+        # Add sample data for testing and demonstration
+        add_sample_data()
+    
+    # Opt-in in-memory trigram index for title and author search
+    if os.environ.get('LIBRARY_SEARCH_INDEX', '').lower() in ('1', 'true', 'yes'):
+        enable_search_index()
+    
+    # Opt-in per-process cache of book reads, kept fresh across workers by invalidation.py
+    if os.environ.get('LIBRARY_BOOK_CACHE', '').lower() in ('1', 'true', 'yes'):
+        enable_book_cache()
+    
+    # Opt-in LRU cache of search results, keyed by the catalog version
+    if os.environ.get('LIBRARY_SEARCH_CACHE', '').lower() in ('1', 'true', 'yes'):
+        enable_search_cache(
+            max_entries=int(os.environ.get('LIBRARY_SEARCH_CACHE_ENTRIES', MAX_ENTRIES)),
+            max_bytes=int(float(os.environ.get('LIBRARY_SEARCH_CACHE_MB', MAX_BYTES / (1024 * 1024))) * 1024 * 1024))
+    
+    # Opt-in coalescing of identical concurrent service calls: 1 for every
+    # @coalesce function, or a comma-separated list of their names
+    single_flight = os.environ.get('LIBRARY_SINGLE_FLIGHT', '').strip()
+    if single_flight.lower() in ('1', 'true', 'yes'):
+        enable_single_flight()
+    elif single_flight and single_flight.lower() not in ('0', 'false', 'no'):
+        enable_single_flight(name.strip() for name in single_flight.split(',') if name.strip())
+    
+    # Opt-in: build the autocomplete index now rather than in the first suggestion request
+    if os.environ.get('LIBRARY_SUGGEST_INDEX', '').lower() in ('1', 'true', 'yes'):
+        get_suggest_index()
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Serve read-only queries from snapshot replicas if LIBRARY_READ_REPLICAS is set
+    init_read_replicas(app)
+    
+    # Publish a memory-mapped catalog snapshot for every worker if LIBRARY_CATALOG_SNAPSHOT is set
+    init_catalog_snapshot(app)
+    
+    # Batch borrow and return commits if LIBRARY_GROUP_COMMIT is set
+    init_group_commit()
+    
+    # Opt-in request profiling and SQL tracing, configured through environment variables
+    init_profiling(app)
+    init_query_tracing(app)
+    
     return app
 
 
@@ -0,0 +1,44 @@
+"""
+Borrow Record Archiver - Move old returned loans out of the hot table
+
+borrow_records only grows, and every patron lookup and borrow count scans it.
+This job moves records returned more than --older-than-days ago into
+borrow_records_archive in small batches (see
+database.archive_returned_borrow_records). Active loans are never moved, and
+patron history still shows archived loans.
+
+Run it from cron or a scheduler while the app is serving:
+
+    python archive.py --older-than-days 365
+    python archive.py --database big_library.db --older-than-days 90 --batch-size 5000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import database
+
+DEFAULT_OLDER_THAN_DAYS = 365
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Archive returned borrow records.')
+    parser.add_argument('--database', default=database.DATABASE, help='SQLite file (default: %(default)s)')
+    parser.add_argument('--older-than-days', type=int, default=DEFAULT_OLDER_THAN_DAYS,
+                        help='Archive records returned more than this many days ago')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Records moved per transaction')
+    args = parser.parse_args(argv)
+
+    database.DATABASE = args.database
+    # Creates the archive table on databases from before it existed
+    database.init_database()
+    cutoff = datetime.now() - timedelta(days=args.older_than_days)
+    started = time.perf_counter()
+    archived = database.archive_returned_borrow_records(cutoff, args.batch_size)
+    print(f"Archived {archived} borrow records returned before {cutoff.date()} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
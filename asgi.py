@@ -0,0 +1,256 @@
+"""
+ASGI entry point - async JSON API mounted alongside the Flask app
+
+The JSON endpoints of api_bp are served natively as coroutines on top of
+services/async_library_service.py, so a slow call waits on the database
+thread pool instead of holding a server worker thread. Every other path is
+handed to the regular Flask app through a small WSGI bridge.
+
+Serve it with any ASGI server, for example:
+
+    uvicorn asgi:app --workers 2
+
+Async endpoints:
+    GET /api/late_fee/<patron_id>/<book_id>
+    GET /api/search?q=<term>&type=<title|author|isbn>
+    GET /api/availability/stream (Server-Sent Events, streamed without holding a thread)
+"""
+
+import asyncio
+import io
+import re
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app import create_app
+from json_provider import dumps as json_dumps
+from services import availability_feed
+from services.async_library_service import (
+    calculate_late_fee_for_book_async, search_books_in_catalog_async, run_in_db_thread
+)
+
+LATE_FEE_PATH = re.compile(r'^/api/late_fee/(?P<patron_id>[^/]+)/(?P<book_id>\d+)$')
+AVAILABILITY_STREAM_PATH = '/api/availability/stream'
+
+
+async def late_fee_endpoint(patron_id: str, book_id: str) -> Tuple[int, Dict]:
+    """Async counterpart of api_routes.get_late_fee."""
+    result = await calculate_late_fee_for_book_async(patron_id, int(book_id))
+    if result is None:
+        return 400, {'error': 'Invalid patron ID or book not found.'}
+    return (501 if 'not implemented' in result.get('status', '') else 200), result
+
+
+async def search_endpoint(query: Dict) -> Tuple[int, Dict]:
+    """Async counterpart of api_routes.search_books_api."""
+    search_term = query.get('q', [''])[0].strip()
+    search_type = query.get('type', ['title'])[0]
+
+    if not search_term:
+        return 400, {'error': 'Search term is required'}
+
+    books = await search_books_in_catalog_async(search_term, search_type)
+    return 200, {
+        'search_term': search_term,
+        'search_type': search_type,
+        'results': books,
+        'count': len(books)
+    }
+
+
+async def dispatch_api(path: str, query: Dict) -> Optional[Tuple[int, Dict]]:
+    """Run the async endpoint for path, or return None if there isn't one."""
+    if path == '/api/search':
+        return await search_endpoint(query)
+    match = LATE_FEE_PATH.match(path)
+    if match:
+        return await late_fee_endpoint(match['patron_id'], match['book_id'])
+    return None
+
+
+async def send_json(send, status: int, payload: Dict):
+    body = json_dumps(payload)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('latin-1'))],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def availability_stream_endpoint(scope, receive, send, query: Dict):
+    """Async counterpart of api_routes.availability_stream; ends early when the client disconnects."""
+    latest = await run_in_db_thread(availability_feed.current_cursor)
+    if latest is None:
+        return await send_json(send, 404, {'error': 'Live availability needs the sqlite storage backend'})
+    headers = dict(scope.get('headers', []))
+    cursor = headers.get(b'last-event-id', b'').decode('latin-1') or query.get('after', [''])[0]
+    try:
+        cursor = int(cursor) if cursor else latest
+    except ValueError:
+        return await send_json(send, 400, {'error': 'Invalid event ID'})
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')],
+    })
+
+    async def send_text(text: str):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    feed = availability_feed.get_feed()
+    await send_text(f"retry: {availability_feed.RETRY_MS}\n\n")
+    deadline = time.monotonic() + availability_feed.MAX_STREAM_SECONDS
+    last_sent = time.monotonic()
+    message = asyncio.ensure_future(receive())
+    try:
+        while time.monotonic() < deadline:
+            events = await run_in_db_thread(feed.events_after, cursor)
+            if events is None:
+                await send_text(availability_feed.RESET_EVENT)
+                break
+            if events:
+                await send_text(''.join(availability_feed.format_event(change_id, book)
+                                        for change_id, book in events))
+                cursor = events[-1][0]
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= availability_feed.HEARTBEAT_SECONDS:
+                await send_text(availability_feed.HEARTBEAT)
+                last_sent = time.monotonic()
+            # Sleep until the feed's next poll, waking early if the client goes away
+            done, _ = await asyncio.wait({message}, timeout=feed.poll_interval)
+            if done:
+                if message.result()['type'] == 'http.disconnect':
+                    return
+                message = asyncio.ensure_future(receive())
+    finally:
+        message.cancel()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+class WSGIBridge:
+    """
+    Serve a WSGI app from ASGI by running it on the database thread pool.
+
+    Bodies are fully buffered in both directions, which suits the HTML pages
+    of this app; use a dedicated server for streaming responses.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def _environ(self, scope, body: bytes) -> Dict:
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'],
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            # The catalog page can open an availability stream: this server holds it without a thread
+            availability_feed.STREAM_ENVIRON_KEY: True,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f'HTTP_{name}'
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _call(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        chunks = self.wsgi_app(environ, start_response)
+        try:
+            body = b''.join(chunks)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        return response['status'], response['headers'], body
+
+    async def __call__(self, scope, receive, send):
+        body = await _read_body(receive)
+        status, headers, body = await run_in_db_thread(self._call, self._environ(scope, body))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+class LibraryASGIApp:
+    """ASGI app: async JSON endpoints first, the Flask app for everything else."""
+
+    def __init__(self, flask_app=None):
+        self.flask_app = flask_app or create_app()
+        self.fallback = WSGIBridge(self.flask_app.wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        if scope['method'] == 'GET' and scope['path'].startswith('/api/'):
+            query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            if scope['path'] == AVAILABILITY_STREAM_PATH:
+                return await availability_stream_endpoint(scope, receive, send, query)
+            result = await dispatch_api(scope['path'], query)
+            if result is not None:
+                await send_json(send, *result)
+                return
+
+        await self.fallback(scope, receive, send)
+
+
+def create_asgi_app(flask_app=None) -> LibraryASGIApp:
+    """Create the ASGI app, wrapping flask_app or a new app from create_app()."""
+    return LibraryASGIApp(flask_app)
+
+
+def __getattr__(name):
+    # Build the app when a server first looks up `asgi:app`, not on import
+    if name == 'app':
+        global app
+        app = create_asgi_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
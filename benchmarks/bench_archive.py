@@ -0,0 +1,107 @@
+"""
+Archiving benchmark: hot-path latency before and after archiving
+
+Seeds a database, times the patron lookups that scan borrow_records, moves
+returned loans older than --older-than-days into the archive and times the
+same calls again:
+
+    python benchmarks/bench_archive.py --scale 100k --older-than-days 365 --output archive.json
+
+Results are grouped as "<scale>/before" and "<scale>/after"; pass a previous
+output file as --compare to check for regressions.
+"""
+
+import argparse
+import itertools
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from services.library_service import calculate_late_fee_for_book, get_patron_status_report
+
+
+def _table_size(path: str, table: str) -> int:
+    conn = sqlite3.connect(path)
+    count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    return count
+
+
+def time_hot_path(active, patrons, repeat: int) -> dict:
+    """Time the lookups that run on every borrow, return and fee check."""
+    fee_args = itertools.cycle(active)
+    count_args = itertools.cycle(active)
+    patron_args = itertools.cycle(patrons)
+    benchmarks = {
+        'get_patron_borrow_count': lambda: database.get_patron_borrow_count(next(count_args)[0]),
+        'get_active_borrow_record': lambda: database.get_active_borrow_record(*next(count_args)),
+        'get_patron_borrow_records[hot]': lambda: database.get_patron_borrow_records(
+            next(patron_args), include_archived=False),
+        'get_patron_borrow_records[all]': lambda: database.get_patron_borrow_records(next(patron_args)),
+        'get_patron_borrow_records[limit=10]': lambda: database.get_patron_borrow_records(
+            next(patron_args), limit=10),
+        'calculate_late_fee_for_book': lambda: calculate_late_fee_for_book(*next(fee_args)),
+        'get_patron_status_report': lambda: get_patron_status_report(next(patron_args)),
+    }
+    return {name: time_call(fn, repeat=repeat, max_seconds=10.0) for name, fn in benchmarks.items()}
+
+
+def run_scale(scale: str, repeat: int, seed: int, older_than_days: int) -> dict:
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['loans']} loans", file=sys.stderr)
+
+        conn = sqlite3.connect(path)
+        rng = random.Random(seed)
+        active = rng.sample(conn.execute('SELECT patron_id, book_id FROM borrow_records '
+                                         'WHERE return_date IS NULL').fetchall(), repeat)
+        patrons = [patron for (patron,) in rng.sample(
+            conn.execute('SELECT DISTINCT patron_id FROM borrow_records').fetchall(), repeat)]
+        conn.close()
+
+        results = {f'{scale}/before': time_hot_path(active, patrons, repeat)}
+
+        started = time.perf_counter()
+        archived = database.archive_returned_borrow_records(datetime.now() - timedelta(days=older_than_days))
+        print(f"[{scale}] archived {archived} records in {time.perf_counter() - started:.1f}s; "
+              f"{_table_size(path, 'borrow_records')} left in borrow_records", file=sys.stderr)
+
+        results[f'{scale}/after'] = time_hot_path(active, patrons, repeat)
+        for name, before in results[f'{scale}/before'].items():
+            after = results[f'{scale}/after'][name]
+            print(f"[{scale}] {name}: {before['median_ms']:.3f}ms -> {after['median_ms']:.3f}ms",
+                  file=sys.stderr)
+        return results
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark patron lookups before and after archiving.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--older-than-days', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': result_metadata(benchmark='archive', scale=args.scale, repeat=args.repeat,
+                                seed=args.seed, older_than_days=args.older_than_days),
+        'results': run_scale(args.scale, args.repeat, args.seed, args.older_than_days),
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Live availability benchmark: catalog reloads versus Server-Sent Events and short polling
+
+Seeds a database and compares what a borrow costs the other people looking
+at the catalog: re-rendering /catalog for each of them (how they used to see
+the change), one availability feed poll plus an event for each open stream
+(services/availability_feed.py), or one GET /api/availability/changes for
+each of them (the page's fallback under a threaded WSGI server):
+
+    python benchmarks/bench_availability.py --scale 100k --viewers 50 --output availability.json
+
+Timings are grouped as "<scale>/reload", "<scale>/sse" and "<scale>/poll";
+the response and event sizes go into the metadata.
+"""
+
+import argparse
+import sys
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from app import create_app
+from services import availability_feed
+from services.availability_feed import AvailabilityFeed, format_event
+
+
+def run_scale(scale: str, viewers: int, repeat: int, seed: int):
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        client = create_app().test_client()
+        feed = AvailabilityFeed(poll_interval=3600)
+        cursor = database.get_last_change_id()
+        feed.events_after(cursor)
+        sizes = {}
+
+        def reload_catalog():
+            for _ in range(viewers):
+                sizes['reload_bytes'] = len(client.get('/catalog').get_data())
+
+        change = 1
+
+        def push_event():
+            nonlocal cursor, change
+            # Alternate borrow and return so availability stays in range
+            change = -change
+            database.update_book_availability(1, change)
+            feed.poll()
+            for _ in range(viewers):
+                events = feed.events_after(cursor)
+                message = ''.join(format_event(change_id, book) for change_id, book in events)
+            sizes['event_bytes'] = len(message.encode())
+            cursor = events[-1][0]
+
+        poll_cursor = cursor
+        # The feed behind /api/availability/changes, polled by hand like the one above
+        availability_feed._feed = poll_feed = AvailabilityFeed(poll_interval=3600)
+        poll_feed.events_after(poll_cursor)
+
+        def poll_changes():
+            nonlocal poll_cursor, change
+            change = -change
+            database.update_book_availability(1, change)
+            poll_feed.poll()
+            for _ in range(viewers):
+                response = client.get(f'/api/availability/changes?after={poll_cursor}')
+            sizes['poll_bytes'] = len(response.get_data())
+            poll_cursor = response.get_json()['cursor']
+
+        results = {
+            f'{scale}/reload': {f'catalog_x{viewers}': time_call(reload_catalog, repeat=repeat)},
+            f'{scale}/sse': {f'event_x{viewers}': time_call(push_event, repeat=repeat)},
+            f'{scale}/poll': {f'changes_x{viewers}': time_call(poll_changes, repeat=repeat)},
+        }
+        feed.stop()
+        poll_feed.stop()
+        availability_feed._feed = None
+        for group, timings in results.items():
+            for name, stats in timings.items():
+                print(f"[{group}] {name}: median {stats['median_ms']:.2f}ms", file=sys.stderr)
+        print(f"[{scale}] {sizes['reload_bytes']} bytes per reload, {sizes['event_bytes']} per event, "
+              f"{sizes['poll_bytes']} per poll", file=sys.stderr)
+        return results, sizes
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark catalog reloads against live availability events.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    parser.add_argument('--viewers', type=int, default=50, help='People looking at the catalog')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, sizes = run_scale(args.scale, args.viewers, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='availability', scale=args.scale, viewers=args.viewers,
+                                repeat=args.repeat, seed=args.seed, sizes=sizes),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Book cache benchmark: cached reads and how fast another worker's write reaches them
+
+Seeds a database and times the catalog listing and book lookups with and
+without services/book_cache.py, then forks writer processes that change a
+book's availability and measures how long this process keeps serving the
+old value:
+
+    python benchmarks/bench_book_cache.py --scale 100k --output book_cache.json
+
+Timings are grouped as "<scale>/uncached" and "<scale>/cached"; the
+staleness window (median and max ms over --writes writes) goes into the
+metadata.
+"""
+
+import argparse
+import multiprocessing
+import statistics
+import sys
+import time
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from invalidation import get_bus, reset_bus
+from services.book_cache import disable_book_cache, enable_book_cache
+from services.library_service import calculate_late_fee_for_book, get_catalog_books
+
+
+def _toggle_availability(path: str, book_id: int, change: int):
+    database.DATABASE = path
+    database.update_book_availability(book_id, change)
+
+
+def _lookups(n_books: int, count: int = 200):
+    book_ids = [1 + (i * 7919) % n_books for i in range(count)]
+    return lambda: [calculate_late_fee_for_book('100000', book_id) for book_id in book_ids]
+
+
+def measure_staleness(path: str, cache, writes: int) -> dict:
+    """Fork a writer `writes` times and time how long cache.get_book() keeps the old value."""
+    context = multiprocessing.get_context('fork')
+    windows = []
+    for write in range(writes):
+        change = -1 if write % 2 == 0 else 1
+        before = cache.get_book(1)['available_copies']
+        writer = context.Process(target=_toggle_availability, args=(path, 1, change))
+        writer.start()
+        writer.join()
+        committed = time.perf_counter()
+        while cache.get_book(1)['available_copies'] == before:
+            time.sleep(0.001)
+        windows.append((time.perf_counter() - committed) * 1000)
+    return {
+        'writes': writes,
+        'median_ms': round(statistics.median(windows), 2),
+        'max_ms': round(max(windows), 2),
+    }
+
+
+def run_scale(scale: str, repeat: int, writes: int, seed: int):
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        calls = {
+            'get_catalog_books': get_catalog_books,
+            'late_fee_x200': _lookups(counts['books']),
+        }
+
+        results = {f'{scale}/uncached': {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}}
+        reset_bus()
+        cache = enable_book_cache()
+        try:
+            results[f'{scale}/cached'] = {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}
+            staleness = measure_staleness(path, cache, writes)
+            staleness['poll_interval_s'] = get_bus().poll_interval
+            staleness['polls'] = get_bus().polls
+        finally:
+            disable_book_cache()
+            reset_bus()
+
+        for group, timings in results.items():
+            for name, stats in timings.items():
+                print(f"[{group}] {name}: median {stats['median_ms']:.3f}ms", file=sys.stderr)
+        print(f"[{scale}] another process's write reached the cache in {staleness['median_ms']}ms "
+              f"(max {staleness['max_ms']}ms)", file=sys.stderr)
+        return results, staleness
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark cached book reads and cross-process invalidation.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--writes', type=int, default=20, help='Cross-process writes to time')
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, staleness = run_scale(args.scale, args.repeat, args.writes, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='book_cache', scale=args.scale, repeat=args.repeat,
+                                seed=args.seed, staleness=staleness),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Contention benchmark: concurrent borrows of one hot title
+
+Seeds a database in WAL mode, then has --threads desks borrow and return a
+single book with --copies copies as fast as they can, and checks that the
+book is never oversold:
+
+    python benchmarks/bench_contention.py --threads 16 --copies 3 --output contention.json
+
+"naive" takes a copy the way borrowing used to (read available_copies, then
+update_book_availability(-1)); "conditional" uses
+decrement_book_availability(). Each reports borrow+return pairs per second
+and how often available_copies was seen outside [0, copies].
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, write_results)
+import database
+
+HOT_ISBN = '9990000000001'
+
+
+def _take_naive(book_id: int) -> bool:
+    book = database.get_book_by_id(book_id)
+    if book['available_copies'] <= 0:
+        return False
+    return database.update_book_availability(book_id, -1)
+
+
+def _take_conditional(book_id: int) -> bool:
+    return database.decrement_book_availability(book_id)
+
+
+def run_mode(take, book_id: int, copies: int, threads: int, seconds: float) -> dict:
+    """Borrow and return the hot title from `threads` threads for `seconds`."""
+    database.update_book_availability(book_id, copies - database.get_book_by_id(book_id)['available_copies'])
+    latencies = [[] for _ in range(threads)]
+    violations = []
+    start = threading.Barrier(threads)
+
+    def desk(index: int):
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            attempt_started = time.perf_counter()
+            if take(book_id):
+                available = database.get_book_by_id(book_id)['available_copies']
+                if not 0 <= available <= copies:
+                    violations.append(available)
+                database.update_book_availability(book_id, 1)
+                latencies[index].append((time.perf_counter() - attempt_started) * 1000)
+
+    workers = [threading.Thread(target=desk, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    final = database.get_book_by_id(book_id)['available_copies']
+    timings = [ms for desk_timings in latencies for ms in desk_timings]
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 4) if timings else None,
+        'pairs_per_sec': round(len(timings) / elapsed, 1),
+        'oversold': sum(1 for available in violations if available < 0),
+        'min_available': min(violations, default=0),
+        'final_available': final,
+    }
+
+
+def run_scale(scale: str, threads: int, copies: int, seconds: float, seed: int) -> dict:
+    path = temp_database()
+    try:
+        seed_database(path, scale, seed)
+        database.enable_wal_mode()
+        database.insert_book('Hot Title', 'Popular Author', HOT_ISBN, copies, copies)
+        book_id = database.get_book_by_isbn(HOT_ISBN)['id']
+
+        results = {}
+        for mode, take in (('naive', _take_naive), ('conditional', _take_conditional)):
+            stats = run_mode(take, book_id, copies, threads, seconds)
+            results[f'{scale}/{mode}'] = {'hot_title': stats}
+            print(f"[{scale}/{mode}] {stats['pairs_per_sec']:.0f} borrow+return/s, "
+                  f"oversold {stats['oversold']} times (min available {stats['min_available']})",
+                  file=sys.stderr)
+        return results
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark concurrent borrows of a single hot title.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--copies', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=3.0, help='Run time per mode')
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': result_metadata(benchmark='contention', scale=args.scale, threads=args.threads,
+                                copies=args.copies, seconds=args.seconds, seed=args.seed),
+        'results': run_scale(args.scale, args.threads, args.copies, args.seconds, args.seed),
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Group commit benchmark: circulation writes/sec with and without batching
+
+Seeds a database in WAL mode (as wsgi.py runs it) and has --threads desk
+threads borrow and return books as fast as they can, first committing every
+write on its own and then through group_commit.GroupCommitWriter. A borrow
+takes a copy and records the loan; a return records the return date and gives
+the copy back, so each one is two writes:
+
+    python benchmarks/bench_group_commit.py --threads 16 --loans 200 --output group_commit.json
+
+Each mode reports borrow and return latency and ops_per_sec under
+"<scale>/<mode>".
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, write_results)
+import database
+from group_commit import disable_group_commit, enable_group_commit
+
+
+def summarize(timings: list, elapsed: float) -> dict:
+    timings = sorted(seconds * 1000 for seconds in timings)
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 4),
+        'p99_ms': round(timings[int(len(timings) * 0.99)], 4),
+        'ops_per_sec': round(len(timings) / elapsed, 1),
+    }
+
+
+def run_desks(threads: int, loans: int, n_books: int, first_patron: int) -> dict:
+    """Each thread borrows and returns `loans` books as one patron; returns borrow and return stats."""
+    borrows = [[] for _ in range(threads)]
+    returns = [[] for _ in range(threads)]
+    failures = []
+
+    def desk(index: int):
+        patron_id = str(first_patron + index)
+        for loan in range(loans):
+            book_id = 1 + (index * loans + loan) % n_books
+            now = datetime.now()
+            # A borrow takes a copy and records the loan, as borrow_book_by_patron does
+            started = time.perf_counter()
+            ok = (database.decrement_book_availability(book_id)
+                  and database.insert_borrow_record(patron_id, book_id, now, now + timedelta(days=14)))
+            borrows[index].append(time.perf_counter() - started)
+            record = database.get_active_borrow_record(patron_id, book_id)
+            if not ok or record is None:
+                failures.append((patron_id, book_id))
+                continue
+            # A return records the return date and gives the copy back
+            started = time.perf_counter()
+            database.update_borrow_record_return_date(record['id'], datetime.now())
+            database.update_book_availability(book_id, 1)
+            returns[index].append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=desk, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'borrow': summarize([seconds for timings in borrows for seconds in timings], elapsed),
+        'return': summarize([seconds for timings in returns for seconds in timings], elapsed),
+        'failures': len(failures),
+    }
+
+
+def run_scale(scale: str, threads: int, loans: int, max_batch_size: int, max_delay_ms: float, seed: int):
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        database.enable_wal_mode()
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+
+        results = {}
+        # Patron IDs above the generated ones, so desks never hold a book twice
+        first_patron = 900000 - 2 * threads
+        results[f'{scale}/off'] = run_desks(threads, loans, counts['books'], first_patron)
+        writer = enable_group_commit(max_batch_size, max_delay_ms)
+        try:
+            results[f'{scale}/group_commit'] = run_desks(threads, loans, counts['books'], first_patron + threads)
+        finally:
+            disable_group_commit()
+
+        for group, desks in results.items():
+            for operation in ('borrow', 'return'):
+                stats = desks[operation]
+                print(f"[{group}] {stats['runs']} {operation}s: {stats['ops_per_sec']:.0f}/s, "
+                      f"median {stats['median_ms']:.2f}ms, p99 {stats['p99_ms']:.2f}ms", file=sys.stderr)
+            if desks['failures']:
+                print(f"[{group}] {desks['failures']} borrows found no copy", file=sys.stderr)
+        print(f"[{scale}] group commit: {writer.writes} writes in {writer.batches} transactions",
+              file=sys.stderr)
+        return {group: {operation: desks[operation] for operation in ('borrow', 'return')}
+                for group, desks in results.items()}, {
+            'writes': writer.writes, 'batches': writer.batches}
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark circulation writes with and without group commit.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+    parser.add_argument('--threads', type=int, default=16, help='Concurrent desk threads')
+    parser.add_argument('--loans', type=int, default=100, help='Borrow/return pairs per thread')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, batches = run_scale(args.scale, args.threads, args.loans, args.max_batch_size,
+                                 args.max_delay_ms, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='group_commit', scale=args.scale, threads=args.threads,
+                                loans=args.loans, max_batch_size=args.max_batch_size,
+                                max_delay_ms=args.max_delay_ms, seed=args.seed, group_commit=batches),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+JSON benchmark: encoding large /api/search responses
+
+Seeds a database, loads --results books as row models and times building the
+/api/search response for them with Flask's default provider and with
+json_provider.FastJSONProvider (each available encoder, buffered and
+streamed):
+
+    python benchmarks/bench_json.py --results 10000 --output json.json
+
+Peak memory of each response (measured with tracemalloc) goes into the
+metadata; timings are grouped as "<results>".
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from common import (remove_database, report_comparison, result_metadata, seed_database,
+                    temp_database, time_call, write_results)
+import database
+from json_provider import ENCODERS, FastJSONProvider
+
+
+def _peak_kib(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def _responders(app, books):
+    fields = {'search_term': 'the', 'search_type': 'title', 'count': len(books)}
+    payload = dict(fields, results=books)
+    default = DefaultJSONProvider(app)
+    responders = {'flask_default': lambda: default.response(payload).get_data()}
+    for name in sorted(ENCODERS):
+        provider = FastJSONProvider(app, name)
+        responders[f'fast[{name}]'] = lambda provider=provider: provider.response(payload).get_data()
+        # Consume the chunks one at a time, as a server writing them to the socket would
+        responders[f'fast[{name}]/streamed'] = lambda provider=provider: sum(
+            len(chunk) for chunk in provider.stream_response(fields, 'results', books).response)
+    return responders
+
+
+def run(n_results: int, repeat: int, seed: int):
+    """Time and measure each responder; returns (timings by group, peak KiB by responder)."""
+    path = temp_database()
+    try:
+        seed_database(path, '100k' if n_results > 1000 else '1k', seed)
+        books = database.get_books_after(0, n_results)
+        print(f"encoding {len(books)} books", file=sys.stderr)
+
+        app = Flask(__name__)
+        with app.app_context():
+            responders = _responders(app, books)
+            memory = {name: _peak_kib(fn) for name, fn in responders.items()}
+            timings = {name: time_call(fn, repeat=repeat) for name, fn in responders.items()}
+        for name, timing in timings.items():
+            print(f"{name}: median {timing['median_ms']:.2f}ms, peak {memory[name]} KiB", file=sys.stderr)
+        return {str(len(books)): timings}, memory
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark JSON encoding of large search responses.')
+    parser.add_argument('--results', type=int, default=10_000, help='Books in the response')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, memory = run(args.results, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='json', results=args.results, repeat=args.repeat,
+                                seed=args.seed, encoders=sorted(ENCODERS), peak_kib=memory),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
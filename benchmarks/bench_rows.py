@@ -0,0 +1,102 @@
+"""
+Row model benchmark: memory and time of catalog listings
+
+Seeds a database and compares building every book row as a dict (how the
+readers worked before models.py) with the slotted row models the readers
+return now, then times the real listing calls:
+
+    python benchmarks/bench_rows.py --scale 100k --output rows.json
+
+Peak memory of each listing (measured with tracemalloc) goes into the
+metadata; timings are grouped as "<scale>/rows" and "<scale>/listing".
+"""
+
+import argparse
+import sqlite3
+import sys
+import tracemalloc
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from models import BOOK_COLUMNS, Book
+from services.library_service import get_catalog_books
+
+
+def _dict_rows(path: str):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(row) for row in conn.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title')]
+    conn.close()
+    return rows
+
+
+def _model_rows(path: str):
+    conn = sqlite3.connect(path)
+    conn.row_factory = Book.row_factory
+    rows = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title').fetchall()
+    conn.close()
+    return rows
+
+
+def _peak_mib(fn) -> float:
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return round(peak / (1024 * 1024), 2)
+
+
+def run_scale(scale: str, repeat: int, seed: int):
+    """Time and measure listings at one scale; returns (timings by group, peak MiB by listing)."""
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+
+        listings = {
+            'dict_rows': lambda: _dict_rows(path),
+            'model_rows': lambda: _model_rows(path),
+            'get_all_books': database.get_all_books,
+            'get_catalog_books': get_catalog_books,
+        }
+        memory = {name: _peak_mib(fn) for name, fn in listings.items()}
+        results = {
+            f'{scale}/rows': {name: time_call(listings[name], repeat=repeat)
+                              for name in ('dict_rows', 'model_rows')},
+            f'{scale}/listing': {name: time_call(listings[name], repeat=repeat)
+                                 for name in ('get_all_books', 'get_catalog_books')},
+        }
+        for name, peak in memory.items():
+            print(f"[{scale}] {name}: peak {peak} MiB", file=sys.stderr)
+        return results, memory
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark memory and time of book row listings.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, memory = run_scale(args.scale, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='rows', scale=args.scale, repeat=args.repeat,
+                                seed=args.seed, peak_mib=memory),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
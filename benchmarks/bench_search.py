@@ -0,0 +1,95 @@
+"""
+Search benchmark: trigram index vs linear scan
+
+Seeds a database, builds the in-memory trigram index (services/search_index.py)
+and times search_books_in_catalog for a set of title and author queries, with
+and without the index. Also reports index build time and posting list memory:
+
+    python benchmarks/bench_search.py --scale 1m --output search.json
+
+Queries range from selective (a rare author/title combination) to broad (a
+word in a large share of the synthetic titles), since the indexed path costs
+roughly one row fetch per match.
+"""
+
+import argparse
+import sys
+import time
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+from services.library_service import search_books_in_catalog
+from services.search_index import disable_search_index, enable_search_index
+
+QUERIES = [
+    ('title', 'orchard of'),
+    ('title', 'harbor'),
+    ('title', 'software testing'),
+    ('title', 'forgotten kingdom'),
+    ('title', 'the'),
+    ('author', 'tanaka'),
+    ('author', 'hana okafor'),
+]
+
+
+def time_queries(repeat: int, max_seconds: float) -> dict:
+    return {f'{search_type}:{term}': time_call(lambda: search_books_in_catalog(term, search_type),
+                                               repeat=repeat, max_seconds=max_seconds)
+            for search_type, term in QUERIES}
+
+
+def run_scale(scale: str, repeat: int, seed: int):
+    """Time the queries at one scale; returns (timings by group, index build stats)."""
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+
+        scan = time_queries(repeat, max_seconds=10.0)
+
+        started = time.perf_counter()
+        index = enable_search_index()
+        build_seconds = time.perf_counter() - started
+        try:
+            indexed = time_queries(repeat, max_seconds=10.0)
+            matches = {f'{search_type}:{term}': len(search_books_in_catalog(term, search_type))
+                       for search_type, term in QUERIES}
+        finally:
+            disable_search_index()
+
+        memory_mb = index.memory_bytes() / 1024 / 1024
+        print(f"[{scale}] index built in {build_seconds:.1f}s, {memory_mb:.1f} MiB of posting lists",
+              file=sys.stderr)
+        for name in scan:
+            print(f"[{scale}] {name} ({matches[name]} matches): scan {scan[name]['median_ms']:.2f}ms, "
+                  f"index {indexed[name]['median_ms']:.2f}ms", file=sys.stderr)
+        build = {'build_seconds': round(build_seconds, 3), 'memory_mb': round(memory_mb, 1),
+                 'trigrams': {field: len(postings) for field, postings in index.postings.items()}}
+        return {f'{scale}/scan': scan, f'{scale}/index': indexed}, build
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark catalog search with and without the trigram index.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, build = run_scale(args.scale, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='search', scale=args.scale, repeat=args.repeat, seed=args.seed,
+                                index=build),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
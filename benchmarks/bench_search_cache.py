@@ -0,0 +1,95 @@
+"""
+Search cache benchmark: repeated searches with and without the result cache
+
+Seeds a database and times search_books_in_catalog for a few popular terms,
+computed from SQLite every time and served from the search cache
+(services/search_cache.py). "after_borrow" borrows and returns a matching
+book before each search, so the cached match set is kept but its copy
+counts are re-read:
+
+    python benchmarks/bench_search_cache.py --scale 100k --output search_cache.json
+
+Timings are grouped as "<scale>/sqlite" and "<scale>/cache"; the cache's
+entry count and estimated size go into the metadata.
+"""
+
+import argparse
+import sys
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from invalidation import reset_bus
+from services.library_service import search_books_in_catalog
+from services.search_cache import disable_search_cache, enable_search_cache
+
+SEARCHES = [('the', 'title'), ('river', 'title'), ('ann', 'author'), ('978', 'isbn')]
+
+
+def _calls():
+    calls = {f'{search_type}:{term}': (lambda term=term, search_type=search_type:
+                                       search_books_in_catalog(term, search_type))
+             for term, search_type in SEARCHES}
+    book_id = search_books_in_catalog('river', 'title')[0]['id']
+
+    def after_borrow():
+        database.update_book_availability(book_id, -1)
+        database.update_book_availability(book_id, 1)
+        return search_books_in_catalog('river', 'title')
+
+    calls['after_borrow:river'] = after_borrow
+    return calls
+
+
+def run_scale(scale: str, repeat: int, seed: int):
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        reset_bus()
+        calls = _calls()
+
+        results = {f'{scale}/sqlite': {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}}
+        cache = enable_search_cache()
+        try:
+            for fn in calls.values():
+                fn()
+            results[f'{scale}/cache'] = {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}
+        finally:
+            disable_search_cache()
+            reset_bus()
+
+        for group, timings in results.items():
+            for name, stats in timings.items():
+                print(f"[{group}] {name}: median {stats['median_ms']:.2f}ms", file=sys.stderr)
+        summary = {'entries': len(cache), 'estimated_mib': round(cache.size / (1024 * 1024), 2),
+                   'hits': cache.hits, 'misses': cache.misses, 'refreshed': cache.refreshed}
+        print(f"[{scale}] cache: {summary}", file=sys.stderr)
+        return results, summary
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark repeated searches against the search result cache.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, cache = run_scale(args.scale, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='search_cache', scale=args.scale, repeat=args.repeat,
+                                seed=args.seed, cache=cache),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
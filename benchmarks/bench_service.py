@@ -0,0 +1,114 @@
+"""
+Service layer benchmarks
+
+Seeds a throwaway database at each requested scale and times the business
+logic functions in services/library_service.py against it. Results are JSON
+so runs from different commits can be compared:
+
+    python benchmarks/bench_service.py --scales 1k 100k --output before.json
+    python benchmarks/bench_service.py --scales 1k 100k --compare before.json --threshold 0.2
+
+With --backend memory the seeded data is copied into the in-memory storage
+backend first, which separates time spent in SQLite from the Python logic.
+
+The compare step exits with status 1 if any benchmark's median got slower
+than the baseline by more than the threshold.
+"""
+
+import argparse
+import itertools
+import random
+import sqlite3
+import sys
+import time
+
+from common import (SCALES, load_memory_backend, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+from storage import SQLiteBackend, use_backend
+from services.library_service import (
+    add_book_to_catalog, get_catalog_books, borrow_book_by_patron, return_book_by_patron,
+    search_books_in_catalog, calculate_late_fee_for_book, get_patron_status_report)
+
+
+def _sample_rows(path, query, limit, seed):
+    conn = sqlite3.connect(path)
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    rng = random.Random(seed)
+    return rng.sample(rows, min(limit, len(rows)))
+
+
+def run_scale(scale: str, repeat: int, seed: int, backend: str = 'sqlite') -> dict:
+    """Seed a database at the given scale and time every service function on it."""
+    path = temp_database()
+    try:
+        started = time.perf_counter()
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books / {counts['loans']} loans in "
+              f"{time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        available = _sample_rows(path, 'SELECT id FROM books WHERE available_copies > 0', repeat, seed)
+        active = _sample_rows(path, 'SELECT patron_id, book_id FROM borrow_records '
+                                    'WHERE return_date IS NULL', repeat, seed)
+        patrons = _sample_rows(path, 'SELECT DISTINCT patron_id FROM borrow_records', repeat, seed)
+
+        isbns = (str(isbn) for isbn in itertools.count(9790000000000))
+        # Fresh patrons so the borrowing limit never kicks in
+        loans = [(str(800000 + i), book_id) for i, (book_id,) in enumerate(available)]
+        borrow_args = iter(loans)
+        return_args = iter(loans)
+        fee_args = itertools.cycle(active)
+        patron_args = itertools.cycle(patrons)
+
+        benchmarks = {
+            'add_book_to_catalog': lambda: add_book_to_catalog(
+                'Benchmark Book', 'Benchmark Author', next(isbns), 3),
+            'get_catalog_books': get_catalog_books,
+            'borrow_book_by_patron': lambda: borrow_book_by_patron(*next(borrow_args)),
+            'return_book_by_patron': lambda: return_book_by_patron(*next(return_args)),
+            'search_books_in_catalog[title]': lambda: search_books_in_catalog('river', 'title'),
+            'search_books_in_catalog[author]': lambda: search_books_in_catalog('lee', 'author'),
+            'calculate_late_fee_for_book': lambda: calculate_late_fee_for_book(*next(fee_args)),
+            'get_patron_status_report': lambda: get_patron_status_report(next(patron_args)[0]),
+        }
+
+        storage = load_memory_backend(path) if backend == 'memory' else SQLiteBackend()
+        results = {}
+        with use_backend(storage):
+            for name, fn in benchmarks.items():
+                # Borrow and return must be timed over the same set of loans
+                runs = len(loans) if name in ('borrow_book_by_patron', 'return_book_by_patron') else repeat
+                max_seconds = float('inf') if runs != repeat else 10.0
+                results[name] = time_call(fn, repeat=runs, max_seconds=max_seconds)
+                print(f"[{scale}] {name}: median {results[name]['median_ms']:.3f}ms "
+                      f"over {results[name]['runs']} runs", file=sys.stderr)
+        return results
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the library service layer.')
+    parser.add_argument('--scales', nargs='+', choices=sorted(SCALES), default=['1k'])
+    parser.add_argument('--repeat', type=int, default=20, help='Timed calls per function')
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--backend', choices=['sqlite', 'memory'], default='sqlite',
+                        help='Storage backend the service functions run against')
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Allowed slowdown before a benchmark counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': result_metadata(benchmark='service', repeat=args.repeat, seed=args.seed,
+                                backend=args.backend),
+        'results': {scale: run_scale(scale, args.repeat, args.seed, args.backend) for scale in args.scales},
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
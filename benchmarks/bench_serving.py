@@ -0,0 +1,107 @@
+"""
+Serving mode benchmark: Werkzeug dev server vs gunicorn
+
+Seeds a database, starts each server in turn against a copy of it and drives
+the same load test scenario over HTTP, then prints throughput and latency
+side by side.
+
+    python benchmarks/bench_serving.py --scenario benchmarks/scenarios/mixed.json \\
+        --workers 32 --duration 15 --output serving.json
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, result_metadata, seed_database, write_results
+from loadtest import HTTPTarget, load_scenario, print_report, run_load
+
+DEV_SERVER = ('from app import create_app; '
+              'create_app().run(debug=True, use_reloader=False, host="127.0.0.1", port={port})')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+def server_command(mode: str, port: int):
+    """Command line and extra environment for a serving mode."""
+    if mode == 'dev':
+        return [sys.executable, '-c', DEV_SERVER.format(port=port)], {}
+    return ([sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'wsgi:app'],
+            {'LIBRARY_BIND': f'127.0.0.1:{port}'})
+
+
+def bench_mode(mode: str, seeded_db: str, scenario, workers: int, duration: float) -> dict:
+    """Serve a fresh copy of seeded_db in `mode` and load test it."""
+    workdir = tempfile.mkdtemp()
+    shutil.copy(seeded_db, os.path.join(workdir, 'library.db'))
+    port = _free_port()
+    command, extra_env = server_command(mode, port)
+    env = dict(os.environ, PYTHONPATH=ROOT, **extra_env)
+    process = subprocess.Popen(command, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(port, process)
+        return run_load(HTTPTarget(f'http://127.0.0.1:{port}'), scenario, workers, duration)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the dev server with gunicorn under load.')
+    parser.add_argument('--scenario', default=os.path.join(ROOT, 'benchmarks', 'scenarios', 'mixed.json'))
+    parser.add_argument('--modes', nargs='+', choices=['dev', 'gunicorn'], default=['dev', 'gunicorn'])
+    parser.add_argument('--workers', type=int, help='Concurrent load test clients')
+    parser.add_argument('--duration', type=float, help='Seconds per serving mode')
+    parser.add_argument('--scale', help='Dataset scale (default: the scenario scale)')
+    parser.add_argument('--output', help='Write JSON results here')
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    workers = args.workers or scenario.get('workers', 8)
+    duration = args.duration or scenario.get('duration', 10)
+
+    seed_dir = tempfile.mkdtemp()
+    try:
+        seeded_db = os.path.join(seed_dir, 'library.db')
+        seed_database(seeded_db, args.scale or scenario.get('scale', '1k'))
+        results = {}
+        for mode in args.modes:
+            results[mode] = bench_mode(mode, seeded_db, scenario, workers, duration)
+            print_report(f"{scenario['name']} [{mode}]", results[mode])
+    finally:
+        shutil.rmtree(seed_dir, ignore_errors=True)
+
+    if args.output:
+        write_results({
+            'meta': result_metadata(benchmark='serving', scenario=scenario['name'],
+                                    workers=workers, duration=duration),
+            'results': results,
+        }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Single-flight benchmark: bursts of identical concurrent searches
+
+Seeds a database, then has --threads requests search for the same trending
+term at once, with and without coalescing (services/single_flight.py):
+
+    python benchmarks/bench_single_flight.py --scale 100k --threads 32 --output single_flight.json
+
+Each burst is timed until the last caller has its results. Timings are
+grouped as "<scale>/separate" and "<scale>/single_flight"; the executions
+and collapsed calls counted by the single-flight layer go into the metadata.
+"""
+
+import argparse
+import sys
+import threading
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+from services.library_service import get_patron_status_report, search_books_in_catalog
+from services.single_flight import disable_single_flight, enable_single_flight
+
+PATRON_ID = '100000'
+
+
+def burst(fn, threads: int):
+    """Call fn from `threads` threads released together, and wait for them all."""
+    start = threading.Barrier(threads)
+
+    def request():
+        start.wait()
+        fn()
+
+    workers = [threading.Thread(target=request) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def _bursts(threads: int):
+    return {
+        f'search_title_x{threads}': lambda: burst(lambda: search_books_in_catalog('the', 'title'), threads),
+        f'search_author_x{threads}': lambda: burst(lambda: search_books_in_catalog('ann', 'author'), threads),
+        f'patron_report_x{threads}': lambda: burst(lambda: get_patron_status_report(PATRON_ID), threads),
+    }
+
+
+def run_scale(scale: str, threads: int, repeat: int, seed: int):
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        bursts = _bursts(threads)
+
+        results = {f'{scale}/separate': {name: time_call(fn, repeat=repeat) for name, fn in bursts.items()}}
+        group = enable_single_flight()
+        try:
+            results[f'{scale}/single_flight'] = {name: time_call(fn, repeat=repeat) for name, fn in bursts.items()}
+        finally:
+            disable_single_flight()
+
+        for group_name, timings in results.items():
+            for name, stats in timings.items():
+                print(f"[{group_name}] {name}: median {stats['median_ms']:.2f}ms", file=sys.stderr)
+        stats = group.stats()
+        for name, counts in stats.items():
+            print(f"[{scale}] {name}: {counts['executions']} executions for {counts['calls']} calls",
+                  file=sys.stderr)
+        return results, stats
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark identical concurrent searches with single-flight.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--threads', type=int, default=32, help='Identical requests per burst')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, stats = run_scale(args.scale, args.threads, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='single_flight', scale=args.scale, threads=args.threads,
+                                repeat=args.repeat, seed=args.seed, single_flight=stats),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Catalog snapshot benchmark: catalog listing, search and book lookups from the shared snapshot
+
+Seeds a database, publishes a catalog snapshot (catalog_snapshot.py) and
+times the service calls reading SQLite and reading the snapshot.
+"after_borrow" changes a book's copy count before each search, which the
+snapshot serves through its availability overlay instead of falling back:
+
+    python benchmarks/bench_snapshot.py --scale 100k --output snapshot.json
+
+Timings are grouped as "<scale>/sqlite" and "<scale>/snapshot"; the time to
+publish a generation and the file size go into the metadata.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, time_call, write_results)
+import database
+from catalog_snapshot import SnapshotPublisher, disable_catalog_snapshot, enable_catalog_snapshot
+from invalidation import reset_bus
+from services.library_service import calculate_late_fee_for_book, get_catalog_books, search_books_in_catalog
+
+
+def _calls(n_books: int):
+    book_ids = [1 + (i * 7919) % n_books for i in range(200)]
+    change = 1
+
+    def after_borrow():
+        nonlocal change
+        # Alternate borrow and return so availability stays in range
+        change = -change
+        database.update_book_availability(book_ids[0], change)
+        return search_books_in_catalog('zephyr', 'title')
+
+    return {
+        'get_catalog_books': get_catalog_books,
+        'search_title_common': lambda: search_books_in_catalog('the', 'title'),
+        'search_title_rare': lambda: search_books_in_catalog('zephyr', 'title'),
+        'search_author': lambda: search_books_in_catalog('ann', 'author'),
+        'late_fee_x200': lambda: [calculate_late_fee_for_book('100000', book_id) for book_id in book_ids],
+        'after_borrow:search_title_rare': after_borrow,
+    }
+
+
+def run_scale(scale: str, repeat: int, seed: int):
+    path = temp_database()
+    snapshot_path = path + '.snapshot'
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        calls = _calls(counts['books'])
+
+        results = {f'{scale}/sqlite': {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}}
+
+        publisher = SnapshotPublisher(snapshot_path)
+        started = time.perf_counter()
+        publisher.publish_if_changed()
+        publish_ms = round((time.perf_counter() - started) * 1000, 1)
+        snapshot_mib = round(os.path.getsize(snapshot_path) / (1024 * 1024), 2)
+        reset_bus()
+        enable_catalog_snapshot(snapshot_path)
+        try:
+            results[f'{scale}/snapshot'] = {name: time_call(fn, repeat=repeat) for name, fn in calls.items()}
+        finally:
+            disable_catalog_snapshot()
+            reset_bus()
+
+        for group, timings in results.items():
+            for name, stats in timings.items():
+                print(f"[{group}] {name}: median {stats['median_ms']:.2f}ms", file=sys.stderr)
+        print(f"[{scale}] published {snapshot_mib} MiB in {publish_ms}ms", file=sys.stderr)
+        return results, {'publish_ms': publish_ms, 'file_mib': snapshot_mib}
+    finally:
+        remove_database(path)
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark service reads from the shared catalog snapshot.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, snapshot = run_scale(args.scale, args.repeat, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='snapshot', scale=args.scale, repeat=args.repeat,
+                                seed=args.seed, snapshot=snapshot),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Import-time and startup benchmark
+
+Every measurement runs in a fresh interpreter, so nothing is cached between
+runs:
+
+- import_app: wall time of `import app` (all blueprints and services)
+- create_app[full]: create_app() running schema setup and sample seeding
+- create_app[fast]: create_app() with LIBRARY_FAST_STARTUP=1 against a
+  database that already has the current schema
+
+It also lists the slowest imports from `python -X importtime`.
+
+    python benchmarks/bench_startup.py --repeat 10 --output startup.json
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, report_comparison, result_metadata, write_results
+
+IMPORT_APP = ('import sys, time; started = time.perf_counter(); import app; '
+              'print(time.perf_counter() - started)')
+CREATE_APP = ('import sys, time; started = time.perf_counter(); from app import create_app; '
+              'create_app(); print(time.perf_counter() - started)')
+
+
+def _run(code: str, cwd: str, env_extra=None) -> float:
+    env = dict(os.environ, PYTHONPATH=ROOT, **(env_extra or {}))
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=cwd, env=env, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def _timing(samples):
+    samples = [s * 1000 for s in samples]
+    return {
+        'runs': len(samples),
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+    }
+
+
+def slowest_imports(cwd: str, top: int = 15):
+    """(cumulative microseconds, module) for the slowest imports of `import app`."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time:  <self us> | <cumulative us> | <module>", after a header line
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us), module.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark import time and app startup.')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        results = {'import_app': _timing([_run(IMPORT_APP, workdir) for _ in range(args.repeat)])}
+
+        full = []
+        for _ in range(args.repeat):
+            db_path = os.path.join(workdir, 'library.db')
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            full.append(_run(CREATE_APP, workdir))
+        results['create_app[full]'] = _timing(full)
+        # The database left by the last full run has the current schema
+        results['create_app[fast]'] = _timing([_run(CREATE_APP, workdir, {'LIBRARY_FAST_STARTUP': '1'})
+                                               for _ in range(args.repeat)])
+
+        print('Slowest imports (cumulative):', file=sys.stderr)
+        for cumulative_us, module in slowest_imports(workdir):
+            print(f"  {cumulative_us / 1000:8.1f}ms  {module}", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name, timing in results.items():
+        print(f"{name}: median {timing['median_ms']:.1f}ms", file=sys.stderr)
+    output = {'meta': result_metadata(benchmark='startup', repeat=args.repeat),
+              'results': {'startup': results}}
+    write_results(output, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, output, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
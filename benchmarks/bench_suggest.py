@@ -0,0 +1,108 @@
+"""
+Typeahead benchmark: /api/suggest latency per keystroke
+
+Seeds a database, builds the suggest index (services/suggest_index.py) and
+replays typing sampled titles and authors one character at a time, timing
+each suggest_books() call:
+
+    python benchmarks/bench_suggest.py --scale 1m --output suggest.json
+
+"cold" is the first pass over the keystrokes (short prefixes compute their
+ranking once), "warm" replays the same keystrokes.
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import time
+
+from common import (SCALES, remove_database, report_comparison, result_metadata,
+                    seed_database, temp_database, write_results)
+from services.library_service import suggest_books
+from services.suggest_index import get_suggest_index, reset_suggest_index
+
+
+def _keystrokes(path: str, samples: int, seed: int):
+    conn = sqlite3.connect(path)
+    rows = conn.execute('SELECT title, author FROM books').fetchall()
+    conn.close()
+    rng = random.Random(seed)
+    keystrokes = []
+    for title, author in rng.sample(rows, min(samples, len(rows))):
+        keystrokes += [(title[:end], 'title') for end in range(1, len(title) + 1)]
+        keystrokes += [(author[:end], 'author') for end in range(1, len(author) + 1)]
+    return keystrokes
+
+
+def time_keystrokes(keystrokes) -> dict:
+    timings = []
+    for prefix, suggest_type in keystrokes:
+        started = time.perf_counter()
+        suggest_books(prefix, suggest_type)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'runs': len(timings),
+        'median_ms': round(statistics.median(timings), 4),
+        'p99_ms': round(timings[int(len(timings) * 0.99)], 4),
+        'max_ms': round(timings[-1], 4),
+    }
+
+
+def run_scale(scale: str, samples: int, seed: int):
+    """Time keystrokes at one scale; returns (timings by group, index build stats)."""
+    path = temp_database()
+    try:
+        counts = seed_database(path, scale, seed)
+        print(f"[{scale}] seeded {counts['books']} books", file=sys.stderr)
+        keystrokes = _keystrokes(path, samples, seed)
+
+        reset_suggest_index()
+        started = time.perf_counter()
+        index = get_suggest_index()
+        build_seconds = time.perf_counter() - started
+        # Replay without the periodic catch-up query, which is not part of the lookup
+        index._last_catch_up = float('inf')
+        try:
+            results = {f'{scale}/cold': {'suggest': time_keystrokes(keystrokes)},
+                       f'{scale}/warm': {'suggest': time_keystrokes(keystrokes)}}
+        finally:
+            reset_suggest_index()
+
+        distinct = {field: len(prefix_index.keys) for field, prefix_index in index.fields.items()}
+        print(f"[{scale}] index built in {build_seconds:.1f}s ({distinct['title']} distinct titles, "
+              f"{distinct['author']} authors)", file=sys.stderr)
+        for group, timings in results.items():
+            timing = timings['suggest']
+            print(f"[{group}] {timing['runs']} keystrokes: median {timing['median_ms']:.3f}ms, "
+                  f"p99 {timing['p99_ms']:.3f}ms, max {timing['max_ms']:.3f}ms", file=sys.stderr)
+        return results, {'build_seconds': round(build_seconds, 3), 'distinct': distinct}
+    finally:
+        remove_database(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark typeahead suggestions per keystroke.')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='100k')
+    parser.add_argument('--samples', type=int, default=200, help='Titles and authors to type out')
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    timings, build = run_scale(args.scale, args.samples, args.seed)
+    results = {
+        'meta': result_metadata(benchmark='suggest', scale=args.scale, samples=args.samples,
+                                seed=args.seed, index=build),
+        'results': timings,
+    }
+    write_results(results, args.output)
+    if args.compare:
+        sys.exit(report_comparison(args.compare, results, args.threshold))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark helpers shared by the scripts in this directory
+
+Handles import paths (so scripts run as `python benchmarks/<name>.py` from the
+repository root), seeding throwaway databases with datagen.py, timing calls
+and reading, writing and comparing JSON result files.
+"""
+
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'services'))
+
+import database  # noqa: E402
+from datagen import PRESETS, generate_library  # noqa: E402
+from storage import InMemoryBackend  # noqa: E402
+
+# Named dataset sizes: (books, patrons, borrow records)
+SCALES = PRESETS
+
+
+def temp_database() -> str:
+    """Point database.DATABASE at a fresh temporary file and return its path."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE = path
+    return path
+
+
+def remove_database(path: str):
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+
+def seed_database(path: str, scale: str, seed: int = 327) -> Dict:
+    """Fill path with the synthetic dataset for a named scale (see datagen.py)."""
+    n_books, n_patrons, n_loans = SCALES[scale]
+    return generate_library(path, n_books, n_patrons, n_loans, seed=seed)
+
+
+def load_memory_backend(path: str) -> InMemoryBackend:
+    """Copy a seeded SQLite database into a new InMemoryBackend, keeping its IDs."""
+    backend = InMemoryBackend()
+    backend.init_database()
+    conn = sqlite3.connect(path)
+    # IDs are assigned in insertion order, so insert in ID order from 1 without gaps
+    for title, author, isbn, total, available in conn.execute(
+            'SELECT title, author, isbn, total_copies, available_copies FROM books ORDER BY id'):
+        backend.insert_book(title, author, isbn, total, available)
+    records = conn.execute('SELECT id, patron_id, book_id, borrow_date, due_date, return_date '
+                           'FROM borrow_records ORDER BY id')
+    for record_id, patron_id, book_id, borrow_date, due_date, return_date in records:
+        backend.insert_borrow_record(patron_id, book_id, datetime.fromisoformat(borrow_date),
+                                     datetime.fromisoformat(due_date))
+        if return_date is not None:
+            backend.update_borrow_record_return_date(record_id, datetime.fromisoformat(return_date))
+    conn.close()
+    return backend
+
+
+def time_call(fn: Callable, repeat: int = 20, max_seconds: float = 5.0) -> Dict:
+    """
+    Time fn() up to `repeat` times, stopping early once max_seconds have been spent.
+
+    Returns:
+        Dict with runs, min_ms, median_ms and mean_ms
+    """
+    timings = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+        if time.perf_counter() > deadline:
+            break
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'mean_ms': round(statistics.mean(timings), 4),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_metadata(**extra) -> Dict:
+    meta = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+    meta.update(extra)
+    return meta
+
+
+def write_results(results: Dict, path: Optional[str]):
+    """Write results as JSON to path, or to stdout if path is None."""
+    text = json.dumps(results, indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = 0.15,
+                    metric: str = 'median_ms') -> List[Tuple[str, str, float, float, float]]:
+    """
+    Find benchmarks that got slower than baseline by more than threshold.
+
+    Both arguments are result files of the form {'results': {group: {name: timing}}}.
+
+    Returns:
+        List of (group, name, baseline value, current value, ratio) regressions
+    """
+    regressions = []
+    for group, timings in current.get('results', {}).items():
+        for name, timing in timings.items():
+            base = baseline.get('results', {}).get(group, {}).get(name)
+            if not base or not base.get(metric):
+                continue
+            ratio = timing[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append((group, name, base[metric], timing[metric], ratio))
+    return regressions
+
+
+def report_comparison(baseline_path: str, current: Dict, threshold: float) -> int:
+    """Print regressions against a baseline file; returns a process exit code."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_results(baseline, current, threshold)
+    if not regressions:
+        print(f"No regressions over {threshold:.0%} against {baseline_path}", file=sys.stderr)
+        return 0
+    print(f"Regressions over {threshold:.0%} against {baseline_path}:", file=sys.stderr)
+    for group, name, before, after, ratio in regressions:
+        print(f"  [{group}] {name}: {before:.3f}ms -> {after:.3f}ms ({ratio:.2f}x)", file=sys.stderr)
+    return 1
@@ -0,0 +1,258 @@
+"""
+HTTP load test harness
+
+Drives a weighted mix of requests against the app from many concurrent
+workers and reports throughput, latency percentiles and error rates per
+endpoint. Scenarios are JSON files (see benchmarks/scenarios/) describing the
+request mix, parameter ranges, worker count and duration.
+
+Two targets are supported:
+    --target testclient   in-process Flask test client against a seeded
+                          throwaway database (scenario "scale", see datagen.py)
+    --target http://host:port   a running server, over keep-alive HTTP
+
+    python benchmarks/loadtest.py benchmarks/scenarios/mixed.json
+    python benchmarks/loadtest.py benchmarks/scenarios/search_heavy.json \\
+        --target http://localhost:5000 --workers 64 --duration 60 --output run.json
+
+A request counts as an error if it raises or returns a 5xx status.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+from urllib.parse import quote, urlencode, urlsplit
+
+from common import remove_database, result_metadata, seed_database, temp_database, write_results
+
+
+def load_scenario(path: str) -> Dict:
+    with open(path) as f:
+        scenario = json.load(f)
+    scenario.setdefault('name', path.rsplit('/', 1)[-1].rsplit('.', 1)[0])
+    if not scenario.get('requests'):
+        raise ValueError(f"Scenario {path} has no requests.")
+    return scenario
+
+
+class RequestMix:
+    """Picks weighted requests from a scenario and fills in their parameters."""
+
+    def __init__(self, scenario: Dict, seed: int):
+        self.requests = scenario['requests']
+        self.weights = [request.get('weight', 1) for request in self.requests]
+        self.params = scenario.get('params', {})
+        self.rng = random.Random(seed)
+
+    def _value(self, name: str) -> str:
+        spec = self.params[name]
+        # Two integers are an inclusive range, anything else is a list of choices
+        if len(spec) == 2 and all(isinstance(v, int) for v in spec):
+            return str(self.rng.randint(*spec))
+        return str(self.rng.choice(spec))
+
+    def _fill(self, template: str, in_path: bool = False) -> str:
+        values = {name: self._value(name) for name in self.params if '{' + name + '}' in template}
+        if in_path:
+            # "silent garden" would be an invalid URL; form values are encoded when sent
+            values = {name: quote(value, safe='') for name, value in values.items()}
+        return template.format(**values)
+
+    def next(self):
+        """Return (name, method, path, form data or None) for the next request."""
+        request = self.rng.choices(self.requests, weights=self.weights)[0]
+        form = request.get('form')
+        if form is not None:
+            form = {key: self._fill(value) for key, value in form.items()}
+        return request['name'], request.get('method', 'GET'), self._fill(request['path'], in_path=True), form
+
+
+class FlaskClientTarget:
+    """Sends requests through Flask's test client, one client per worker."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def send(method, path, form):
+            response = client.open(path, method=method, data=form)
+            response.close()
+            return response.status_code
+        return send
+
+
+class HTTPTarget:
+    """Sends requests to a running server, one keep-alive connection per worker."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    def session(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+        def send(method, path, form):
+            nonlocal conn
+            body, headers = None, {}
+            if form is not None:
+                body = urlencode(form)
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                raise
+        return send
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _summarize(latencies: List[float], statuses: Counter, errors: int, elapsed: float) -> Dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'errors': errors,
+        'error_rate': round(errors / count, 4) if count else 0.0,
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p90_ms': round(_percentile(latencies, 90), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+        'statuses': {str(status): n for status, n in sorted(statuses.items(), key=str)},
+    }
+
+
+def run_load(target, scenario: Dict, workers: int, duration: float,
+             max_requests: int = 0, seed: int = 327) -> Dict:
+    """
+    Run the scenario's request mix from `workers` threads for `duration` seconds.
+
+    Args:
+        target: FlaskClientTarget or HTTPTarget
+        scenario: Parsed scenario
+        workers: Number of concurrent workers
+        duration: Seconds to run for
+        max_requests: Stop after this many requests in total (0 for no limit)
+        seed: Seed for the request mix; each worker gets its own stream
+
+    Returns:
+        Dict with an 'overall' summary and one summary per request name
+    """
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        mix = RequestMix(scenario, seed + index)
+        send = target.session()
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            name, method, path, form = mix.next()
+            started = time.perf_counter()
+            try:
+                status = send(method, path, form)
+            except Exception:
+                status = 'exception'
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies[name].append(elapsed_ms)
+                statuses[name][status] += 1
+                if status == 'exception' or status >= 500:
+                    errors[name] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {name: _summarize(latencies[name], statuses[name], errors[name], elapsed)
+               for name in sorted(latencies)}
+    all_statuses = sum(statuses.values(), Counter())
+    all_latencies = [value for values in latencies.values() for value in values]
+    results['overall'] = _summarize(all_latencies, all_statuses, sum(errors.values()), elapsed)
+    results['overall']['elapsed_s'] = round(elapsed, 3)
+    return results
+
+
+def print_report(name: str, results: Dict):
+    print(f"\nScenario {name}: {results['overall']['requests']} requests in "
+          f"{results['overall']['elapsed_s']}s", file=sys.stderr)
+    print(f"  {'endpoint':<20}{'reqs':>8}{'rps':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'err%':>8}",
+          file=sys.stderr)
+    for endpoint, summary in results.items():
+        print(f"  {endpoint:<20}{summary['requests']:>8}{summary['rps']:>10.1f}"
+              f"{summary['p50_ms']:>10.2f}{summary['p90_ms']:>10.2f}{summary['p99_ms']:>10.2f}"
+              f"{summary['max_ms']:>10.2f}{summary['error_rate'] * 100:>7.2f}%", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the library app with a request mix.')
+    parser.add_argument('scenario', help='Scenario JSON file')
+    parser.add_argument('--target', default='testclient',
+                        help="'testclient' (in-process) or a base URL such as http://localhost:5000")
+    parser.add_argument('--workers', type=int, help='Override the scenario worker count')
+    parser.add_argument('--duration', type=float, help='Override the scenario duration (seconds)')
+    parser.add_argument('--max-requests', type=int, default=0)
+    parser.add_argument('--scale', help='Override the scenario dataset scale (testclient only)')
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--output', help='Write JSON results here')
+    args = parser.parse_args(argv)
+
+    scenario = load_scenario(args.scenario)
+    workers = args.workers or scenario.get('workers', 8)
+    duration = args.duration or scenario.get('duration', 10)
+
+    path = None
+    try:
+        if args.target == 'testclient':
+            from app import create_app
+            path = temp_database()
+            counts = seed_database(path, args.scale or scenario.get('scale', '1k'), args.seed)
+            print(f"Seeded {counts['books']} books / {counts['loans']} loans", file=sys.stderr)
+            target = FlaskClientTarget(create_app())
+        else:
+            target = HTTPTarget(args.target)
+        results = run_load(target, scenario, workers, duration, args.max_requests, args.seed)
+    finally:
+        if path:
+            remove_database(path)
+
+    print_report(scenario['name'], results)
+    if args.output:
+        write_results({
+            'meta': result_metadata(benchmark='loadtest', scenario=scenario['name'],
+                                    target=args.target, workers=workers, duration=duration),
+            'results': {scenario['name']: results},
+        }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,449 @@
+"""
+Catalog Snapshot - Immutable memory-mapped copy of the books table, shared by every worker
+
+Worker processes that serve /catalog and /search either re-query SQLite or
+keep their own copy of every book. With LIBRARY_CATALOG_SNAPSHOT set to a
+file path, one publisher writes the whole books table into that file in a
+compact columnar format, and every worker maps it read-only: the pages are
+shared through the OS page cache and nothing is copied until a row is
+actually read.
+
+File layout (little-endian, every column 4-byte aligned), books in title order:
+
+    header      magic 'LCAT', format, catalog and availability versions
+                (from cache_versions), last change_log ID, book count n
+    id          n x uint32
+    total       n x uint32  total_copies
+    available   n x int32   available_copies
+    sorted_ids  n x uint32  the IDs in ascending order ...
+    positions   n x uint32  ... and the row holding each one
+    offsets     (n + 1) x uint32 for each of title, author, isbn, and the
+                lowercased title and author, into:
+    strings     packed UTF-8 text
+
+Substring searches run bytes.find() over the packed lowercased column, so a
+title or author search never decodes a row it doesn't return.
+
+A snapshot is never modified. The publisher writes each new generation to a
+temporary file and renames it over the old one, so a reader sees either the
+old or the new file and keeps using the one it mapped until it next checks.
+A snapshot records the cache_versions and the change_log ID it was built
+from, and get_catalog_snapshot() only returns one whose catalog version
+matches what the invalidation bus has seen (invalidation.py); otherwise
+callers fall back to their usual reads.
+
+Copy counts change with every borrow and return, far too often to
+republish the whole catalog for each. Instead every process keeps an
+AvailabilityOverlay: the current available_copies of the books the bus has
+reported changed since the snapshot's change_log ID, re-read from the
+primary for just those books. Rows read through get_catalog_snapshot() take
+their counts from it, so readers never see counts older than the bus allows.
+The publisher still folds availability changes into a new generation every
+LIBRARY_SNAPSHOT_AVAILABILITY_SECONDS, which keeps the overlays small.
+
+The publisher thread runs in the process that creates the app. Under a
+preloading server that is the master, so the workers only read.
+
+Configuration (environment):
+    LIBRARY_CATALOG_SNAPSHOT                snapshot file path (unset: disabled)
+    LIBRARY_SNAPSHOT_REFRESH_SECONDS        how often to check for book changes (default 1)
+    LIBRARY_SNAPSHOT_AVAILABILITY_SECONDS   least time between generations for copy counts alone (default 600)
+"""
+
+import copy
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import database
+from invalidation import InvalidationBus, get_bus
+from models import BOOK_COLUMNS, Book
+
+MAGIC = b'LCAT'
+FORMAT = 2
+HEADER = struct.Struct('<4sIQQQI4x')
+STRING_COLUMNS = ('title', 'author', 'isbn', 'title_lower', 'author_lower')
+# Searches on these fields match lowercased text, like search_books_in_catalog()
+SEARCH_COLUMNS = {'title': 'title_lower', 'author': 'author_lower', 'isbn': 'isbn'}
+DEFAULT_REFRESH_SECONDS = 1.0
+DEFAULT_AVAILABILITY_SECONDS = 600.0
+
+BookRow = Tuple[int, str, str, str, int, int]
+
+
+def encode_snapshot(books: List[BookRow], versions: Dict[str, int], change_id: int = 0) -> bytes:
+    """
+    Pack book rows (in BOOK_COLUMNS order, sorted by title) into the snapshot format.
+
+    Args:
+        books: Rows of (id, title, author, isbn, total_copies, available_copies)
+        versions: The cache_versions the rows were read at
+        change_id: The ID of the last change_log entry the rows reflect
+    """
+    count = len(books)
+    ids = array('I', (book[0] for book in books))
+    id_order = sorted(range(count), key=ids.__getitem__)
+    columns = [
+        ids,
+        array('I', (book[4] for book in books)),
+        array('i', (book[5] for book in books)),
+        array('I', (ids[row] for row in id_order)),
+        array('I', id_order),
+    ]
+    texts = {
+        'title': [book[1] for book in books],
+        'author': [book[2] for book in books],
+        'isbn': [book[3] for book in books],
+    }
+    texts['title_lower'] = [title.lower() for title in texts['title']]
+    texts['author_lower'] = [author.lower() for author in texts['author']]
+
+    strings = bytearray()
+    for name in STRING_COLUMNS:
+        offsets = array('I', [len(strings)])
+        for text in texts[name]:
+            strings += text.encode()
+            offsets.append(len(strings))
+        columns.append(offsets)
+
+    header = HEADER.pack(MAGIC, FORMAT, versions['catalog'], versions['availability'], change_id, count)
+    return b''.join([header] + [column.tobytes() for column in columns] + [bytes(strings)])
+
+
+class CatalogSnapshot:
+    """Read-only view of one snapshot generation; columns are slices of the underlying buffer."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        view = memoryview(buffer)
+        magic, file_format, catalog, availability, change_id, count = HEADER.unpack_from(view)
+        if magic != MAGIC or file_format != FORMAT:
+            raise ValueError(f"Not a format {FORMAT} catalog snapshot")
+        self.versions = {'catalog': catalog, 'availability': availability}
+        self.change_id = change_id
+        self.count = count
+        # Current available_copies by book ID, replacing the stored ones (see overlaid())
+        self.overlay: Dict[int, int] = {}
+
+        position = HEADER.size
+
+        def column(typecode, length):
+            nonlocal position
+            start, position = position, position + 4 * length
+            return view[start:position].cast(typecode)
+
+        self.ids = column('I', count)
+        self.total_copies = column('I', count)
+        self.available_copies = column('i', count)
+        self._sorted_ids = column('I', count)
+        self._positions = column('I', count)
+        self._offsets = {name: column('I', count + 1) for name in STRING_COLUMNS}
+        self._strings_at = position
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _text(self, name: str, row: int) -> str:
+        offsets = self._offsets[name]
+        start = self._strings_at
+        return str(self._buffer[start + offsets[row]:start + offsets[row + 1]], 'utf-8')
+
+    def overlaid(self, overlay: Dict[int, int]) -> 'CatalogSnapshot':
+        """A view of this snapshot whose rows take available_copies from overlay where it has them."""
+        view = copy.copy(self)
+        view.overlay = overlay
+        return view
+
+    def row(self, row: int) -> BookRow:
+        """The book at a row (title order) as a tuple in BOOK_COLUMNS order."""
+        book_id = self.ids[row]
+        available = self.overlay.get(book_id) if self.overlay else None
+        return (book_id, self._text('title', row), self._text('author', row), self._text('isbn', row),
+                self.total_copies[row], self.available_copies[row] if available is None else available)
+
+    def rows(self) -> Iterator[BookRow]:
+        """Every book in title order, as tuples in BOOK_COLUMNS order."""
+        return (self.row(row) for row in range(self.count))
+
+    def books(self) -> List[Book]:
+        """Every book in title order, like database.get_all_books()."""
+        return [Book(*row) for row in self.rows()]
+
+    def get_book(self, book_id: int) -> Optional[Book]:
+        """One book by ID, like database.get_book_by_id()."""
+        index = bisect_left(self._sorted_ids, book_id)
+        if index == self.count or self._sorted_ids[index] != book_id:
+            return None
+        return Book(*self.row(self._positions[index]))
+
+    def search(self, field: str, term: str) -> List[Book]:
+        """
+        Books whose field contains term, in title order.
+
+        term is matched as given against the lowercased title or author, or
+        the ISBN, so pass it lowercased like search_books_in_catalog() does.
+        """
+        offsets = self._offsets[SEARCH_COLUMNS[field]]
+        needle = term.encode()
+        base = self._strings_at
+        end = base + offsets[self.count]
+        matches = []
+        found = self._buffer.find(needle, base + offsets[0], end)
+        while found != -1:
+            row = bisect_right(offsets, found - base) - 1
+            row_end = base + offsets[row + 1]
+            if found + len(needle) <= row_end:
+                matches.append(Book(*self.row(row)))
+                found = self._buffer.find(needle, row_end, end)
+            else:
+                # The match runs into the next book's text; look again from the next byte
+                found = self._buffer.find(needle, found + 1, end)
+        return matches
+
+
+def open_snapshot(path: str) -> CatalogSnapshot:
+    """Map a snapshot file read-only."""
+    with open(path, 'rb') as f:
+        return CatalogSnapshot(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def publish_snapshot(path: str) -> Dict[str, int]:
+    """
+    Write a new snapshot of the books table to path, replacing the old one atomically.
+
+    The books, the versions and the last change_log ID are read in one
+    transaction, so they are exactly the ones the rows reflect.
+
+    Returns:
+        The cache_versions the snapshot was built from
+    """
+    conn = sqlite3.connect(database.DATABASE)
+    try:
+        conn.execute('BEGIN')
+        versions = dict(conn.execute('SELECT name, version FROM cache_versions').fetchall())
+        change_id = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)"
+                                 ).fetchone()[0]
+        books = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title').fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    temp_path = f"{path}.publish-{os.getpid()}"
+    with open(temp_path, 'wb') as f:
+        f.write(encode_snapshot(books, versions, change_id))
+    os.replace(temp_path, path)
+    return versions
+
+
+class SnapshotPublisher(threading.Thread):
+    """Background thread that republishes the snapshot when the catalog changes."""
+
+    def __init__(self, path: str, interval: float = DEFAULT_REFRESH_SECONDS,
+                 availability_interval: float = DEFAULT_AVAILABILITY_SECONDS):
+        super().__init__(name='catalog-snapshot-publisher', daemon=True)
+        self.path = path
+        self.interval = interval
+        self.availability_interval = availability_interval
+        self.published: Dict[str, int] = {}
+        self.generations = 0
+        self._published_at = 0.0
+        self._stop_event = threading.Event()
+
+    def publish_if_changed(self) -> bool:
+        """
+        Publish a new generation if the catalog changed since the last one, or copy counts
+        did and availability_interval has passed; returns whether it did.
+        """
+        if self.published:
+            versions = database.get_cache_versions()
+            if versions['catalog'] == self.published['catalog'] and (
+                    versions['availability'] == self.published['availability']
+                    or time.monotonic() - self._published_at < self.availability_interval):
+                # Readers overlay the copy counts that changed since
+                return False
+        self.published = publish_snapshot(self.path)
+        self._published_at = time.monotonic()
+        self.generations += 1
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.publish_if_changed()
+            except (sqlite3.Error, OSError):
+                # Readers keep the previous generation; retry next interval
+                pass
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class SnapshotReader:
+    """Keeps the newest published snapshot mapped, remapping when the file is replaced."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._file_id = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[CatalogSnapshot]:
+        """The newest snapshot, or None if none has been published yet."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        if file_id != self._file_id:
+            with self._lock:
+                if file_id != self._file_id:
+                    # Mappings of older generations stay valid until nothing references them
+                    self._snapshot = open_snapshot(self.path)
+                    self._file_id = file_id
+        return self._snapshot
+
+
+class AvailabilityOverlay:
+    """Current available_copies of the books the bus reported changed, for overlaying older snapshots."""
+
+    def __init__(self, bus: InvalidationBus):
+        self.bus = bus
+        # Every book change after this change_log ID is tracked; None until the bus has polled
+        self.since: Optional[int] = bus.change_id if bus.versions else None
+        # Replaced rather than modified, so a snapshot view can keep the one it was given
+        self.copies: Dict[int, int] = {}
+        # Book ID -> the bus's change_log ID when it last reported the book changed
+        self._changed_at: Dict[int, int] = {}
+        self._stale: Set[int] = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        bus.subscribe(self._invalidate)
+
+    def __len__(self) -> int:
+        return len(self._changed_at)
+
+    def _invalidate(self, changed: Set[str], book_ids: Optional[List[int]]):
+        with self._lock:
+            self._generation += 1
+            if book_ids is None:
+                # The bus can't say which books changed: start tracking again from where it is now
+                self.since = self.bus.change_id
+                self.copies = {}
+                self._changed_at.clear()
+                self._stale.clear()
+                return
+            for book_id in book_ids:
+                self._changed_at[book_id] = self.bus.change_id
+            self._stale.update(book_ids)
+
+    def prune(self, change_id: int):
+        """Forget the books whose changes are all included in a snapshot taken at change_id."""
+        with self._lock:
+            covered = [book_id for book_id, changed_at in self._changed_at.items() if changed_at <= change_id]
+            if not covered:
+                return
+            self._generation += 1
+            copies = dict(self.copies)
+            for book_id in covered:
+                del self._changed_at[book_id]
+                copies.pop(book_id, None)
+                self._stale.discard(book_id)
+            self.copies = copies
+
+    def current(self) -> Optional[Dict[int, int]]:
+        """
+        available_copies of every book changed since `since`, re-reading the ones changed since the last call.
+
+        Returns:
+            The counts by book ID, or None if books changed again while they were read
+        """
+        with self._lock:
+            stale = list(self._stale)
+            generation = self._generation
+            if not stale:
+                return self.copies
+        with database.read_from_primary():
+            books = database.get_books_by_ids(stale)
+        with self._lock:
+            if generation != self._generation:
+                return None
+            copies = dict(self.copies)
+            # A deleted book moves the catalog version, so no snapshot that has it is served
+            copies.update((book_id, book['available_copies']) for book_id, book in books.items())
+            self.copies = copies
+            self._stale.clear()
+            return copies
+
+
+_reader: Optional[SnapshotReader] = None
+_overlay: Optional[AvailabilityOverlay] = None
+
+
+def enable_catalog_snapshot(path: str) -> SnapshotReader:
+    """Read the catalog from the snapshot at path in this process (and the workers forked from it)."""
+    global _reader, _overlay
+    disable_catalog_snapshot()
+    _reader = SnapshotReader(path)
+    _overlay = AvailabilityOverlay(get_bus())
+    return _reader
+
+
+def disable_catalog_snapshot():
+    """Stop reading from the snapshot."""
+    global _reader, _overlay
+    if _overlay is not None:
+        _overlay.bus.unsubscribe(_overlay._invalidate)
+    _reader = _overlay = None
+
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """
+    The current snapshot, if enabled, with copy counts as fresh as the invalidation bus.
+
+    Returns:
+        The snapshot, or None if disabled, not published yet, or behind a
+        catalog change the bus has seen (callers then read as usual)
+    """
+    reader, overlay = _reader, _overlay
+    if reader is None:
+        return None
+    snapshot = reader.current()
+    if snapshot is None:
+        return None
+    overlay.bus.poll()
+    if snapshot.versions['catalog'] != overlay.bus.versions['catalog']:
+        return None
+    if overlay.since is None or snapshot.change_id < overlay.since:
+        # Changes between the snapshot and the start of tracking aren't in the overlay
+        return None
+    overlay.prune(snapshot.change_id)
+    copies = overlay.current()
+    if copies is None:
+        return None
+    return snapshot.overlaid(copies) if copies else snapshot
+
+
+def init_catalog_snapshot(app) -> Optional[SnapshotPublisher]:
+    """
+    Publish the snapshot now, keep it published, and read the catalog from it.
+
+    Returns:
+        The publisher thread, or None if LIBRARY_CATALOG_SNAPSHOT is not set
+    """
+    path = os.environ.get('LIBRARY_CATALOG_SNAPSHOT')
+    if not path:
+        return None
+    interval = float(os.environ.get('LIBRARY_SNAPSHOT_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS))
+    availability_interval = float(os.environ.get('LIBRARY_SNAPSHOT_AVAILABILITY_SECONDS',
+                                                 DEFAULT_AVAILABILITY_SECONDS))
+    publisher = SnapshotPublisher(path, interval, availability_interval)
+    publisher.publish_if_changed()
+    publisher.start()
+    enable_catalog_snapshot(path)
+    app.extensions['catalog_snapshot_publisher'] = publisher
+    return publisher
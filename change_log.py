@@ -0,0 +1,116 @@
+"""
+Change Log - Tail the row changes of books and borrow_records
+
+Triggers created by database.init_database() append an entry to change_log
+for every insert, update and delete on books and borrow_records (a borrow
+record moved by archive.py is logged as 'archive'). Each entry names the
+table, the row ID and the operation, not the new values: consumers re-read
+the rows they care about, so an entry never goes stale.
+
+A consumer keeps the ID of the last entry it processed as its cursor and
+asks for everything after it:
+
+    for change in iter_changes(after_id=cursor):
+        ...
+        cursor = change.id
+
+or follows the log as it grows with tail_changes(). Entries are kept until
+database.prune_change_log() removes them, so prune only up to the oldest
+cursor of any consumer. From the command line, print changes as JSON lines:
+
+    python change_log.py --after 0
+    python change_log.py --follow --tables books
+"""
+
+import argparse
+import json
+import threading
+import time
+from typing import Iterable, Iterator, Optional
+
+import database
+from models import Change
+
+DEFAULT_POLL_SECONDS = 0.5
+
+
+def iter_changes(after_id: int = 0, tables: Optional[Iterable[str]] = None,
+                 batch_size: int = 1000) -> Iterator[Change]:
+    """
+    Yield the changes after after_id, oldest first, until caught up with the log.
+
+    Args:
+        after_id: The consumer's cursor, the ID of the last change it processed
+        tables: Only yield changes to these tables (default: all)
+        batch_size: Entries read per query
+    """
+    tables = set(tables) if tables is not None else None
+    while True:
+        changes = database.get_changes_after(after_id, batch_size)
+        for change in changes:
+            if tables is None or change.table_name in tables:
+                yield change
+        if len(changes) < batch_size:
+            return
+        after_id = changes[-1].id
+
+
+def tail_changes(after_id: Optional[int] = None, tables: Optional[Iterable[str]] = None,
+                 poll_interval: float = DEFAULT_POLL_SECONDS,
+                 stop: Optional[threading.Event] = None) -> Iterator[Change]:
+    """
+    Yield changes as they are logged, polling every poll_interval seconds when caught up.
+
+    Args:
+        after_id: Start after this change; None starts from the end of the log as of this call
+        tables: Only yield changes to these tables (default: all)
+        poll_interval: Seconds to wait between polls of an idle log
+        stop: Event that ends the iteration once set
+    """
+    if after_id is None:
+        after_id = database.get_last_change_id()
+    return _follow(after_id, tables, poll_interval, stop)
+
+
+def _follow(after_id: int, tables: Optional[Iterable[str]], poll_interval: float,
+            stop: Optional[threading.Event]) -> Iterator[Change]:
+    while stop is None or not stop.is_set():
+        caught_up = True
+        # Advance the cursor past filtered-out entries too
+        for change in iter_changes(after_id, batch_size=1000):
+            after_id = change.id
+            caught_up = False
+            if tables is None or change.table_name in tables:
+                yield change
+        if caught_up:
+            if stop is not None:
+                stop.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Print change_log entries as JSON lines.')
+    parser.add_argument('--database', default=database.DATABASE, help='SQLite file (default: %(default)s)')
+    parser.add_argument('--after', type=int, default=0, help='Print changes after this change ID')
+    parser.add_argument('--tables', nargs='+', choices=database.CHANGE_LOG_TABLES, help='Only these tables')
+    parser.add_argument('--follow', action='store_true', help='Keep printing new changes as they are logged')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_SECONDS)
+    args = parser.parse_args(argv)
+
+    database.DATABASE = args.database
+    # Creates the change log on databases from before it existed
+    database.init_database()
+    if args.follow:
+        changes = tail_changes(args.after, args.tables, args.poll_interval)
+    else:
+        changes = iter_changes(args.after, args.tables)
+    try:
+        for change in changes:
+            print(json.dumps(change.to_dict()), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,211 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import itertools
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+from models import (BOOK_COLUMNS, BORROW_RECORD_COLUMNS, CHANGE_COLUMNS, Book, BorrowedBook, BorrowRecord,
+                    Change)
+
 # Database configuration
 DATABASE = 'library.db'
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+# Bump whenever init_database() changes the schema, so fast startup re-runs it
+SCHEMA_VERSION = 6
+
+# Read-only snapshot copies of DATABASE used by the read helpers (see replicas.py);
+# empty means every read goes to DATABASE
+READ_REPLICAS: List[str] = [path for path in os.environ.get('LIBRARY_READ_REPLICAS', '').split(',') if path]
+_replica_counter = itertools.count()
+
+# Tables whose row changes are recorded in change_log by triggers (see change_log.py)
+CHANGE_LOG_TABLES = ('books', 'borrow_records')
+
+# Counters in cache_versions, bumped by triggers on books (see invalidation.py):
+# 'catalog' when a book is added, removed or its details change,
+# 'availability' when its available_copies change
+CACHE_VERSIONS = ('catalog', 'availability')
+
+# Writes to books made by this process, so its caches see them without
+# waiting for the next poll of cache_versions
+BOOK_WRITES = 0
+
+# Writer that batches circulation writes into shared commits (see group_commit.py);
+# None commits every write on its own
+GROUP_COMMIT_WRITER = None
+
+# Per-thread flag forcing reads to DATABASE (see read_from_primary)
+_read_routing = threading.local()
+
+# Per-thread list of active query traces (see trace_queries)
+_query_trace = threading.local()
+
+
+class _TracingConnection(sqlite3.Connection):
+    """
+    Connection that reports every statement it runs to the active query traces.
+
+    SQLite only tells us when a statement starts, so each statement is timed
+    until the next statement on the same connection (or until close). Callers
+    fetch their rows straight after execute(), so this covers the fetch too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traces = list(_query_trace.active)
+        self._pending = None
+        # Whether the current execute() call has reported its statement yet
+        self._reported = False
+        self.set_trace_callback(self._on_statement)
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or _TracingCursor)
+
+    def execute(self, *args, **kwargs):
+        self._start_call()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._start_call()
+        return super().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        self._start_call()
+        return super().executescript(*args, **kwargs)
+
+    def _start_call(self):
+        self._reported = False
+
+    def _on_statement(self, statement: str):
+        # Trigger programs (see change_log) are reported with the text of the statement
+        # that fired them, or as "-- TRIGGER name", while that statement's execute() call
+        # runs; count their time toward that statement. The same statement run again by
+        # a later call is a query of its own.
+        if statement.startswith('--') or (self._reported and self._pending is not None
+                                          and statement == self._pending[0]):
+            return
+        now = time.perf_counter()
+        self._finish_pending(now)
+        self._pending = (statement, now)
+        self._reported = True
+
+    def _finish_pending(self, now: float):
+        if self._pending is not None:
+            statement, started = self._pending
+            for trace in self._traces:
+                trace.append((statement, now - started))
+            self._pending = None
+
+    def close(self):
+        self._finish_pending(time.perf_counter())
+        super().close()
+
+
+class _TracingCursor(sqlite3.Cursor):
+    """Cursor that tells its _TracingConnection where each execute() call starts."""
+
+    def execute(self, *args, **kwargs):
+        self.connection._start_call()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self.connection._start_call()
+        return super().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        self.connection._start_call()
+        return super().executescript(*args, **kwargs)
+
+
+@contextmanager
+def trace_queries():
+    """
+    Record the SQL statements run by this thread while the block is active.
+
+    Yields:
+        list: Filled with (statement, seconds) tuples as statements complete
+    """
+    statements = []
+    if not hasattr(_query_trace, 'active'):
+        _query_trace.active = []
+    _query_trace.active.append(statements)
+    try:
+        yield statements
+    finally:
+        _query_trace.active = [t for t in _query_trace.active if t is not statements]
+
+@contextmanager
+def query_budget(max_queries: int, max_seconds: Optional[float] = None):
+    """
+    Fail if the block runs more SQL statements, or spends more time in SQL, than allowed.
+
+    Transaction control statements (BEGIN/COMMIT/ROLLBACK) are not counted.
+
+    Args:
+        max_queries: Maximum number of statements the block may run
+        max_seconds: Maximum total time spent in SQL, if given
+
+    Raises:
+        AssertionError: If the block goes over budget
+    """
+    with trace_queries() as statements:
+        yield statements
+    queries = [(sql, seconds) for sql, seconds in statements
+               if not sql.lstrip().upper().startswith(('BEGIN', 'COMMIT', 'ROLLBACK'))]
+    total_seconds = sum(seconds for _, seconds in queries)
+    listing = '\n'.join(f"  {seconds * 1000:.3f}ms  {' '.join(sql.split())}" for sql, seconds in queries)
+    if len(queries) > max_queries:
+        raise AssertionError(f"Ran {len(queries)} queries, budget is {max_queries}:\n{listing}")
+    if max_seconds is not None and total_seconds > max_seconds:
+        raise AssertionError(f"Spent {total_seconds:.4f}s in SQL, budget is {max_seconds}s:\n{listing}")
+
+def _connect(database: str, uri: bool = False):
+    if getattr(_query_trace, 'active', None):
+        conn = sqlite3.connect(database, uri=uri, factory=_TracingConnection)
+    else:
+        conn = sqlite3.connect(database, uri=uri)
     conn.row_factory = sqlite3.Row  # This enables column access by name
     return conn
 
+def get_db_connection():
+    """Get a database connection."""
+    return _connect(DATABASE)
+
+def get_read_connection():
+    """
+    Get a connection for read-only queries.
+
+    Rotates over READ_REPLICAS, opened read-only. Falls back to the primary
+    DATABASE when no replica is configured or present yet, or while
+    read_from_primary() is active on this thread.
+    """
+    if READ_REPLICAS and not getattr(_read_routing, 'primary', False):
+        replica = READ_REPLICAS[next(_replica_counter) % len(READ_REPLICAS)]
+        if os.path.exists(replica):
+            return _connect(Path(replica).resolve().as_uri() + '?mode=ro', uri=True)
+    return get_db_connection()
+
+@contextmanager
+def read_from_primary():
+    """Send this thread's reads to the primary DATABASE, e.g. to read your own writes."""
+    previous = getattr(_read_routing, 'primary', False)
+    _read_routing.primary = True
+    try:
+        yield
+    finally:
+        _read_routing.primary = previous
+
+def reads_from_primary() -> bool:
+    """Whether read_from_primary() is active on this thread."""
+    return getattr(_read_routing, 'primary', False)
+
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
@@ -45,9 +237,154 @@ def init_database():
         )
     ''')
     
+    # At most one active loan per patron and book; returns and fee checks look it up here
+    try:
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_borrow_records_active
+            ON borrow_records (patron_id, book_id) WHERE return_date IS NULL
+        ''')
+    except sqlite3.IntegrityError:
+        # Databases from before the index may hold duplicate active loans;
+        # index them without the constraint rather than refusing to start
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_borrow_records_active
+            ON borrow_records (patron_id, book_id) WHERE return_date IS NULL
+        ''')
+    
+    # Create borrow_records_archive table (returned records moved out of
+    # borrow_records by archive_returned_borrow_records, keeping their IDs)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER PRIMARY KEY,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_archive_patron
+        ON borrow_records_archive (patron_id, borrow_date)
+    ''')
+    
+    # Create payments table (late fees paid through the payment gateway)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            transaction_id TEXT UNIQUE NOT NULL,
+            paid_at TEXT NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    
+    # Create change_log table (append-only record of row changes, see change_log.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        )
+    ''')
+    create_change_log_triggers(conn)
+    
+    # Create cache_versions table (one counter per CACHE_VERSIONS name, polled by every worker)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.executemany('INSERT OR IGNORE INTO cache_versions (name) VALUES (?)',
+                     [(name,) for name in CACHE_VERSIONS])
+    create_cache_version_triggers(conn)
+    
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
     conn.close()
 
+def create_change_log_triggers(conn):
+    """Create the triggers that record inserts, updates and deletes of CHANGE_LOG_TABLES."""
+    for table in CHANGE_LOG_TABLES:
+        for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            logged = f"'{operation}'"
+            if table == 'borrow_records' and operation == 'delete':
+                # archive_returned_borrow_records() copies a record to the archive before deleting it
+                logged = ("CASE WHEN EXISTS (SELECT 1 FROM borrow_records_archive WHERE id = OLD.id) "
+                          "THEN 'archive' ELSE 'delete' END")
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS change_log_{table}_{operation}
+                AFTER {operation.upper()} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, operation) VALUES ('{table}', {row}.id, {logged});
+                END
+            ''')
+
+def drop_change_log_triggers(conn):
+    """Drop the change_log triggers, e.g. for a bulk load; init_database() recreates them."""
+    for table in CHANGE_LOG_TABLES:
+        for operation in ('insert', 'update', 'delete'):
+            conn.execute(f'DROP TRIGGER IF EXISTS change_log_{table}_{operation}')
+
+def create_cache_version_triggers(conn):
+    """Create the triggers that bump cache_versions when books change."""
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS cache_version_books_insert AFTER INSERT ON books
+        BEGIN
+            UPDATE cache_versions SET version = version + 1 WHERE name = 'catalog';
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS cache_version_books_update AFTER UPDATE ON books
+        BEGIN
+            UPDATE cache_versions SET version = version + 1
+            WHERE (name = 'catalog' AND (NEW.title IS NOT OLD.title OR NEW.author IS NOT OLD.author
+                                         OR NEW.isbn IS NOT OLD.isbn OR NEW.total_copies IS NOT OLD.total_copies))
+               OR (name = 'availability' AND NEW.available_copies IS NOT OLD.available_copies);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS cache_version_books_delete AFTER DELETE ON books
+        BEGIN
+            UPDATE cache_versions SET version = version + 1 WHERE name = 'catalog';
+        END
+    ''')
+
+def drop_cache_version_triggers(conn):
+    """Drop the cache_versions triggers, e.g. for a bulk load; bump_cache_versions() afterwards."""
+    for operation in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS cache_version_books_{operation}')
+
+def bump_cache_versions(conn, names=CACHE_VERSIONS):
+    """Bump the given cache_versions counters on conn (the caller commits)."""
+    conn.executemany('UPDATE cache_versions SET version = version + 1 WHERE name = ?',
+                     [(name,) for name in names])
+
+def schema_is_current() -> bool:
+    """Check whether the database already has the schema init_database() creates."""
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    conn.close()
+    return version == SCHEMA_VERSION
+
+def enable_wal_mode():
+    """
+    Switch the database to write-ahead logging.
+
+    Readers no longer block the writer (or each other), which matters once
+    several worker processes share the file. The setting is stored in the
+    database file, so this only needs to run once.
+    """
+    conn = get_db_connection()
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.close()
+
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
@@ -84,73 +421,160 @@ def add_sample_data():
 
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
+def _model_cursor(conn, model):
+    """A cursor on conn whose rows are model instances instead of sqlite3.Row."""
+    cursor = conn.cursor()
+    cursor.row_factory = model.row_factory
+    return cursor
+
+def get_all_books() -> List[Book]:
     """Get all books from the database."""
-    conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    conn = get_read_connection()
+    books = _model_cursor(conn, Book).execute(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title').fetchall()
     conn.close()
-    return [dict(book) for book in books]
+    return books
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def get_book_by_id(book_id: int) -> Optional[Book]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    conn = get_read_connection()
+    book = _model_cursor(conn, Book).execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?',
+                                             (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    return book
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
     """Get a specific book by ISBN."""
+    conn = get_read_connection()
+    book = _model_cursor(conn, Book).execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?',
+                                             (isbn,)).fetchone()
+    conn.close()
+    return book
+
+def get_books_by_ids(book_ids: List[int]) -> Dict[int, Book]:
+    """Get several books in one query, keyed by book ID."""
+    book_ids = list(set(book_ids))
+    if not book_ids:
+        return {}
+    books = {}
+    conn = get_read_connection()
+    cursor = _model_cursor(conn, Book)
+    # Stay under SQLite's limit on bound parameters per statement
+    for start in range(0, len(book_ids), 500):
+        chunk = book_ids[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        for book in cursor.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})', chunk):
+            books[book.id] = book
+    conn.close()
+    return books
+
+def get_books_after(book_id: int, limit: int = 1000) -> List[Book]:
+    """Get up to limit books with an ID greater than book_id, in ID order."""
+    conn = get_read_connection()
+    books = _model_cursor(conn, Book).execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id > ? ORDER BY id LIMIT ?',
+                                              (book_id, limit)).fetchall()
+    conn.close()
+    return books
+
+def get_changes_after(change_id: int, limit: int = 1000) -> List[Change]:
+    """Get up to limit change_log entries with an ID greater than change_id, in ID order."""
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    changes = _model_cursor(conn, Change).execute(f'''
+        SELECT {CHANGE_COLUMNS} FROM change_log WHERE id > ? ORDER BY id LIMIT ?
+    ''', (change_id, limit)).fetchall()
     conn.close()
-    return dict(book) if book else None
+    return changes
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
-    """Get currently borrowed books for a patron."""
+def get_last_change_id() -> int:
+    """Get the ID of the newest change logged (even if since pruned), or 0 if there is none."""
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+    # AUTOINCREMENT keeps the highest ID ever used in sqlite_sequence, so pruning doesn't reset it
+    last_id = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0)"
+                           ).fetchone()[0]
+    conn.close()
+    return last_id
+
+def get_cache_versions() -> Dict[str, int]:
+    """Get the cache_versions counters by name, always from the primary."""
+    conn = get_db_connection()
+    versions = dict(conn.execute('SELECT name, version FROM cache_versions').fetchall())
+    conn.close()
+    return versions
+
+def prune_change_log(up_to_id: int) -> int:
+    """
+    Delete change_log entries up to and including up_to_id.
+
+    Only prune what every consumer has already read.
+
+    Returns:
+        Number of entries deleted
+    """
+    conn = get_db_connection()
+    deleted = conn.execute('DELETE FROM change_log WHERE id <= ?', (up_to_id,)).rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+def get_patron_borrowed_books(patron_id: str) -> List[BorrowedBook]:
+    """Get currently borrowed books for a patron."""
+    conn = get_read_connection()
+    borrowed_books = _model_cursor(conn, BorrowedBook).execute('''
+        SELECT br.book_id, b.title, b.author, br.borrow_date, br.due_date
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
     ''', (patron_id,)).fetchall()
     conn.close()
-    
-    borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
-    
     return borrowed_books
 
-def get_patron_borrow_records(patron_id: str) -> List[Dict]:
-    """Get all borrow records for a patron, active and returned."""
-    conn = get_db_connection()
-    records = conn.execute('''
-        SELECT * FROM borrow_records
+def get_patron_borrow_records(patron_id: str, include_archived: bool = True,
+                              limit: Optional[int] = None) -> List[BorrowRecord]:
+    """
+    Get a patron's borrow records, active and returned, newest first.
+
+    The hot table is read first and borrow_records_archive only after it, if
+    at all: records returned before the archive cutoff follow the hot ones.
+
+    Args:
+        patron_id: 6-digit library card ID
+        include_archived: Also read returned records moved to borrow_records_archive.
+            Callers that only look for active or recent records pass False and skip the archive.
+        limit: Return at most this many records; the archive is only read if
+            the hot table has fewer
+    """
+    conn = get_read_connection()
+    cursor = _model_cursor(conn, BorrowRecord)
+    borrow_records = cursor.execute(f'''
+        SELECT {BORROW_RECORD_COLUMNS} FROM borrow_records
         WHERE patron_id = ?
-        ORDER BY borrow_date DESC
-    ''', (patron_id,)).fetchall()
+        ORDER BY borrow_date DESC LIMIT ?
+    ''', (patron_id, -1 if limit is None else limit)).fetchall()
+    if include_archived and (limit is None or len(borrow_records) < limit):
+        borrow_records += cursor.execute(f'''
+            SELECT {BORROW_RECORD_COLUMNS} FROM borrow_records_archive
+            WHERE patron_id = ?
+            ORDER BY borrow_date DESC LIMIT ?
+        ''', (patron_id, -1 if limit is None else limit - len(borrow_records))).fetchall()
     conn.close()
-
-    borrow_records = []
-    for record in records:
-        borrow_records.append({
-            'id': record['id'],
-            'book_id': record['book_id'],
-            'borrow_date': record['borrow_date'],
-            'due_date': record['due_date'],
-            'return_date': record['return_date']
-        })
     return borrow_records
 
+def get_active_borrow_record(patron_id: str, book_id: int) -> Optional[BorrowRecord]:
+    """
+    Get a patron's active (not yet returned) borrow record for a book.
+
+    A single lookup on idx_borrow_records_active, however long the patron's
+    history is. Always reads the primary: returns act on the record found.
+    """
+    conn = get_db_connection()
+    record = _model_cursor(conn, BorrowRecord).execute(f'''
+        SELECT {BORROW_RECORD_COLUMNS} FROM borrow_records
+        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ORDER BY borrow_date DESC LIMIT 1
+    ''', (patron_id, book_id)).fetchone()
+    conn.close()
+    return record
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
     conn = get_db_connection()
@@ -161,6 +585,51 @@ def get_patron_borrow_count(patron_id: str) -> int:
     conn.close()
     return count
 
+def get_borrow_counts() -> Dict[int, int]:
+    """Get how many times each book has been borrowed, archived records included."""
+    conn = get_read_connection()
+    counts = conn.execute('''
+        SELECT book_id, COUNT(*) AS borrows FROM (
+            SELECT book_id FROM borrow_records
+            UNION ALL
+            SELECT book_id FROM borrow_records_archive
+        ) GROUP BY book_id
+    ''').fetchall()
+    conn.close()
+    return {row['book_id']: row['borrows'] for row in counts}
+
+def get_borrow_counts_after(record_id: int) -> Tuple[int, Dict[int, int]]:
+    """
+    Count the borrows with a record ID greater than record_id, archived records included.
+
+    Record IDs are AUTOINCREMENT and kept by the archive, so passing the
+    returned ID back in counts each new borrow exactly once.
+
+    Returns:
+        The newest record ID counted (at least record_id), and the counts by book ID
+    """
+    conn = get_read_connection()
+    last_id = conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'borrow_records'), 0)"
+                           ).fetchone()[0]
+    if last_id <= record_id:
+        conn.close()
+        return record_id, {}
+    # Bounded by last_id, so records committed after the sequence was read are left for the next call
+    counts = conn.execute('''
+        SELECT book_id, COUNT(*) AS borrows FROM (
+            SELECT book_id FROM borrow_records WHERE id > ? AND id <= ?
+            UNION ALL
+            SELECT book_id FROM borrow_records_archive WHERE id > ? AND id <= ?
+        ) GROUP BY book_id
+    ''', (record_id, last_id, record_id, last_id)).fetchall()
+    conn.close()
+    return last_id, {row['book_id']: row['borrows'] for row in counts}
+
+def _note_book_write():
+    # Called after the commit, so a poll it triggers sees the new versions
+    global BOOK_WRITES
+    BOOK_WRITES += 1
+
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
@@ -170,53 +639,173 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
         conn.commit()
+        _note_book_write()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
 
-def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
-    """Insert a new borrow record into the database."""
+def _run_circulation_write(sql: str, params: tuple) -> int:
+    """
+    Run and commit one borrow/return write, through GROUP_COMMIT_WRITER when it is enabled.
+
+    Returns:
+        The statement's rowcount
+
+    Raises:
+        sqlite3.Error: If the statement or its commit failed
+    """
+    if GROUP_COMMIT_WRITER is not None:
+        return GROUP_COMMIT_WRITER.execute(sql, params)
     conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        rowcount = conn.execute(sql, params).rowcount
         conn.commit()
+        return rowcount
+    finally:
         conn.close()
+
+def _execute_circulation_write(sql: str, params: tuple) -> bool:
+    """Run one borrow/return write; False if it failed."""
+    try:
+        _run_circulation_write(sql, params)
         return True
     except Exception as e:
-        conn.close()
         return False
 
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+    """Insert a new borrow record into the database."""
+    return _execute_circulation_write('''
+        INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+        VALUES (?, ?, ?, ?)
+    ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+
 def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+
+    Like decrement_book_availability, the bound is part of the UPDATE: a
+    change that would take available_copies below 0 or above total_copies
+    (e.g. a return processed twice) matches no row.
+
+    Returns:
+        True if the copies were updated; False if the change is out of range,
+        the book doesn't exist, or the write failed
+    """
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
-        conn.commit()
-        conn.close()
-        return True
+        updated = _run_circulation_write('''
+            UPDATE books SET available_copies = available_copies + ?
+            WHERE id = ? AND available_copies + ? BETWEEN 0 AND total_copies
+        ''', (change, book_id, change)) == 1
     except Exception as e:
-        conn.close()
         return False
+    if updated:
+        _note_book_write()
+    return updated
+
+def decrement_book_availability(book_id: int, max_attempts: int = 3) -> bool:
+    """
+    Take one available copy of a book, if there is one.
+
+    The check and the decrement are one conditional UPDATE, so concurrent
+    borrows of the last copy can't both succeed (unlike reading
+    available_copies first and then calling update_book_availability).
+    Attempts that fail because the database is busy are retried, up to
+    max_attempts in total, with a short backoff.
+
+    Returns:
+        True if a copy was taken; False if none was available, the book
+        doesn't exist, or every attempt failed
+    """
+    for attempt in range(max_attempts):
+        try:
+            taken = _run_circulation_write('''
+                UPDATE books SET available_copies = available_copies - 1
+                WHERE id = ? AND available_copies > 0
+            ''', (book_id,)) == 1
+        except sqlite3.OperationalError as e:
+            # Locked for longer than the connection's busy timeout; back off and retry
+            if attempt + 1 < max_attempts:
+                time.sleep(0.01 * 2 ** attempt)
+            continue
+        except Exception as e:
+            return False
+        if taken:
+            _note_book_write()
+        return taken
+    return False
 
 def update_borrow_record_return_date(record_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record by record ID."""
+    return _execute_circulation_write('''
+        UPDATE borrow_records 
+        SET return_date = ? 
+        WHERE id = ? AND return_date IS NULL
+    ''', (return_date.isoformat(), record_id))
+
+def archive_returned_borrow_records(cutoff: datetime, batch_size: int = 1000) -> int:
+    """
+    Move borrow records returned before cutoff into borrow_records_archive.
+
+    Records are moved in batches of batch_size, each in its own short
+    transaction, so borrowing and returning can carry on while a large
+    backlog is archived.
+
+    Returns:
+        Number of records archived
+    """
+    archived = 0
+    last_id = 0
+    conn = get_db_connection()
+    try:
+        while True:
+            batch = conn.execute('''
+                SELECT id FROM borrow_records
+                WHERE id > ? AND return_date IS NOT NULL AND return_date < ?
+                ORDER BY id LIMIT ?
+            ''', (last_id, cutoff.isoformat(), batch_size)).fetchall()
+            if not batch:
+                break
+            batch_range = (last_id, batch[-1]['id'], cutoff.isoformat())
+            conn.execute('''
+                INSERT INTO borrow_records_archive (id, patron_id, book_id, borrow_date, due_date, return_date)
+                SELECT id, patron_id, book_id, borrow_date, due_date, return_date FROM borrow_records
+                WHERE id > ? AND id <= ? AND return_date IS NOT NULL AND return_date < ?
+            ''', batch_range)
+            archived += conn.execute('''
+                DELETE FROM borrow_records
+                WHERE id > ? AND id <= ? AND return_date IS NOT NULL AND return_date < ?
+            ''', batch_range).rowcount
+            conn.commit()
+            last_id = batch[-1]['id']
+    finally:
+        conn.close()
+    return archived
+
+def insert_payment(patron_id: str, book_id: int, amount: float, transaction_id: str, paid_at: datetime) -> bool:
+    """Record a late fee payment."""
     conn = get_db_connection()
     try:
         conn.execute('''
-            UPDATE borrow_records 
-            SET return_date = ? 
-            WHERE id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), record_id))
+            INSERT INTO payments (patron_id, book_id, amount, transaction_id, paid_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (patron_id, book_id, amount, transaction_id, paid_at.isoformat()))
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
+
+def get_patron_payments(patron_id: str) -> List[Dict]:
+    """Get all late fee payments made by a patron, newest first."""
+    conn = get_read_connection()
+    payments = conn.execute('''
+        SELECT * FROM payments
+        WHERE patron_id = ?
+        ORDER BY paid_at DESC
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(payment) for payment in payments]
+
@@ -0,0 +1,277 @@
+"""
+Synthetic Data Generator - Large, realistic library datasets
+
+Generates a deterministic catalog and loan history for benchmarks and load
+tests. For the same arguments (including --now) the output is identical.
+
+- Titles are built from weighted templates and word lists, so lengths and
+  common words look like a real catalog.
+- Authors are drawn Zipf-style from an author pool, so a few authors are
+  prolific and most have one or two books.
+- Loans pick books and patrons with Zipf-skewed popularity. Recent loans may
+  still be active, some of them overdue; older loans have been returned.
+  Active loans never exceed a book's copies or the 5-book patron limit, and a
+  patron never has two copies of the same book out.
+
+Rows are written with executemany in large batches inside a single
+transaction with journaling off, so millions of rows take minutes.
+
+Usage:
+    python datagen.py big_library.db --books 2000000 --patrons 300000 --loans 5000000
+    python datagen.py medium.db --scale 100k --seed 42
+"""
+
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import database
+
+# Named presets: (books, patrons, loans)
+PRESETS = {
+    '1k': (1_000, 200, 2_000),
+    '100k': (100_000, 20_000, 200_000),
+    '1m': (1_000_000, 200_000, 2_000_000),
+}
+
+LOAN_DAYS = 14
+MAX_ACTIVE_PER_PATRON = 5
+ACTIVE_WINDOW_DAYS = 45  # loans borrowed within this window may still be out
+
+ADJECTIVES = ['Silent', 'Lost', 'Hidden', 'Last', 'First', 'Broken', 'Golden', 'Dark',
+              'Little', 'Great', 'Secret', 'Forgotten', 'Wild', 'Quiet', 'Burning', 'Endless',
+              'Red', 'Blue', 'Long', 'Distant', 'Invisible', 'Bitter', 'Sweet', 'Final',
+              'Practical', 'Modern', 'Complete', 'Essential', 'Brief', 'Ancient']
+NOUNS = ['River', 'Garden', 'Night', 'City', 'House', 'Empire', 'Shadow', 'Journey', 'Sea',
+         'Mountain', 'Winter', 'Summer', 'Kingdom', 'Witness', 'Letter', 'Promise', 'Island',
+         'Road', 'Storm', 'Mirror', 'Forest', 'Daughter', 'Son', 'Machine', 'Dream', 'War',
+         'Peace', 'Stranger', 'Clock', 'Song', 'Fire', 'Stone', 'Bridge', 'Orchard', 'Harbor',
+         'Algorithm', 'Guide', 'History', 'Theory', 'Introduction', 'Handbook', 'Memoir']
+PLACES = ['Paris', 'Kingston', 'Toronto', 'the North', 'the Valley', 'Rome', 'Tokyo',
+          'the Desert', 'Montreal', 'the Coast', 'Lagos', 'Hanoi', 'Lisbon', 'the Prairie']
+SUBJECTS = ['Python', 'Statistics', 'Economics', 'Gardening', 'Chemistry', 'Philosophy',
+            'Software Testing', 'Databases', 'Music', 'Cooking', 'Astronomy', 'Law']
+FIRST_NAMES = ['James', 'Mary', 'Wei', 'Aisha', 'Carlos', 'Olivia', 'Hiroshi', 'Fatima',
+               'Liam', 'Emma', 'Noah', 'Sofia', 'Arjun', 'Mei', 'Lucas', 'Amara', 'Ivan',
+               'Chloe', 'Mateo', 'Priya', 'Ethan', 'Yuki', 'Omar', 'Grace', 'Quang', 'Lina',
+               'Daniel', 'Zara', 'Felix', 'Nora', 'Samuel', 'Hana', 'Leo', 'Ines', 'Kofi']
+LAST_NAMES = ['Smith', 'Tran', 'Garcia', 'Nguyen', 'Patel', 'Kim', 'Brown', 'Martin',
+              'Lopez', 'Wilson', 'Chen', 'Singh', 'Okafor', 'Rossi', 'Dubois', 'Tanaka',
+              'Kowalski', 'Haddad', 'Murphy', 'Silva', 'Novak', 'Ibrahim', 'Larsen', 'Costa',
+              'Walker', 'Young', 'King', 'Moreau', 'Sato', 'Mensah', 'Fischer', 'Ahmed']
+
+TITLE_TEMPLATES = [
+    ('The {adj} {noun}', 20),
+    ('The {noun}', 12),
+    ('{noun} of {noun}s', 10),
+    ('A {noun} in {place}', 8),
+    ('The {noun} of {place}', 8),
+    ('{adj} {noun}s', 8),
+    ('{subject}: A {adj} Guide', 6),
+    ('{adj} {subject}', 6),
+    ('The {adj} {noun} and the {noun}', 5),
+    ('{noun}', 4),
+    ('Letters from {place}', 3),
+    ('{adj} {noun}, Book {n}', 3),
+]
+
+
+def _zipf_cum_weights(n: int, s: float) -> List[float]:
+    """Cumulative weights for ranks 1..n with weight 1 / rank**s."""
+    return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def _isbn13(serial: int) -> str:
+    """A valid ISBN-13 in the 978 range for the given serial number."""
+    body = f"978{serial:09d}"
+    total = sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+def _make_title(rng: random.Random, templates, cum_weights) -> str:
+    template = templates[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+    return template.format(adj=rng.choice(ADJECTIVES), noun=rng.choice(NOUNS),
+                           place=rng.choice(PLACES), subject=rng.choice(SUBJECTS),
+                           n=rng.randint(2, 9))
+
+
+def generate_library(path: str, n_books: int, n_patrons: int, n_loans: int, seed: int = 327,
+                     now: Optional[datetime] = None, history_days: int = 5 * 365,
+                     zipf_s: float = 1.05, batch_size: int = 50_000, progress: bool = False) -> Dict:
+    """
+    Create the schema in path and fill it with a synthetic catalog and loan history.
+
+    Args:
+        path: SQLite file to write (tables are created if missing)
+        n_books: Number of books
+        n_patrons: Number of distinct patron IDs (at most 900000)
+        n_loans: Number of borrow records
+        seed: Random seed; the same seed and now give the same data
+        now: Reference time for loan dates (default: today at midnight)
+        history_days: How far back borrow dates go
+        zipf_s: Skew of book popularity; higher means a heavier head
+        batch_size: Rows per executemany batch
+        progress: Print progress to stderr
+
+    Returns:
+        Dict with counts of books, loans, active loans and overdue loans
+    """
+    if not 0 < n_patrons <= 900_000:
+        raise ValueError("n_patrons must be between 1 and 900000 (6-digit patron IDs).")
+    rng = random.Random(seed)
+    if now is None:
+        now = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    original = database.DATABASE
+    database.DATABASE = path
+    try:
+        database.init_database()
+    finally:
+        database.DATABASE = original
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    started = time.perf_counter()
+
+    def log(message):
+        if progress:
+            print(f"[{time.perf_counter() - started:7.1f}s] {message}", file=sys.stderr)
+
+    # Authors: a pool where a few names are very prolific
+    n_authors = max(1, n_books // 8)
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(n_authors)]
+    author_weights = _zipf_cum_weights(n_authors, 0.9)
+    templates = [template for template, _ in TITLE_TEMPLATES]
+    template_weights = list(itertools.accumulate(weight for _, weight in TITLE_TEMPLATES))
+
+    # Book popularity: popular ranks are assigned to random book IDs
+    popularity = list(range(1, n_books + 1))
+    rng.shuffle(popularity)
+    book_weights = _zipf_cum_weights(n_books, zipf_s)
+    # Popular books get more copies
+    total_copies = [0] * (n_books + 1)
+    for rank, book_id in enumerate(popularity, start=1):
+        total_copies[book_id] = 1 + min(9, int(40 / rank ** 0.5)) + (rng.random() < 0.3)
+
+    if conn.execute('SELECT COUNT(*) FROM books').fetchone()[0]:
+        conn.close()
+        raise ValueError(f"{path} already contains books; generate into an empty database.")
+
+    # A generated library starts with an empty change log, and the cache versions
+    # are bumped once rather than per row; the triggers come back at the end
+    database.drop_change_log_triggers(conn)
+    database.drop_cache_version_triggers(conn)
+    conn.execute('BEGIN')
+    batch = []
+    for book_id in range(1, n_books + 1):
+        title = _make_title(rng, templates, template_weights)
+        author = authors[bisect.bisect(author_weights, rng.random() * author_weights[-1])]
+        copies = total_copies[book_id]
+        batch.append((book_id, title, author, _isbn13(book_id), copies, copies))
+        if len(batch) >= batch_size or book_id == n_books:
+            conn.executemany('''
+                INSERT INTO books (id, title, author, isbn, total_copies, available_copies)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch)
+            batch = []
+            log(f"inserted {book_id} books")
+
+    # Loans are generated oldest first, so the history is in borrow date order
+    patron_ids = [str(100000 + i) for i in range(n_patrons)]
+    rng.shuffle(patron_ids)
+    patron_weights = _zipf_cum_weights(n_patrons, 0.8)
+    ages = sorted((rng.random() * history_days for _ in range(n_loans)), reverse=True)
+    active_per_book = {}
+    active_per_patron = {}
+    active_pairs = set()
+    patrons_seen = set()
+    active_count = overdue_count = 0
+    for count, age_days in enumerate(ages, start=1):
+        book_id = popularity[bisect.bisect(book_weights, rng.random() * book_weights[-1])]
+        patron_id = patron_ids[bisect.bisect(patron_weights, rng.random() * patron_weights[-1])]
+        patrons_seen.add(patron_id)
+        borrow_date = now - timedelta(days=age_days)
+        due_date = borrow_date + timedelta(days=LOAN_DAYS)
+        return_date = None
+        still_out = (age_days < ACTIVE_WINDOW_DAYS and rng.random() < 0.6
+                     and active_per_book.get(book_id, 0) < total_copies[book_id]
+                     and active_per_patron.get(patron_id, 0) < MAX_ACTIVE_PER_PATRON
+                     and (patron_id, book_id) not in active_pairs)
+        if still_out:
+            active_pairs.add((patron_id, book_id))
+            active_per_book[book_id] = active_per_book.get(book_id, 0) + 1
+            active_per_patron[patron_id] = active_per_patron.get(patron_id, 0) + 1
+            active_count += 1
+            overdue_count += due_date < now
+        else:
+            # Most loans come back around the due date, some late
+            kept_days = min(age_days, max(0.1, rng.gauss(LOAN_DAYS - 3, 6)))
+            return_date = (borrow_date + timedelta(days=kept_days)).isoformat()
+        batch.append((patron_id, book_id, borrow_date.isoformat(), due_date.isoformat(), return_date))
+        if len(batch) >= batch_size or count == n_loans:
+            conn.executemany('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch)
+            batch = []
+            log(f"inserted {count} loans")
+
+    conn.executemany('UPDATE books SET available_copies = total_copies - ? WHERE id = ?',
+                     [(active, book_id) for book_id, active in active_per_book.items()])
+    database.create_change_log_triggers(conn)
+    database.create_cache_version_triggers(conn)
+    database.bump_cache_versions(conn)
+    conn.commit()
+    conn.close()
+    log('done')
+
+    return {
+        'books': n_books,
+        'patrons': len(patrons_seen),
+        'loans': n_loans,
+        'active_loans': active_count,
+        'overdue_loans': overdue_count,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a synthetic library database.')
+    parser.add_argument('path', help='SQLite file to create')
+    parser.add_argument('--scale', choices=sorted(PRESETS), help='Preset sizes (overridden by explicit counts)')
+    parser.add_argument('--books', type=int)
+    parser.add_argument('--patrons', type=int)
+    parser.add_argument('--loans', type=int)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--now', type=datetime.fromisoformat,
+                        help='Reference date for loans (ISO format, default today)')
+    parser.add_argument('--history-days', type=int, default=5 * 365)
+    parser.add_argument('--zipf', type=float, default=1.05, help='Book popularity skew')
+    parser.add_argument('--force', action='store_true', help='Replace an existing file')
+    args = parser.parse_args(argv)
+
+    books, patrons, loans = PRESETS[args.scale or '1k']
+    books = args.books or books
+    patrons = args.patrons or patrons
+    loans = args.loans if args.loans is not None else loans
+
+    if os.path.exists(args.path):
+        if not args.force:
+            parser.error(f"{args.path} exists; use --force to replace it")
+        os.remove(args.path)
+
+    counts = generate_library(args.path, books, patrons, loans, seed=args.seed, now=args.now,
+                              history_days=args.history_days, zipf_s=args.zipf, progress=True)
+    print(', '.join(f"{name}: {value}" for name, value in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Group Commit Module - Batch circulation writes into shared transactions
+
+Every borrow and return used to commit on its own, so at peak desk traffic
+the write rate is bounded by how fast SQLite can sync a commit to disk. With
+group commit enabled, every circulation write in database.py
+(decrement_book_availability(), update_book_availability(),
+insert_borrow_record() and update_borrow_record_return_date()) hands its
+statement to a single writer thread instead, so neither half of a borrow or
+return commits on its own. The writer collects the statements that arrive
+within max_delay (up to max_batch_size of them), runs them in one transaction
+and commits once, then wakes every waiting caller. Each statement runs in its
+own savepoint, so one failing write (say, a duplicate active loan) doesn't
+fail the rest of its batch.
+
+Callers still return only after their write is committed, so a request can
+read its own writes as before; each one just waits up to max_delay longer.
+
+Configuration (environment):
+    LIBRARY_GROUP_COMMIT               set to 1 to enable
+    LIBRARY_GROUP_COMMIT_MAX_BATCH     statements per transaction (default 64)
+    LIBRARY_GROUP_COMMIT_MAX_DELAY_MS  how long to collect a batch (default 2)
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import database
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_DELAY_MS = 2.0
+
+
+class _Write:
+    """A statement waiting for its batch to commit."""
+
+    __slots__ = ('sql', 'params', 'rowcount', 'error', 'done')
+
+    def __init__(self, sql: str, params: tuple):
+        self.sql = sql
+        self.params = params
+        self.rowcount = 0
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits queued statements in batches.
+
+    The thread is started on first use in each process, so a writer created
+    before a pre-fork server forks its workers works in every worker.
+    """
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_delay_ms: float = DEFAULT_MAX_DELAY_MS):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.batches = 0
+        self.writes = 0
+        self._queue: Optional[queue.Queue] = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> queue.Queue:
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,), name='group-commit',
+                                     daemon=True).start()
+                    self._pid = os.getpid()
+        return self._queue
+
+    def execute(self, sql: str, params: tuple = ()) -> int:
+        """
+        Run a write statement in the next batch and wait until it is committed.
+
+        Returns:
+            The statement's rowcount
+
+        Raises:
+            sqlite3.Error: If the statement or its batch's commit failed
+        """
+        write = _Write(sql, params)
+        self._ensure_started().put(write)
+        write.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.rowcount
+
+    def stop(self):
+        """Commit what is queued and stop the writer thread (it restarts on the next write)."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                stopped = _Write('', ())
+                self._queue.put(stopped)
+                stopped.done.wait()
+                self._pid = None
+
+    def _collect(self, writes: queue.Queue, first: _Write) -> List[_Write]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                write = writes.get(timeout=timeout) if timeout > 0 else writes.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(write)
+            if not write.sql:
+                break
+        return batch
+
+    def _run(self, writes: queue.Queue):
+        while True:
+            batch = self._collect(writes, writes.get())
+            stopping = not batch[-1].sql
+            if stopping:
+                stop = batch.pop()
+            if batch:
+                self._commit(batch)
+            if stopping:
+                stop.done.set()
+                return
+
+    def _commit(self, batch: List[_Write]):
+        conn = database.get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for write in batch:
+                conn.execute('SAVEPOINT group_write')
+                try:
+                    write.rowcount = conn.execute(write.sql, write.params).rowcount
+                except sqlite3.Error as e:
+                    conn.execute('ROLLBACK TO group_write')
+                    write.error = e
+                conn.execute('RELEASE group_write')
+            conn.commit()
+            self.batches += 1
+            self.writes += len(batch)
+        except sqlite3.Error as e:
+            # Nothing in the batch was committed
+            for write in batch:
+                write.error = write.error or e
+        finally:
+            conn.close()
+            for write in batch:
+                write.done.set()
+
+
+def enable_group_commit(max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                        max_delay_ms: float = DEFAULT_MAX_DELAY_MS) -> GroupCommitWriter:
+    """Route circulation writes in database.py through a new group commit writer."""
+    disable_group_commit()
+    writer = GroupCommitWriter(max_batch_size, max_delay_ms)
+    database.GROUP_COMMIT_WRITER = writer
+    return writer
+
+
+def disable_group_commit():
+    """Go back to committing every write on its own."""
+    writer, database.GROUP_COMMIT_WRITER = database.GROUP_COMMIT_WRITER, None
+    if writer is not None:
+        writer.stop()
+
+
+def init_group_commit() -> Optional[GroupCommitWriter]:
+    """
+    Enable group commit if LIBRARY_GROUP_COMMIT is set.
+
+    Returns:
+        The writer, or None if group commit is not enabled
+    """
+    if os.environ.get('LIBRARY_GROUP_COMMIT', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    return enable_group_commit(
+        int(os.environ.get('LIBRARY_GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH_SIZE)),
+        float(os.environ.get('LIBRARY_GROUP_COMMIT_MAX_DELAY_MS', DEFAULT_MAX_DELAY_MS)))
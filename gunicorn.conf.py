@@ -0,0 +1,26 @@
+"""
+Gunicorn settings for the Library Management System.
+
+Multi-process, multi-threaded workers with the app preloaded before forking.
+Every setting can be overridden through the environment:
+
+    LIBRARY_BIND          address to listen on (default 0.0.0.0:5000)
+    LIBRARY_WORKERS       worker processes (default 2 x CPUs + 1)
+    LIBRARY_THREADS       threads per worker (default 4)
+    LIBRARY_TIMEOUT       seconds before a silent worker is restarted (default 30)
+    LIBRARY_MAX_REQUESTS  restart a worker after this many requests (default 0, never)
+    LIBRARY_ACCESS_LOG    set to 1 to log every request to stdout
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('LIBRARY_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('LIBRARY_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('LIBRARY_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('LIBRARY_TIMEOUT', 30))
+max_requests = int(os.environ.get('LIBRARY_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = '-' if os.environ.get('LIBRARY_ACCESS_LOG') == '1' else None
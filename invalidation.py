@@ -0,0 +1,139 @@
+"""
+Invalidation Bus - Tell every worker process when its cached book data is stale
+
+Under a pre-forking server each worker has its own in-process caches, and a
+borrow handled by one worker must reach the caches of all the others. The
+workers share nothing but the database, so that is where the signal lives:
+triggers on books bump counters in the cache_versions table ('catalog' when
+a book is added or its details change, 'availability' when its
+available_copies change; see database.CACHE_VERSIONS).
+
+Each process polls those counters, at most once every poll_interval seconds
+and only when a cache is actually read, so idle workers cost nothing and no
+thread or socket has to survive the fork. Writes made by the process itself
+(database.BOOK_WRITES) skip the wait, so a worker always reads its own
+writes. When the availability counter moves, the bus reads the books
+entries of change_log since its last poll and hands the changed book IDs to
+its listeners, so a cache drops just those books instead of everything.
+
+    bus = get_bus()
+    bus.subscribe(lambda changed, book_ids: ...)
+    bus.poll()
+
+Caches built on the bus (services/book_cache.py) are stale for at most
+poll_interval seconds after another process writes. The bus works with the
+SQLite backend only.
+
+Configuration (environment):
+    LIBRARY_CACHE_POLL_SECONDS   seconds between polls (default 0.1)
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import database
+
+DEFAULT_POLL_SECONDS = 0.1
+
+# More changed books than this in one poll and listeners are told to drop everything
+MAX_CHANGED_BOOKS = 10_000
+
+Listener = Callable[[Set[str], Optional[List[int]]], None]
+
+
+class InvalidationBus:
+    """Polls cache_versions and notifies listeners of the versions and books that changed."""
+
+    def __init__(self, poll_interval: float = DEFAULT_POLL_SECONDS):
+        self.poll_interval = poll_interval
+        self.versions: Dict[str, int] = {}
+        self.change_id = 0
+        self.polls = 0
+        self._listeners: List[Listener] = []
+        self._last_poll = float('-inf')
+        self._book_writes = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Listener):
+        """
+        Call listener(changed, book_ids) whenever a poll finds new versions.
+
+        changed is the set of CACHE_VERSIONS names that moved. book_ids lists
+        the books whose rows changed since the previous poll, or is None when
+        the bus can't tell which, in which case anything depending on the
+        changed versions is stale.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener):
+        """Stop notifying listener."""
+        self._listeners.remove(listener)
+
+    def poll(self, force: bool = False) -> Set[str]:
+        """
+        Check cache_versions, unless this process polled within poll_interval and hasn't written since.
+
+        Returns:
+            The names of the versions that changed since the previous poll
+        """
+        with self._lock:
+            now = time.monotonic()
+            book_writes = database.BOOK_WRITES
+            if not force and book_writes == self._book_writes and now - self._last_poll < self.poll_interval:
+                return set()
+            self._last_poll = now
+            self._book_writes = book_writes
+            self.polls += 1
+
+            versions = database.get_cache_versions()
+            if not self.versions:
+                # First poll: whatever was cached so far was read before it
+                self.versions = versions
+                self.change_id = database.get_last_change_id()
+                changed = set(versions)
+                book_ids = None
+            else:
+                changed = {name for name, version in versions.items() if self.versions.get(name) != version}
+                self.versions = versions
+                book_ids = self._changed_books() if changed else []
+            if changed:
+                for listener in self._listeners:
+                    listener(changed, book_ids)
+            return changed
+
+    def _changed_books(self) -> Optional[List[int]]:
+        # Read after the versions, so every change they count is included
+        changes = database.get_changes_after(self.change_id, MAX_CHANGED_BOOKS + 1)
+        if not changes:
+            return []
+        gap = changes[0].id != self.change_id + 1
+        self.change_id = changes[-1].id
+        if gap or len(changes) > MAX_CHANGED_BOOKS:
+            # Entries were pruned before this process read them, or too many to list
+            self.change_id = database.get_last_change_id()
+            return None
+        return sorted({change.row_id for change in changes if change.table_name == 'books'})
+
+    def version(self, name: str) -> int:
+        """The current value of a cache_versions counter, polling first if due."""
+        self.poll()
+        return self.versions[name]
+
+
+_bus: Optional[InvalidationBus] = None
+
+
+def get_bus() -> InvalidationBus:
+    """This process's bus, created on first use with LIBRARY_CACHE_POLL_SECONDS."""
+    global _bus
+    if _bus is None:
+        _bus = InvalidationBus(float(os.environ.get('LIBRARY_CACHE_POLL_SECONDS', DEFAULT_POLL_SECONDS)))
+    return _bus
+
+
+def reset_bus():
+    """Forget the bus, e.g. after pointing database.DATABASE at another file."""
+    global _bus
+    _bus = None
@@ -0,0 +1,152 @@
+"""
+JSON Provider - Fast JSON encoding for API responses
+
+Flask's default provider runs every response through the stdlib json module,
+which turns each row model into a dict (dataclasses.asdict) before encoding
+it. FastJSONProvider encodes with orjson when it is installed, which
+serializes the slotted row models in models.py natively, and otherwise falls
+back to the stdlib json module with a hook that reads the models' fields
+directly. The output is the same as Flask's for the types this app returns:
+dates are RFC 822 strings, dict keys are sorted (orjson keeps row model
+fields in column order), and Decimal, UUID and Markup values are converted
+the same way.
+
+Large arrays can be streamed instead of encoded into one body: see
+stream_json_object() and FastJSONProvider.stream_response().
+
+Configuration (environment):
+    LIBRARY_JSON_ENCODER   'orjson' or 'stdlib' (default: orjson if installed)
+"""
+
+import json
+import os
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+from flask.json.provider import DefaultJSONProvider
+
+from models import RowMapping
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+STREAM_CHUNK_SIZE = 1000
+
+
+def json_default(obj: Any) -> Any:
+    """default= hook for the stdlib encoder: row models by field, everything else like Flask."""
+    if isinstance(obj, RowMapping):
+        return obj.to_dict()
+    return DefaultJSONProvider.default(obj)
+
+
+def _orjson_default(obj: Any) -> Any:
+    # Dates are passed through to here so they match Flask's format
+    return DefaultJSONProvider.default(obj)
+
+
+def _dumps_stdlib(obj: Any, sort_keys: bool = True, indent: bool = False) -> bytes:
+    if indent:
+        text = json.dumps(obj, default=json_default, sort_keys=sort_keys, indent=2)
+    else:
+        text = json.dumps(obj, default=json_default, sort_keys=sort_keys, separators=(',', ':'))
+    return text.encode('utf-8')
+
+
+def _dumps_orjson(obj: Any, sort_keys: bool = True, indent: bool = False) -> bytes:
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_orjson_default, option=option)
+
+
+ENCODERS: Dict[str, Callable[..., bytes]] = {'stdlib': _dumps_stdlib}
+if orjson is not None:
+    ENCODERS['orjson'] = _dumps_orjson
+
+
+def get_encoder(name: str = None) -> Callable[..., bytes]:
+    """
+    Look up an encoder by name.
+
+    Args:
+        name: 'orjson' or 'stdlib'; defaults to LIBRARY_JSON_ENCODER, then orjson if installed
+
+    Returns:
+        A function (obj, sort_keys=True, indent=False) -> UTF-8 JSON bytes
+    """
+    name = name or os.environ.get('LIBRARY_JSON_ENCODER') or ('orjson' if orjson is not None else 'stdlib')
+    try:
+        return ENCODERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable JSON encoder {name!r}; choose from {sorted(ENCODERS)}")
+
+
+def dumps(obj: Any, sort_keys: bool = True, indent: bool = False) -> bytes:
+    """Encode obj as UTF-8 JSON bytes with the configured encoder."""
+    return get_encoder()(obj, sort_keys, indent)
+
+
+def stream_json_object(fields: Dict, array_key: str, items: Iterable, encoder: Callable[..., bytes] = None,
+                       chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode {**fields, array_key: [*items]} piece by piece.
+
+    The fields come first, then the array chunk_size items at a time, so a
+    large result set is never held as one encoded body.
+
+    Args:
+        fields: The other members of the object (small values)
+        array_key: Name of the array member, which is written last
+        items: Elements of the array
+        encoder: Encoder from get_encoder(); the configured one by default
+
+    Yields:
+        UTF-8 JSON fragments that concatenate to one object
+    """
+    encoder = encoder or get_encoder()
+    head = encoder(fields)
+    yield head[:-1] + (b',' if fields else b'') + encoder(array_key) + b':['
+    items = iter(items)
+    separator = b''
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            break
+        yield separator + encoder(chunk)[1:-1]
+        separator = b','
+    yield b']}'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by get_encoder(); install with app.json = FastJSONProvider(app)."""
+
+    def __init__(self, app, encoder: str = None):
+        super().__init__(app)
+        self.encoder = get_encoder(encoder)
+
+    def _indent(self) -> bool:
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            # Custom json.dumps arguments, e.g. from flask.json.dumps(obj, indent=4)
+            kwargs.setdefault('default', json_default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.encoder(obj, self.sort_keys).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = self.encoder(obj, self.sort_keys, self._indent())
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+    def stream_response(self, fields: Dict, array_key: str, items: Iterable):
+        """A streamed response of {**fields, array_key: [*items]} (see stream_json_object)."""
+        chunks = stream_json_object(fields, array_key, items, self.encoder)
+        return self._app.response_class(chunks, mimetype=self.mimetype)
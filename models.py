@@ -0,0 +1,173 @@
+"""
+Row Models - Compact row types for books and borrow records
+
+The database readers used to turn every sqlite3.Row into a fresh dict, and
+listings then copied those into more dicts. These __slots__ dataclasses are
+built straight from the cursor by a row factory, take a fraction of a dict's
+memory, and still behave like the dicts they replace: book['title'],
+book.get('isbn'), 'id' in book, dict(book), ** unpacking, equality with a
+plain dict, Jinja's book.title and Flask's jsonify all work (json_provider.py
+encodes them without the dict copy).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+
+class RowMapping:
+    """Read/write dict-style access to the fields of a slotted dataclass row."""
+
+    __slots__ = ()
+
+    # Field names, in column order; set by _row_model
+    _keys: Tuple[str, ...] = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._keys:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+
+    def values(self):
+        return [getattr(self, key) for key in self._keys]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self._keys]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (RowMapping, Mapping)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self._keys}
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple):
+        """sqlite3 row factory; the query must select the fields in declaration order."""
+        return cls(*row)
+
+
+def _row_model(cls):
+    """
+    Make cls a dataclass whose fields are its mapping keys.
+
+    Each row class declares its own __slots__, listing its fields in
+    order: dataclass(slots=True) needs Python 3.10.
+    """
+    cls = dataclass(eq=False)(cls)
+    cls._keys = tuple(cls.__dataclass_fields__)
+    if cls.__slots__ != cls._keys:
+        raise TypeError(f"{cls.__name__}.__slots__ must list its fields in order")
+    return cls
+
+
+@_row_model
+class Book(RowMapping):
+    """A row of the books table."""
+
+    __slots__ = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+
+    id: int
+    title: str
+    author: str
+    isbn: str
+    total_copies: int
+    available_copies: int
+
+
+@_row_model
+class CatalogBook(RowMapping):
+    """A book as listed in the catalog, with whether it can be borrowed right now."""
+
+    __slots__ = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies', 'borrowable')
+
+    id: int
+    title: str
+    author: str
+    isbn: str
+    total_copies: int
+    available_copies: int
+    borrowable: bool
+
+
+@_row_model
+class BorrowRecord(RowMapping):
+    """A borrow record of a known patron. Dates are ISO 8601 strings; return_date is None while active."""
+
+    __slots__ = ('id', 'book_id', 'borrow_date', 'due_date', 'return_date')
+
+    id: int
+    book_id: int
+    borrow_date: str
+    due_date: str
+    return_date: Optional[str]
+
+
+@_row_model
+class BorrowedBook(RowMapping):
+    """A book a patron currently has out, with parsed dates."""
+
+    __slots__ = ('book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue')
+
+    book_id: int
+    title: str
+    author: str
+    borrow_date: datetime
+    due_date: datetime
+    is_overdue: bool
+
+    @classmethod
+    def row_factory(cls, cursor, row: tuple):
+        """Build from (book_id, title, author, borrow_date, due_date) with ISO 8601 dates."""
+        book_id, title, author, borrow_date, due_date = row
+        due_date = datetime.fromisoformat(due_date)
+        return cls(book_id, title, author, datetime.fromisoformat(borrow_date), due_date,
+                   datetime.now() > due_date)
+
+
+@_row_model
+class Change(RowMapping):
+    """
+    An entry of change_log: operation is 'insert', 'update', 'delete' or
+    'archive' (a borrow record moved to borrow_records_archive); changed_at
+    is an ISO 8601 UTC timestamp.
+    """
+
+    __slots__ = ('id', 'table_name', 'row_id', 'operation', 'changed_at')
+
+    id: int
+    table_name: str
+    row_id: int
+    operation: str
+    changed_at: str
+
+
+BOOK_COLUMNS = ', '.join(Book._keys)
+BORROW_RECORD_COLUMNS = ', '.join(BorrowRecord._keys)
+CHANGE_COLUMNS = ', '.join(Change._keys)
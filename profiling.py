@@ -0,0 +1,358 @@
+"""
+Profiling Module - Opt-in per-request profiling for the Flask app
+
+Wraps the WSGI app so that a sampled fraction of requests runs under cProfile,
+and any request that runs past a latency threshold gets its stack sampled
+while it is still in flight. Every capture also lists the SQL statements the
+request executed (see database.trace_queries) and is written as one JSON file
+to a capture directory that only keeps the newest files.
+
+Enable it with environment variables read by create_app():
+    LIBRARY_PROFILE_SAMPLE_RATE  fraction of requests to cProfile (0.0 - 1.0)
+    LIBRARY_PROFILE_SLOW_MS      stack-sample requests slower than this
+    LIBRARY_PROFILE_DIR          capture directory (default: profiles)
+    LIBRARY_PROFILE_MAX_FILES    captures kept before the oldest are removed
+    LIBRARY_SQL_TRACE            record per-request SQL and report it in headers
+
+Summarize captures from the command line:
+    python profiling.py summarize profiles --top 20
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+from database import trace_queries
+
+DEFAULT_PROFILE_DIR = 'profiles'
+DEFAULT_MAX_FILES = 200
+STACK_SAMPLE_INTERVAL = 0.005  # seconds between stack samples of a slow request
+
+
+def _frame_label(code) -> str:
+    """Format a code object as 'file:line(function)' like pstats does."""
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+
+class _SlowRequestSampler(threading.Thread):
+    """
+    Background thread that samples the stacks of requests past the threshold.
+
+    Fast requests only pay for registering and unregistering themselves; the
+    stack of a request is sampled once it has been running for longer than
+    the threshold, until it finishes.
+    """
+
+    def __init__(self, threshold: float, interval: float = STACK_SAMPLE_INTERVAL):
+        super().__init__(name='slow-request-sampler', daemon=True)
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._in_flight = {}  # thread id -> (start time, Counter of stacks)
+
+    def begin(self, thread_id: int) -> Counter:
+        samples = Counter()
+        with self._lock:
+            self._in_flight[thread_id] = (time.perf_counter(), samples)
+        return samples
+
+    def end(self, thread_id: int):
+        with self._lock:
+            self._in_flight.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            # Sample under the lock so a finished request's Counter is never
+            # written to after end() returns
+            with self._lock:
+                slow = [(tid, samples) for tid, (start, samples) in self._in_flight.items()
+                        if now - start >= self.threshold]
+                if not slow:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in slow:
+                    frame = frames.get(thread_id)
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        samples[';'.join(reversed(stack))] += 1
+
+
+class ProfilingMiddleware:
+    """
+    WSGI middleware that captures profiles for sampled and slow requests.
+
+    Timing stops when the wrapped app returns its response, so streamed
+    response bodies are not included.
+    """
+
+    def __init__(self, wsgi_app, output_dir: str = DEFAULT_PROFILE_DIR,
+                 sample_rate: float = 0.0, slow_threshold_ms: Optional[float] = None,
+                 max_files: int = DEFAULT_MAX_FILES):
+        """
+        Args:
+            wsgi_app: WSGI application to wrap
+            output_dir: Directory captures are written to
+            sample_rate: Fraction of requests to run under cProfile
+            slow_threshold_ms: Capture stack samples for requests slower than this
+            max_files: Number of captures kept in output_dir
+        """
+        self.wsgi_app = wsgi_app
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000.0 if slow_threshold_ms else None
+        self.max_files = max_files
+        # Only one cProfile profiler can be active at a time on newer Pythons
+        self._profile_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._sampler = None
+        self._sampler_pid = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _get_sampler(self) -> Optional[_SlowRequestSampler]:
+        """
+        The sampler thread for this process, started on first use.
+
+        Threads do not survive a fork, so a sampler started in a preloading
+        master would never run in the workers.
+        """
+        if self.slow_threshold is None:
+            return None
+        if self._sampler_pid != os.getpid():
+            with self._write_lock:
+                if self._sampler_pid != os.getpid():
+                    self._sampler = _SlowRequestSampler(self.slow_threshold)
+                    self._sampler.start()
+                    self._sampler_pid = os.getpid()
+        return self._sampler
+
+    def __call__(self, environ, start_response):
+        status_holder = {}
+
+        def capture_status(status, headers, *args):
+            status_holder['status'] = status
+            return start_response(status, headers, *args)
+
+        profiler = None
+        if self.sample_rate > 0 and random.random() < self.sample_rate \
+                and self._profile_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+
+        sampler = self._get_sampler()
+        thread_id = threading.get_ident()
+        samples = sampler.begin(thread_id) if sampler else None
+        started = time.perf_counter()
+        try:
+            with trace_queries() as statements:
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.wsgi_app(environ, capture_status)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            duration = time.perf_counter() - started
+            if sampler:
+                sampler.end(thread_id)
+            if profiler is not None:
+                self._profile_lock.release()
+
+        is_slow = self.slow_threshold is not None and duration >= self.slow_threshold
+        if profiler is not None or is_slow:
+            capture = {
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query_string': environ.get('QUERY_STRING', ''),
+                'status': status_holder.get('status'),
+                'timestamp': time.time(),
+                'duration_ms': round(duration * 1000, 3),
+                'slow': is_slow,
+                'sql': [{'statement': sql, 'ms': round(seconds * 1000, 3)}
+                        for sql, seconds in statements],
+            }
+            if profiler is not None:
+                capture['functions'] = _profile_functions(profiler)
+            if samples:
+                capture['stack_samples'] = dict(samples)
+            self._write_capture(capture)
+        return response
+
+    def _write_capture(self, capture: Dict):
+        """Write one capture file and drop the oldest beyond max_files."""
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.json"
+        with self._write_lock:
+            with open(os.path.join(self.output_dir, name), 'w') as f:
+                json.dump(capture, f)
+            captures = sorted(_capture_files(self.output_dir), key=os.path.getmtime)
+            for old in captures[:max(0, len(captures) - self.max_files)]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+
+def _profile_functions(profiler: cProfile.Profile, limit: int = 50) -> List[Dict]:
+    """Top functions of a profile by cumulative time."""
+    stats = pstats.Stats(profiler)
+    functions = []
+    for (filename, line, name), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+        functions.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'calls': ncalls,
+            'tottime': tottime,
+            'cumtime': cumtime,
+        })
+    functions.sort(key=lambda f: f['cumtime'], reverse=True)
+    return functions[:limit]
+
+
+def _capture_files(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in os.listdir(directory)
+            if name.endswith('.json')]
+
+
+def init_profiling(app):
+    """
+    Wrap app.wsgi_app with ProfilingMiddleware if profiling is configured.
+
+    Reads the LIBRARY_PROFILE_* environment variables; with neither a sample
+    rate nor a slow threshold set the app is left untouched.
+    """
+    sample_rate = float(os.environ.get('LIBRARY_PROFILE_SAMPLE_RATE', '0') or 0)
+    slow_ms = os.environ.get('LIBRARY_PROFILE_SLOW_MS')
+    slow_threshold_ms = float(slow_ms) if slow_ms else None
+    if sample_rate <= 0 and slow_threshold_ms is None:
+        return
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        output_dir=os.environ.get('LIBRARY_PROFILE_DIR', DEFAULT_PROFILE_DIR),
+        sample_rate=sample_rate,
+        slow_threshold_ms=slow_threshold_ms,
+        max_files=int(os.environ.get('LIBRARY_PROFILE_MAX_FILES', DEFAULT_MAX_FILES)),
+    )
+
+
+def init_query_tracing(app):
+    """
+    Record the SQL statements of every request if LIBRARY_SQL_TRACE is set.
+
+    The statements of the current request are available as g.sql_statements,
+    and responses carry X-SQL-Queries and X-SQL-Time-Ms headers.
+    """
+    if os.environ.get('LIBRARY_SQL_TRACE', '').lower() not in ('1', 'true', 'yes'):
+        return
+
+    from flask import g
+
+    @app.before_request
+    def _start_query_trace():
+        g.sql_trace = trace_queries()
+        g.sql_statements = g.sql_trace.__enter__()
+
+    @app.after_request
+    def _report_query_trace(response):
+        statements = g.get('sql_statements')
+        if statements is not None:
+            total_ms = sum(seconds for _, seconds in statements) * 1000
+            response.headers['X-SQL-Queries'] = str(len(statements))
+            response.headers['X-SQL-Time-Ms'] = f"{total_ms:.3f}"
+        return response
+
+    @app.teardown_request
+    def _stop_query_trace(exc):
+        trace = g.pop('sql_trace', None)
+        if trace is not None:
+            trace.__exit__(None, None, None)
+
+
+def summarize_captures(directory: str, top: int = 20) -> Dict:
+    """
+    Aggregate the hottest functions and SQL statements across captures.
+
+    Functions are ranked by cumulative time from cProfile captures and by the
+    number of stack samples they appear in from slow-request captures.
+
+    Returns:
+        Dict with 'captures', 'functions', 'stack_functions' and 'queries'
+    """
+    cumtime = Counter()
+    calls = Counter()
+    stack_hits = Counter()
+    query_time = Counter()
+    query_count = Counter()
+    total = 0
+
+    for path in _capture_files(directory):
+        try:
+            with open(path) as f:
+                capture = json.load(f)
+        except (OSError, ValueError):
+            continue
+        total += 1
+        for func in capture.get('functions', []):
+            cumtime[func['function']] += func['cumtime']
+            calls[func['function']] += func['calls']
+        for stack, count in capture.get('stack_samples', {}).items():
+            # Count each function once per sample, even if it recursed
+            for label in set(stack.split(';')):
+                stack_hits[label] += count
+        for query in capture.get('sql', []):
+            statement = ' '.join(query['statement'].split())
+            query_time[statement] += query['ms']
+            query_count[statement] += 1
+
+    return {
+        'captures': total,
+        'functions': [{'function': name, 'cumtime': round(seconds, 6), 'calls': calls[name]}
+                      for name, seconds in cumtime.most_common(top)],
+        'stack_functions': [{'function': name, 'samples': count}
+                            for name, count in stack_hits.most_common(top)],
+        'queries': [{'statement': statement, 'total_ms': round(ms, 3), 'count': query_count[statement]}
+                    for statement, ms in query_time.most_common(top)],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize request profiling captures.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summarize = subparsers.add_parser('summarize', help='Show the hottest functions and queries')
+    summarize.add_argument('directory', nargs='?', default=DEFAULT_PROFILE_DIR)
+    summarize.add_argument('--top', type=int, default=20)
+    summarize.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args(argv)
+
+    summary = summarize_captures(args.directory, args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    print(f"{summary['captures']} captures in {args.directory}\n")
+    print('Hottest functions (cProfile, cumulative seconds):')
+    for func in summary['functions']:
+        print(f"  {func['cumtime']:10.4f}s  {func['calls']:8d} calls  {func['function']}")
+    print('\nHottest functions (slow-request stack samples):')
+    for func in summary['stack_functions']:
+        print(f"  {func['samples']:8d} samples  {func['function']}")
+    print('\nHottest queries (total ms):')
+    for query in summary['queries']:
+        print(f"  {query['total_ms']:10.3f}ms  {query['count']:6d}x  {query['statement'][:100]}")
+
+
+if __name__ == '__main__':
+    main()
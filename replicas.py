@@ -0,0 +1,142 @@
+"""
+Read Replicas Module - Snapshot replicas of the library database
+
+The read-only helpers in database.py (catalog listing, book lookups, search
+and patron history) read from database.READ_REPLICAS when any are configured.
+This module keeps those replicas fresh by copying the primary with SQLite's
+online backup API on a schedule, and decides per request whether reads may
+go to a replica at all.
+
+Writes always go to the primary. Because replicas lag by up to one refresh
+interval, a request reads from the primary when:
+    - it is not a GET/HEAD request (borrow, return, add book), or
+    - it sends an `X-Read-Your-Writes: 1` header or `read_your_writes=1` arg, or
+    - the same client made a write within the last LIBRARY_READ_YOUR_WRITES_SECONDS
+      (so the catalog page shown after a borrow includes the borrow).
+
+Configuration (environment):
+    LIBRARY_READ_REPLICAS             comma-separated replica file paths
+    LIBRARY_REPLICA_REFRESH_SECONDS   refresh interval (default 5)
+    LIBRARY_READ_YOUR_WRITES_SECONDS  primary-read window after a write
+                                      (default: twice the refresh interval)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import database
+
+DEFAULT_REFRESH_SECONDS = 5.0
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_read_replicas(replicas: Optional[List[str]] = None) -> int:
+    """
+    Copy the primary database over each replica.
+
+    Each copy is made into a temporary file next to the replica and then
+    renamed over it, so readers always open a complete snapshot.
+
+    Returns:
+        Number of replicas refreshed
+    """
+    replicas = database.READ_REPLICAS if replicas is None else replicas
+    if not replicas:
+        return 0
+    source = sqlite3.connect(database.DATABASE)
+    try:
+        for replica in replicas:
+            temp_path = f"{replica}.refresh-{os.getpid()}"
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                # Snapshots are only ever read, so they don't need a WAL
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+            try:
+                os.replace(temp_path, replica)
+            except OSError:
+                # e.g. PermissionError on Windows while a reader has the replica open
+                os.remove(temp_path)
+                raise
+    finally:
+        source.close()
+    return len(replicas)
+
+
+class ReplicaRefresher(threading.Thread):
+    """Background thread that refreshes the read replicas every `interval` seconds."""
+
+    def __init__(self, interval: float = DEFAULT_REFRESH_SECONDS):
+        super().__init__(name='replica-refresher', daemon=True)
+        self.interval = interval
+        self.failures = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                refresh_read_replicas()
+            except (sqlite3.Error, OSError):
+                # Keep serving the previous snapshot and retry next interval
+                self.failures += 1
+                logger.warning("Refreshing the read replicas failed; retrying in %ss", self.interval,
+                               exc_info=True)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def init_read_replicas(app) -> Optional[ReplicaRefresher]:
+    """
+    Refresh the configured replicas now, keep them refreshed, and route reads per request.
+
+    The refresher thread runs in the process that creates the app; under a
+    preloading server that is the master, so the workers don't each copy the
+    database.
+
+    Returns:
+        The refresher thread, or None if no replicas are configured
+    """
+    if not database.READ_REPLICAS:
+        return None
+
+    from flask import request, session
+
+    interval = float(os.environ.get('LIBRARY_REPLICA_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS))
+    window = float(os.environ.get('LIBRARY_READ_YOUR_WRITES_SECONDS', 2 * interval))
+
+    @app.before_request
+    def _route_reads():
+        wants_primary = (request.method not in SAFE_METHODS
+                         or request.headers.get('X-Read-Your-Writes') == '1'
+                         or request.args.get('read_your_writes') == '1'
+                         or session.get('read_primary_until', 0) > time.time())
+        if wants_primary:
+            request.environ['library.primary_reads'] = database.read_from_primary()
+            request.environ['library.primary_reads'].__enter__()
+
+    @app.after_request
+    def _remember_write(response):
+        if request.method not in SAFE_METHODS:
+            session['read_primary_until'] = time.time() + window
+        return response
+
+    @app.teardown_request
+    def _end_routing(exc):
+        primary_reads = request.environ.pop('library.primary_reads', None)
+        if primary_reads is not None:
+            primary_reads.__exit__(None, None, None)
+
+    refresh_read_replicas()
+    refresher = ReplicaRefresher(interval)
+    refresher.start()
+    app.extensions['replica_refresher'] = refresher
+    return refresher
@@ -2,11 +2,18 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from library_service import calculate_late_fee_for_book, search_books_in_catalog
+from flask import Blueprint, Response, current_app, jsonify, request
+from library_service import (
+    borrow_book_by_patron, calculate_late_fee_for_book, get_book_availability, get_loan_due_date,
+    return_book_by_patron, search_books_in_catalog, suggest_books
+)
+from services.availability_feed import current_cursor, get_feed, stream_availability, streams_supported
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Search results from this size up are streamed in chunks instead of encoded in one body
+STREAM_MIN_RESULTS = 1000
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
 def get_late_fee(patron_id, book_id):
     """
@@ -31,9 +38,132 @@ def search_books_api():
     # Use business logic function
     books = search_books_in_catalog(search_term, search_type)
     
-    return jsonify({
+    fields = {
         'search_term': search_term,
         'search_type': search_type,
-        'results': books,
         'count': len(books)
+    }
+    if len(books) >= STREAM_MIN_RESULTS and hasattr(current_app.json, 'stream_response'):
+        return current_app.json.stream_response(fields, 'results', books)
+    return jsonify(dict(fields, results=books))
+
+@api_bp.route('/suggest')
+def suggest_api():
+    """
+    Suggest titles and authors for a prefix, most borrowed first.
+    Typeahead for the search page.
+    """
+    prefix = request.args.get('q', '')
+    suggest_type = request.args.get('type', 'all')
+    limit = request.args.get('limit', 10, type=int)
+    
+    if not prefix.strip():
+        return jsonify({'error': 'Prefix is required'}), 400
+    
+    if suggest_type not in ('all', 'title', 'author'):
+        return jsonify({'error': 'Type must be title, author or all'}), 400
+    
+    suggestions = suggest_books(prefix, suggest_type, limit)
+    
+    return jsonify({
+        'prefix': prefix,
+        'type': suggest_type,
+        'suggestions': suggestions
     })
+
+@api_bp.route('/availability/stream')
+def availability_stream():
+    """
+    Server-Sent Events stream of available_copies changes, for live catalog updates.
+
+    Resumes after the Last-Event-ID header (set by the browser on reconnect)
+    or the `after` argument (the change ID the catalog page was rendered at).
+    """
+    if not streams_supported(request.environ):
+        # Each stream would hold a worker thread for minutes
+        return jsonify({'error': 'Availability streams need the ASGI server or LIBRARY_AVAILABILITY_STREAM=1; '
+                                 'poll /api/availability/changes instead'}), 404
+    latest = current_cursor()
+    if latest is None:
+        return jsonify({'error': 'Live availability needs the sqlite storage backend'}), 404
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('after')
+    try:
+        cursor = int(cursor) if cursor else latest
+    except ValueError:
+        return jsonify({'error': 'Invalid event ID'}), 400
+    return Response(stream_availability(cursor), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api_bp.route('/availability/changes')
+def availability_changes():
+    """
+    available_copies changes after the `after` change ID, answered at once.
+
+    The short-polling counterpart of availability_stream: pass the returned
+    cursor as `after` next time. reset is true when the changes can no
+    longer be replayed and the page should reload.
+    """
+    latest = current_cursor()
+    if latest is None:
+        return jsonify({'error': 'Live availability needs the sqlite storage backend'}), 404
+    try:
+        cursor = int(request.args.get('after', latest))
+    except ValueError:
+        return jsonify({'error': 'Invalid event ID'}), 400
+    events, cursor = get_feed().changes_after(cursor)
+    if events is None:
+        return jsonify({'reset': True, 'cursor': latest, 'books': []})
+    return jsonify({'reset': False, 'cursor': cursor, 'books': [book for _, book in events]})
+
+def _circulation_request():
+    """
+    (patron_id, book_id) from a JSON body (or form fields), with book_id None if it is not an integer.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = request.form
+    patron_id = str(data.get('patron_id', '')).strip()
+    try:
+        book_id = int(data.get('book_id', ''))
+    except (ValueError, TypeError):
+        book_id = None
+    return patron_id, book_id
+
+def _circulation_response(success, message, book_id, due_date):
+    """
+    The small payload a borrow or return answers with: the outcome, the book's
+    availability now and the loan's due date. A refusal still carries the
+    book's availability, so a client showing a stale row can correct it.
+    """
+    payload = {'success': success, 'message': message,
+               'book': get_book_availability(book_id), 'due_date': due_date}
+    return jsonify(payload), 200 if success else 400
+
+@api_bp.route('/borrow', methods=['POST'])
+def borrow_book_api():
+    """
+    Borrow a book and return its new availability and the loan's due date.
+    JSON interface for R2: Book Borrowing, without the redirect and catalog render
+    """
+    patron_id, book_id = _circulation_request()
+    if book_id is None:
+        return jsonify({'success': False, 'message': 'Invalid book ID.'}), 400
+    
+    success, message = borrow_book_by_patron(patron_id, book_id)
+    due_date = get_loan_due_date(patron_id, book_id) if success else None
+    return _circulation_response(success, message, book_id, due_date)
+
+@api_bp.route('/return', methods=['POST'])
+def return_book_api():
+    """
+    Return a book and answer with its new availability and the due date of the returned loan.
+    JSON interface for R3: Book Return Processing
+    """
+    patron_id, book_id = _circulation_request()
+    if book_id is None:
+        return jsonify({'success': False, 'message': 'Invalid book ID.'}), 400
+    
+    # Read before the return closes the loan
+    due_date = get_loan_due_date(patron_id, book_id) if patron_id else None
+    success, message = return_book_by_patron(patron_id, book_id)
+    return _circulation_response(success, message, book_id, due_date if success else None)
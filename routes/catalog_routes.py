@@ -3,8 +3,8 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from library_service import add_book_to_catalog
+from library_service import add_book_to_catalog, get_catalog_books
+from services.availability_feed import POLL_MS, current_cursor, streams_supported
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -19,8 +19,11 @@ def catalog():
     Display all books in the catalog.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    # Read before the books, so the live updates start no later than the rendered rows
+    change_id = current_cursor()
+    books = get_catalog_books()
+    return render_template('catalog.html', books=books, change_id=change_id,
+                           live_stream=streams_supported(request.environ), poll_ms=POLL_MS)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -0,0 +1,71 @@
+"""
+Async Library Service Module - Coroutine versions of the service functions
+
+SQLite has no native async driver in the standard library, so every call into
+the synchronous service layer (and through it, database.py) is offloaded to a
+small, dedicated thread pool. Event loop threads never block on SQLite, and
+the number of threads touching the database stays bounded no matter how many
+clients are connected.
+
+Set LIBRARY_ASYNC_DB_THREADS to size the pool (default 8).
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, get_patron_status_report,
+    pay_late_fees
+)
+
+DB_THREADS = int(os.environ.get('LIBRARY_ASYNC_DB_THREADS', 8))
+
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """The shared database thread pool, created on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='library-db')
+    return _executor
+
+
+def _reset_executor():
+    # Pool threads do not survive a fork; let a forked worker start its own
+    global _executor
+    _executor = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking service or database call on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def calculate_late_fee_for_book_async(patron_id: str, book_id: int) -> Optional[Dict]:
+    """Async version of calculate_late_fee_for_book."""
+    return await run_in_db_thread(calculate_late_fee_for_book, patron_id, book_id)
+
+
+async def search_books_in_catalog_async(search_term: str, search_type: str) -> List[Dict]:
+    """Async version of search_books_in_catalog."""
+    return await run_in_db_thread(search_books_in_catalog, search_term, search_type)
+
+
+async def get_patron_status_report_async(patron_id: str, include_archived: bool = False) -> Dict:
+    """Async version of get_patron_status_report."""
+    return await run_in_db_thread(get_patron_status_report, patron_id, include_archived)
+
+
+async def pay_late_fees_async(patron_id: str, book_id: int,
+                              payment_gateway=None) -> Tuple[bool, str, Optional[str]]:
+    """Async version of pay_late_fees."""
+    return await run_in_db_thread(pay_late_fees, patron_id, book_id, payment_gateway)
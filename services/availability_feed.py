@@ -0,0 +1,271 @@
+"""
+Availability Feed Module - Live available_copies updates for the catalog page
+
+Backs GET /api/availability/stream, a Server-Sent Events stream the catalog
+page subscribes to so it can patch the availability of a row in place
+instead of reloading the whole catalog. The feed follows the books entries
+of change_log (see change_log.py), so it carries borrows and returns made
+by every worker process, not just this one.
+
+One feed thread per process tails the log every POLL_SECONDS, re-reads the
+changed books in one query and keeps the last HISTORY events in memory;
+every open stream in the process waits on it rather than polling the
+database itself. Events carry the book's current available_copies (not a
++1/-1 delta), so applying one twice or skipping one never leaves a row
+wrong, and each event ID is the change_log ID of the change it reflects.
+The catalog page renders the ID it was read at; a stream resumes after it
+(or after the browser's Last-Event-ID on reconnect), reading older changes
+from the database when they are no longer in memory. If the log has been
+pruned past that point the stream sends a reset event and the page reloads.
+
+Under a threaded WSGI server each stream would hold a worker thread for up
+to MAX_STREAM_SECONDS, and a few dozen open catalog tabs would take every
+thread. So the catalog page only opens a stream when the server can hold it
+without pinning a thread: asgi.py serves it natively and marks the requests
+it bridges to Flask with STREAM_ENVIRON_KEY. Anywhere else the page short
+polls GET /api/availability/changes every POLL_MS, which reads the same
+in-memory events and answers at once. Flask serves the stream itself only
+with LIBRARY_AVAILABILITY_STREAM=1, for WSGI servers with async workers.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import database
+from json_provider import dumps
+from storage import get_backend
+from storage.sqlite_backend import SQLiteBackend
+
+POLL_SECONDS = 0.5
+HISTORY = 1000
+HEARTBEAT_SECONDS = 15.0
+MAX_STREAM_SECONDS = 300.0
+# How long the browser waits before reconnecting a closed stream
+RETRY_MS = 2000
+CHANGE_BATCH = 1000
+# How often the catalog page polls for changes when it can't hold a stream open
+POLL_MS = 5000
+
+# Set in the WSGI environ by servers that hold streams without a worker thread (asgi.py)
+STREAM_ENVIRON_KEY = 'library.streams'
+WSGI_STREAMS = os.environ.get('LIBRARY_AVAILABILITY_STREAM', '').lower() in ('1', 'true', 'yes')
+
+Event = Tuple[int, Dict]
+
+logger = logging.getLogger(__name__)
+
+
+def _read_events(after_id: int, up_to_id: Optional[int] = None) -> Tuple[Optional[List[Event]], int]:
+    """
+    Read the availability events for the book changes after after_id, up to up_to_id.
+
+    Returns:
+        (events in change ID order, ID of the last change read); events is
+        None if change_log no longer has the entries right after after_id
+    """
+    changed: Dict[int, int] = {}
+    last_id = after_id
+    while up_to_id is None or last_id < up_to_id:
+        changes = database.get_changes_after(last_id, CHANGE_BATCH)
+        if last_id == after_id:
+            if changes:
+                missing = changes[0].id != after_id + 1
+            else:
+                missing = up_to_id is not None and up_to_id > after_id
+            if missing:
+                return None, last_id
+        for change in changes:
+            if up_to_id is not None and change.id > up_to_id:
+                break
+            if change.table_name == 'books' and change.operation == 'update':
+                # Only the newest state of each book matters
+                changed.pop(change.row_id, None)
+                changed[change.row_id] = change.id
+            last_id = change.id
+        if len(changes) < CHANGE_BATCH:
+            break
+    if not changed:
+        return [], last_id
+    with database.read_from_primary():
+        books = database.get_books_by_ids(list(changed))
+    events = [(change_id, {'id': book_id,
+                           'available_copies': books[book_id]['available_copies'],
+                           'total_copies': books[book_id]['total_copies']})
+              for book_id, change_id in changed.items() if book_id in books]
+    return events, last_id
+
+
+def format_event(change_id: int, book: Dict) -> str:
+    """One availability event in text/event-stream format."""
+    return f"id: {change_id}\nevent: availability\ndata: {dumps(book).decode()}\n\n"
+
+
+RESET_EVENT = 'event: reset\ndata: {}\n\n'
+HEARTBEAT = ': keepalive\n\n'
+
+
+class AvailabilityFeed:
+    """Tails change_log for book updates and fans them out to every stream in the process."""
+
+    def __init__(self, poll_interval: float = POLL_SECONDS, history: int = HISTORY):
+        self.poll_interval = poll_interval
+        self.events: deque = deque(maxlen=history)
+        # Every event after this change ID is in self.events
+        self.floor = 0
+        self.cursor = 0
+        self.failures = 0
+        self._condition = threading.Condition()
+        self._pid = None
+        self._stop_event = threading.Event()
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            with self._condition:
+                if self._pid != os.getpid():
+                    self.events.clear()
+                    self.floor = self.cursor = database.get_last_change_id()
+                    self._stop_event = threading.Event()
+                    threading.Thread(target=self._run, args=(self._stop_event,), name='availability-feed',
+                                     daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _run(self, stop_event: threading.Event):
+        while not stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except sqlite3.Error:
+                # e.g. "database is locked"; the cursor hasn't moved, so the next poll picks the changes up
+                self.failures += 1
+                logger.warning("Polling the change log failed; retrying in %ss", self.poll_interval, exc_info=True)
+
+    def poll(self) -> int:
+        """
+        Read the changes logged since the last poll.
+
+        Returns:
+            Number of new events
+        """
+        events, last_id = _read_events(self.cursor)
+        with self._condition:
+            if events is None:
+                # The log was pruned under us; anything older than now can't be replayed
+                self.events.clear()
+                self.floor = self.cursor = database.get_last_change_id()
+                return 0
+            for event in events:
+                if len(self.events) == self.events.maxlen:
+                    self.floor = self.events[0][0]
+                self.events.append(event)
+            self.cursor = last_id
+            if events:
+                self._condition.notify_all()
+            return len(events)
+
+    def events_after(self, cursor: int, timeout: float = 0) -> Optional[List[Event]]:
+        """
+        The events after cursor, waiting up to timeout seconds for one if there are none yet.
+
+        Returns:
+            Events in change ID order (possibly empty), or None if the
+            changes after cursor can no longer be replayed
+        """
+        self._ensure_started()
+        with self._condition:
+            floor = self.floor
+        if cursor < floor:
+            # Older than this process's memory: catch up from the log
+            events, _ = _read_events(cursor, floor)
+            if events is None:
+                return None
+            return events + (self.events_after(floor) or [])
+        with self._condition:
+            events = [event for event in self.events if event[0] > cursor]
+            if not events and timeout > 0:
+                self._condition.wait(timeout)
+                events = [event for event in self.events if event[0] > cursor]
+            return events
+
+    def changes_after(self, cursor: int) -> Tuple[Optional[List[Event]], int]:
+        """
+        The events after cursor without waiting, for short polling.
+
+        Returns:
+            (events, or None if they can no longer be replayed; the cursor to
+            poll after next time, past changes that weren't book updates)
+        """
+        self._ensure_started()
+        with self._condition:
+            # Every book update up to here is in the events read below
+            seen = self.cursor
+        events = self.events_after(cursor)
+        if events is None:
+            return None, cursor
+        return events, max([cursor, seen] + [change_id for change_id, _ in events[-1:]])
+
+    def stop(self):
+        """Stop the feed thread (it restarts on the next stream)."""
+        with self._condition:
+            self._stop_event.set()
+            self._pid = None
+
+
+_feed: Optional[AvailabilityFeed] = None
+
+
+def get_feed() -> AvailabilityFeed:
+    """This process's feed."""
+    global _feed
+    if _feed is None:
+        _feed = AvailabilityFeed()
+    return _feed
+
+
+def current_cursor() -> Optional[int]:
+    """
+    The change ID a page rendered now should resume its stream after.
+
+    Returns:
+        The ID, or None if the storage backend keeps no change log (no live updates)
+    """
+    if not isinstance(get_backend(), SQLiteBackend):
+        return None
+    return database.get_last_change_id()
+
+
+def streams_supported(environ: Dict) -> bool:
+    """Whether a request can hold an availability stream open without pinning a worker thread."""
+    return WSGI_STREAMS or bool(environ.get(STREAM_ENVIRON_KEY))
+
+
+def stream_availability(cursor: int, max_seconds: Optional[float] = None,
+                        heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """
+    Yield text/event-stream messages for the availability changes after cursor.
+
+    Ends after max_seconds (default MAX_STREAM_SECONDS; the browser then
+    reconnects with Last-Event-ID) or after a reset event.
+    """
+    feed = get_feed()
+    yield f"retry: {RETRY_MS}\n\n"
+    deadline = time.monotonic() + (MAX_STREAM_SECONDS if max_seconds is None else max_seconds)
+    last_sent = time.monotonic()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events = feed.events_after(cursor, min(heartbeat, remaining))
+        if events is None:
+            yield RESET_EVENT
+            return
+        if events:
+            yield ''.join(format_event(change_id, book) for change_id, book in events)
+            cursor = events[-1][0]
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= heartbeat:
+            yield HEARTBEAT
+            last_sent = time.monotonic()
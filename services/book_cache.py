@@ -0,0 +1,109 @@
+"""
+Book Cache Module - Per-process cache of book rows, safe across workers
+
+Caches the catalog listing and single-book lookups that every catalog page,
+late fee check and patron report repeats. Entries are dropped through the
+invalidation bus (invalidation.py), so a borrow handled by another worker
+process reaches this one within the bus's poll interval, and one handled by
+this process reaches it immediately:
+
+    - a new or edited book clears everything ('catalog' version),
+    - an availability change drops the catalog listing and just the
+      changed books.
+
+Cached rows are always read from the primary, never a read replica, which
+may lag behind the versions the bus has seen. Opt-in with
+LIBRARY_BOOK_CACHE=1 (enabled by create_app); SQLite backend only.
+"""
+
+import threading
+from typing import Dict, List, Optional, Set
+
+from database import read_from_primary
+from invalidation import InvalidationBus, get_bus
+from models import Book
+from storage import get_all_books, get_backend, get_book_by_id
+from storage.sqlite_backend import SQLiteBackend
+
+
+class BookCache:
+    """Catalog listing and books by ID, invalidated by an InvalidationBus."""
+
+    def __init__(self, bus: InvalidationBus):
+        self.bus = bus
+        self.hits = 0
+        self.misses = 0
+        self._books: Dict[int, Book] = {}
+        self._catalog: Optional[List[Book]] = None
+        # Bumped by every invalidation; a load that overlaps one isn't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        bus.subscribe(self._invalidate)
+
+    def _invalidate(self, changed: Set[str], book_ids: Optional[List[int]]):
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+            if 'catalog' in changed or book_ids is None:
+                self._books.clear()
+            else:
+                for book_id in book_ids:
+                    self._books.pop(book_id, None)
+
+    def get_all_books(self) -> List[Book]:
+        """All books ordered by title, like storage.get_all_books()."""
+        self.bus.poll()
+        books = self._catalog
+        if books is not None:
+            self.hits += 1
+            return books
+        self.misses += 1
+        generation = self._generation
+        with read_from_primary():
+            books = get_all_books()
+        with self._lock:
+            if generation == self._generation:
+                self._catalog = books
+        return books
+
+    def get_book(self, book_id: int) -> Optional[Book]:
+        """One book by ID, like storage.get_book_by_id(); missing books aren't cached."""
+        self.bus.poll()
+        book = self._books.get(book_id)
+        if book is not None:
+            self.hits += 1
+            return book
+        self.misses += 1
+        generation = self._generation
+        with read_from_primary():
+            book = get_book_by_id(book_id)
+        if book is not None:
+            with self._lock:
+                if generation == self._generation:
+                    self._books[book_id] = book
+        return book
+
+
+_cache: Optional[BookCache] = None
+
+
+def enable_book_cache() -> BookCache:
+    """Cache book reads in this process (and the workers forked from it)."""
+    global _cache
+    if not isinstance(get_backend(), SQLiteBackend):
+        raise ValueError("The book cache is invalidated through SQLite and needs the sqlite storage backend.")
+    _cache = BookCache(get_bus())
+    return _cache
+
+
+def disable_book_cache():
+    """Drop the cache; book reads go back to storage every time."""
+    global _cache
+    if _cache is not None:
+        _cache.bus.unsubscribe(_cache._invalidate)
+    _cache = None
+
+
+def get_book_cache() -> Optional[BookCache]:
+    """The cache in use, or None if book reads aren't cached."""
+    return _cache
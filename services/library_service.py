@@ -2,13 +2,21 @@
 Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
+from catalog_snapshot import get_catalog_snapshot
+from models import CatalogBook
+from services.book_cache import get_book_cache
 from services.payment_service import PaymentGateway
+from services.search_cache import get_search_cache
+from services.search_index import INDEXED_FIELDS, SCAN_SHARE, SNAPSHOT_SCAN_SHARE, get_search_index
+from services.single_flight import coalesce
+from services.suggest_index import SUGGEST_FIELDS, get_suggest_index
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
-from database import (
+from storage import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, get_patron_borrow_records
+    update_borrow_record_return_date, get_all_books, get_patron_borrow_records,
+    get_books_by_ids, get_active_borrow_record, decrement_book_availability, insert_payment
 )
 
 
@@ -53,33 +61,51 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     # Insert new book
     success = insert_book(title.strip(), author.strip(), isbn, total_copies, total_copies)
     if success:
+        # Make the new book searchable and suggestible right away in this process
+        index = get_search_index()
+        if index is not None:
+            index.catch_up(force=True)
+        suggest_index = get_suggest_index(build=False)
+        if suggest_index is not None:
+            suggest_index.catch_up(force=True)
         return True, f'Book "{title.strip()}" has been successfully added to the catalog.'
     else:
         return False, "Database error occurred while adding the book."
 
 
-def get_catalog_books() -> List[Dict]:
+def _get_book_for_reading(book_id: int):
+    """
+    Look up a book for a read-only check, from the catalog snapshot or book cache when enabled.
+
+    Borrowing and returning always read the book from storage.
+    """
+    snapshot = get_catalog_snapshot()
+    if snapshot is not None:
+        return snapshot.get_book(book_id)
+    cache = get_book_cache()
+    return cache.get_book(book_id) if cache is not None else get_book_by_id(book_id)
+
+
+@coalesce
+def get_catalog_books() -> List[CatalogBook]:
     """
     Retrieve all books for catalog display.
     Implements R2: Book Catalog Display
     
     Returns:
-        List of dicts with book info including availability and total copies.
+        List of dict-like rows with book info including availability, total copies and borrowable.
     """
-    books = get_all_books()  # Retrieve all book records from database
-    # Format each book as needed
-    catalog = []
-    for book in books:
-        catalog.append({
-            'id': book['id'],
-            'title': book['title'],
-            'author': book['author'],
-            'isbn': book['isbn'],
-            'available_copies': book['available_copies'],
-            'total_copies': book['total_copies'],
-            'borrowable': book['available_copies'] > 0
-        })
-    return catalog
+    # Straight from the shared snapshot's columns when LIBRARY_CATALOG_SNAPSHOT is on and current
+    snapshot = get_catalog_snapshot()
+    if snapshot is not None:
+        return [CatalogBook(*row, row[5] > 0) for row in snapshot.rows()]
+    # Retrieve all book records, from this process's cache when LIBRARY_BOOK_CACHE is on
+    cache = get_book_cache()
+    books = cache.get_all_books() if cache is not None else get_all_books()
+    # One compact CatalogBook per book (dict-style access, see models.py)
+    return [CatalogBook(book['id'], book['title'], book['author'], book['isbn'],
+                        book['total_copies'], book['available_copies'], book['available_copies'] > 0)
+            for book in books]
 
 
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
@@ -117,15 +143,20 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     borrow_date = datetime.now()
     due_date = borrow_date + timedelta(days=14)
     
-    # Insert borrow record and update availability
+    # Take a copy first: the availability check above may be stale by now,
+    # and only one borrower can get the last copy
+    if not decrement_book_availability(book_id):
+        return False, "This book is currently not available."
+    
     borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
     if not borrow_success:
+        # Put the copy back
+        update_book_availability(book_id, 1)
+        # Only one active loan per patron and book (idx_borrow_records_active)
+        if get_active_borrow_record(patron_id, book_id):
+            return False, "You have already borrowed this book."
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
   
@@ -151,14 +182,7 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
         return False, "Book not found."
     
     # Find the active borrow record for this patron and book
-    borrow_records = get_patron_borrow_records(patron_id)
-    active_record = None
-    
-    for record in borrow_records:
-        if record['book_id'] == book_id and record['return_date'] is None:
-            active_record = record
-            break
-    
+    active_record = get_active_borrow_record(patron_id, book_id)
     if not active_record:
         return False, "No active borrow record found for this book and patron."
     
@@ -186,6 +210,32 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
         return True, f'Book "{book["title"]}" returned successfully on time.'
 
 
+def get_book_availability(book_id: int) -> Optional[Dict]:
+    """
+    Get a book's current availability, e.g. to answer a borrow or return.
+
+    Always reads storage (never the snapshot or cache), so the result
+    reflects a borrow or return just made.
+
+    Returns:
+        dict: {'id', 'available_copies', 'total_copies'}, the same shape as an
+        availability event, or None if there is no such book
+    """
+    book = get_book_by_id(book_id)
+    if not book:
+        return None
+    return {'id': book['id'], 'available_copies': book['available_copies'],
+            'total_copies': book['total_copies']}
+
+
+def get_loan_due_date(patron_id: str, book_id: int) -> Optional[str]:
+    """
+    Get the due date (ISO 8601) of a patron's active loan of a book, or None if there is none.
+    """
+    record = get_active_borrow_record(patron_id, book_id)
+    return record['due_date'] if record else None
+
+
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
@@ -203,19 +253,12 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         return None
     
     # Check if book exists
-    book = get_book_by_id(book_id)
+    book = _get_book_for_reading(book_id)
     if not book:
         return None
     
-    # Find the borrow record for this patron and book
-    borrow_records = get_patron_borrow_records(patron_id)
-    target_record = None
-    
-    for record in borrow_records:
-        if record['book_id'] == book_id and record['return_date'] is None:
-            target_record = record
-            break
-    
+    # Find the active borrow record for this patron and book
+    target_record = get_active_borrow_record(patron_id, book_id)
     if not target_record:
         return {
             'fee_amount': 0.00,
@@ -224,7 +267,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         }
     
     # Calculate late fee
-    due_date = datetime.fromisoformat(active_record['due_date'])
+    due_date = datetime.fromisoformat(target_record['due_date'])
 
     current_date = datetime.now()
     days_overdue = max(0, (current_date - due_date).days)
@@ -238,6 +281,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     }
 
 
+@coalesce
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     """
     Search for books in the catalog.
@@ -259,6 +303,31 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     search_term = search_term.strip().lower()
     search_type = search_type.lower()
 
+    # Serve repeated searches from the result cache when it is enabled
+    cache = get_search_cache()
+    if cache is not None:
+        return cache.search(search_term, search_type, lambda: _search_books(search_term, search_type))
+    return _search_books(search_term, search_type)
+
+
+def _search_books(search_term: str, search_type: str) -> List[Dict]:
+    """Run a search for a normalized (stripped, lowercased) term and type."""
+    snapshot = get_catalog_snapshot()
+
+    # Answer title and author searches from the trigram index when it is enabled,
+    # leaving broad terms to the scan (a much smaller share when it scans the snapshot)
+    index = get_search_index()
+    if index is not None and search_type in INDEXED_FIELDS:
+        index.catch_up()
+        matching_books = index.search(search_type, search_term,
+                                      SNAPSHOT_SCAN_SHARE if snapshot is not None else SCAN_SHARE)
+        if matching_books is not None:
+            return matching_books
+
+    # Scan the shared snapshot instead of the database when it is enabled and current
+    if snapshot is not None and search_type in ('title', 'author', 'isbn'):
+        return snapshot.search(search_type, search_term)
+
     # Get all books from the database
     all_books = get_all_books()
     matching_books = []
@@ -277,13 +346,39 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     return matching_books
 
 
-def get_patron_status_report(patron_id: str) -> Dict:
+def suggest_books(prefix: str, suggest_type: str = 'all', limit: int = 10) -> List[Dict]:
+    """
+    Suggest titles and authors that start with what the user has typed.
+    Backs search-as-you-type on the search page.
+
+    Args:
+        prefix: Start of a title or author (case-insensitive)
+        suggest_type: 'title', 'author' or 'all'
+        limit: Maximum number of suggestions
+
+    Returns:
+        List of dicts with text, type and borrows, most borrowed first
+    """
+    if not prefix or not prefix.strip():
+        return []
+
+    suggest_type = (suggest_type or 'all').lower()
+    if suggest_type != 'all' and suggest_type not in SUGGEST_FIELDS:
+        return []
+
+    return get_suggest_index().suggest(prefix, suggest_type, limit)
+
+
+@coalesce
+def get_patron_status_report(patron_id: str, include_archived: bool = False) -> Dict:
     """
     Get status report for a patron.
     Implements R7 as per requirements
 
     Args:
         patron_id: 6-digit library card ID
+        include_archived: Also list returns moved to the archive; by default
+            returned_books only has the ones still in the hot table
 
     Returns:
         Dict with patron status information
@@ -295,16 +390,19 @@ def get_patron_status_report(patron_id: str) -> Dict:
             'patron_id': patron_id
         }
 
-    # Get patron's borrow records
-    borrow_records = get_patron_borrow_records(patron_id)
+    # Get patron's borrow records; active ones are never archived
+    borrow_records = get_patron_borrow_records(patron_id, include_archived)
 
     # Separate active and returned books
     active_borrows = []
     returned_books = []
     total_late_fees = 0.00
 
+    # Look up every book in the history with one query instead of one per record
+    books = get_books_by_ids([record['book_id'] for record in borrow_records])
+
     for record in borrow_records:
-        book = get_book_by_id(record['book_id'])
+        book = books.get(record['book_id'])
         record_info = {
             'book_id': record['book_id'],
             'book_title': book['title'] if book else 'Unknown',
@@ -387,14 +485,18 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
             description=f"Late fees for '{book['title']}'"
         )
         
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
+        if not success:
             return False, f"Payment failed: {message}", None
             
     except Exception as e:
         # Handle payment gateway errors
         return False, f"Payment processing error: {str(e)}", None
+    
+    # The patron has been charged; a failure to record it doesn't undo that
+    if not insert_payment(patron_id, book_id, fee_amount, transaction_id, datetime.now()):
+        return (True, f"Payment successful! {message} It could not be recorded; "
+                      f"keep transaction ID {transaction_id} as proof.", transaction_id)
+    return True, f"Payment successful! {message}", transaction_id
 
 
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
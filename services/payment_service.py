@@ -6,7 +6,6 @@ For Assignment 3: You will learn to mock this service in their tests
 since we cannot make actual payment API calls during testing.
 """
 
-import requests
 from typing import Dict, Tuple
 import time
 
@@ -32,6 +31,17 @@ class PaymentGateway:
         self.api_key = api_key
         self.base_url = "https://api.payment-gateway.example.com"
     
+    @property
+    def http(self):
+        """
+        HTTP client for gateway calls.
+        
+        requests is imported on first use rather than at module level: it is
+        slow to import, and only payment calls need it, not app startup.
+        """
+        import requests
+        return requests
+    
     def process_payment(self, patron_id: str, amount: float, description: str = "") -> Tuple[bool, str, str]:
         """
         Process a payment through the external gateway.
@@ -55,7 +65,7 @@ class PaymentGateway:
         time.sleep(0.5)
         
         # In a real implementation, this would make an HTTP request:
-        # response = requests.post(
+        # response = self.http.post(
         #     f"{self.base_url}/charges",
         #     headers={"Authorization": f"Bearer {self.api_key}"},
         #     json={
@@ -0,0 +1,195 @@
+"""
+Search Cache Module - Per-process LRU cache of search results
+
+search_books_in_catalog() normalizes the term and then recomputes the
+matches from scratch every time, while most searches repeat a few popular
+terms. This cache keeps the matches of recent searches, keyed by
+(normalized term, search type, catalog version), and serves a repeated
+search without touching SQLite.
+
+What a search matches only depends on titles, authors and ISBNs, so a
+cached match set stays valid until the 'catalog' version moves (a book is
+added or its details change; see invalidation.py), which empties the cache.
+Copy counts change far more often: an availability change only drops the
+cached rows of the books that changed, and the next search that returns
+them re-reads just those rows in one query, keeping the match sets.
+
+Entries are evicted least recently used first, once there are more than
+max_entries of them or their estimated size goes over max_bytes. A result
+set estimated at more than half of max_bytes (say, every ISBN with "978")
+is not cached at all. Rows are read from
+the primary, like services/book_cache.py, and are stale for at most the
+bus's poll interval after another process writes. Opt-in with
+LIBRARY_SEARCH_CACHE=1 (enabled by create_app); SQLite backend only.
+
+Configuration (environment, read by create_app):
+    LIBRARY_SEARCH_CACHE           1 to cache search results
+    LIBRARY_SEARCH_CACHE_ENTRIES   most searches kept (default 1000)
+    LIBRARY_SEARCH_CACHE_MB        most estimated megabytes kept (default 64)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from database import read_from_primary
+from invalidation import InvalidationBus, get_bus
+from storage import get_backend, get_books_by_ids
+from storage.sqlite_backend import SQLiteBackend
+
+MAX_ENTRIES = 1000
+MAX_BYTES = 64 * 1024 * 1024
+# Larger result sets aren't cached, so one broad search can't evict all the others
+MAX_ENTRY_SHARE = 0.5
+
+# Rough size of a cached key and a cached row beyond the length of their text
+ENTRY_OVERHEAD = 200
+ROW_OVERHEAD = 300
+
+Key = Tuple[str, str, int]
+
+
+def _row_bytes(book) -> int:
+    return ROW_OVERHEAD + len(book['title']) + len(book['author']) + len(book['isbn'])
+
+
+class SearchCache:
+    """Match sets of recent searches, with copy counts refreshed through an InvalidationBus."""
+
+    def __init__(self, bus: InvalidationBus, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.bus = bus
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Rows re-read after availability changes
+        self.refreshed = 0
+        self.size = 0
+        # Key -> (book IDs in result order, estimated bytes)
+        self._entries: 'OrderedDict[Key, Tuple[Tuple[int, ...], int]]' = OrderedDict()
+        # The current row of every book in a cached result, and how many results hold it
+        self._rows: Dict[int, object] = {}
+        self._refs: Dict[int, int] = {}
+        # Bumped by every invalidation; a search or refresh that overlaps one isn't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        bus.subscribe(self._invalidate)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _invalidate(self, changed: Set[str], book_ids: Optional[List[int]]):
+        with self._lock:
+            self._generation += 1
+            if 'catalog' in changed:
+                # Matches may have changed; the new version keys new entries anyway
+                self._entries.clear()
+                self._rows.clear()
+                self._refs.clear()
+                self.size = 0
+            elif book_ids is None:
+                self._rows.clear()
+            else:
+                for book_id in book_ids:
+                    self._rows.pop(book_id, None)
+
+    def search(self, search_term: str, search_type: str, compute: Callable[[], List]) -> List:
+        """
+        The results of a search, from the cache or from compute() (which runs against the primary).
+
+        Args:
+            search_term: Normalized (stripped, lowercased) search term
+            search_type: Normalized search type
+            compute: Runs the search when it isn't cached
+
+        Returns:
+            Matching books, in the order compute() returned them
+        """
+        key = (search_term, search_type, self.bus.version('catalog'))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                book_ids = entry[0]
+                books = [self._rows.get(book_id) for book_id in book_ids]
+                generation = self._generation
+        if entry is None:
+            return self._compute(key, compute)
+
+        self.hits += 1
+        missing = [book_id for book_id, book in zip(book_ids, books) if book is None]
+        if missing:
+            with read_from_primary():
+                fresh = get_books_by_ids(missing)
+            self.refreshed += len(fresh)
+            with self._lock:
+                if generation == self._generation:
+                    self._rows.update((book_id, row) for book_id, row in fresh.items() if book_id in self._refs)
+            books = [book if book is not None else fresh.get(book_id) for book_id, book in zip(book_ids, books)]
+            # A book deleted since is gone from fresh
+            books = [book for book in books if book is not None]
+        return books
+
+    def _compute(self, key: Key, compute: Callable[[], List]) -> List:
+        self.misses += 1
+        generation = self._generation
+        with read_from_primary():
+            books = compute()
+        limit = self.max_bytes * MAX_ENTRY_SHARE
+        if len(books) * (8 + ROW_OVERHEAD) > limit:
+            return books
+        size = ENTRY_OVERHEAD + len(key[0]) + sum(8 + _row_bytes(book) for book in books)
+        if size > limit:
+            return books
+        with self._lock:
+            if generation != self._generation or key in self._entries:
+                return books
+            book_ids = tuple(book['id'] for book in books)
+            self._entries[key] = (book_ids, size)
+            self.size += size
+            for book in books:
+                self._rows[book['id']] = book
+                self._refs[book['id']] = self._refs.get(book['id'], 0) + 1
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._evict()
+        return books
+
+    def _evict(self):
+        # Least recently used first; the caller holds the lock
+        book_ids, size = self._entries.popitem(last=False)[1]
+        self.size -= size
+        self.evictions += 1
+        for book_id in book_ids:
+            refs = self._refs[book_id] - 1
+            if refs:
+                self._refs[book_id] = refs
+            else:
+                del self._refs[book_id]
+                self._rows.pop(book_id, None)
+
+
+_cache: Optional[SearchCache] = None
+
+
+def enable_search_cache(max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES) -> SearchCache:
+    """Cache search results in this process (and the workers forked from it)."""
+    global _cache
+    if not isinstance(get_backend(), SQLiteBackend):
+        raise ValueError("The search cache is invalidated through SQLite and needs the sqlite storage backend.")
+    disable_search_cache()
+    _cache = SearchCache(get_bus(), max_entries, max_bytes)
+    return _cache
+
+
+def disable_search_cache():
+    """Drop the cache; every search is computed again."""
+    global _cache
+    if _cache is not None:
+        _cache.bus.unsubscribe(_cache._invalidate)
+    _cache = None
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """The cache in use, or None if search results aren't cached."""
+    return _cache
@@ -0,0 +1,193 @@
+"""
+Search Index Module - In-memory trigram index for catalog substring search
+
+search_books_in_catalog() matches any substring of a title or author, case
+insensitively. Without an index that means lowercasing every book on every
+query. The trigram index maps each 3-character substring of the lowercased
+titles and authors to the sorted IDs of the books containing it, stored in
+compact array('I') posting lists. A query of 3 or more characters intersects
+the posting lists of its own trigrams, fetches just those candidate books and
+confirms the match, so only a handful of rows are ever looked at.
+
+A short common term like "the" has candidates in a large share of the
+catalog, and fetching those rows by ID costs about as much per row as
+scanning. search() leaves such terms to the scan: above SCAN_SHARE of the
+catalog, or SNAPSHOT_SCAN_SHARE when the memory-mapped catalog snapshot
+(catalog_snapshot.py) does the scanning, which is far cheaper per row.
+
+The index is per process and opt-in (LIBRARY_SEARCH_INDEX=1, built by
+create_app). Book IDs only increase and books are never deleted, so it stays
+current by indexing the books with IDs above the last one it has seen: before
+an indexed query at most every CATCH_UP_SECONDS, and right after
+add_book_to_catalog(). That also picks up books bulk-loaded straight into the
+database or added by another worker.
+"""
+
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+from storage import get_books_after, get_books_by_ids
+
+INDEXED_FIELDS = ('title', 'author')
+
+# Books fetched per query while building or catching up
+CATCH_UP_BATCH = 10_000
+CATCH_UP_SECONDS = 1.0
+
+# Largest share of the catalog whose candidates are fetched by ID rather than
+# left to the scan, with a table scan and with the catalog snapshot
+SCAN_SHARE = 0.8
+SNAPSHOT_SCAN_SHARE = 0.01
+# Candidates fetched in a single get_books_by_ids() query are never left to the scan
+MIN_SCAN_CANDIDATES = 500
+
+
+def trigrams(text: str) -> Set[str]:
+    """The distinct 3-character substrings of text, lowercased."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _contains(posting: array, book_id: int) -> bool:
+    position = bisect_left(posting, book_id)
+    return position < len(posting) and posting[position] == book_id
+
+
+class TrigramIndex:
+    """Trigram posting lists for the title and author of every book."""
+
+    def __init__(self, fields=INDEXED_FIELDS):
+        self.fields = fields
+        self.postings: Dict[str, Dict[str, array]] = {field: {} for field in fields}
+        self.last_book_id = 0
+        self.book_count = 0
+        self._last_catch_up = 0.0
+        self._lock = threading.Lock()
+
+    def add_books(self, books: Iterable[Dict]):
+        """Index books (dicts with id and the indexed fields), skipping ones already indexed."""
+        with self._lock:
+            for book in books:
+                book_id = book['id']
+                if book_id <= self.last_book_id:
+                    continue
+                for field in self.fields:
+                    postings = self.postings[field]
+                    for gram in trigrams(book[field]):
+                        posting = postings.get(gram)
+                        if posting is None:
+                            posting = postings[gram] = array('I')
+                        # IDs arrive in increasing order, so appending keeps every list sorted
+                        posting.append(book_id)
+                self.last_book_id = book_id
+                self.book_count += 1
+
+    def catch_up(self, force: bool = False) -> int:
+        """
+        Index every book added since the last call, at most every CATCH_UP_SECONDS unless forced.
+
+        Returns:
+            Number of books indexed
+        """
+        now = time.monotonic()
+        if not force and now - self._last_catch_up < CATCH_UP_SECONDS:
+            return 0
+        self._last_catch_up = now
+        added = 0
+        while True:
+            books = get_books_after(self.last_book_id, CATCH_UP_BATCH)
+            self.add_books(books)
+            added += len(books)
+            if len(books) < CATCH_UP_BATCH:
+                return added
+
+    def candidates(self, field: str, term: str) -> Optional[List[int]]:
+        """
+        IDs of the books whose field contains every trigram of term.
+
+        Returns:
+            Sorted book IDs (a superset of the real matches), or None if term
+            is shorter than 3 characters and the index can't narrow it down
+        """
+        grams = trigrams(term)
+        if not grams:
+            return None
+        postings = self.postings[field]
+        lists = []
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                return []
+            lists.append(posting)
+        # Start from the rarest trigram and probe the longer lists with binary search
+        lists.sort(key=len)
+        matches = list(lists[0])
+        for posting in lists[1:]:
+            matches = [book_id for book_id in matches if _contains(posting, book_id)]
+            if not matches:
+                break
+        return matches
+
+    def search(self, field: str, term: str, max_share: float = SCAN_SHARE) -> Optional[List[Dict]]:
+        """
+        Books whose field contains term (case-insensitive), ordered by title.
+
+        Args:
+            max_share: Leave the query to the scan if its candidates are more
+                than this share of the indexed books
+
+        Returns:
+            Matching books, or None if the index can't answer this query or
+            leaves it to the scan
+        """
+        term = term.lower()
+        book_ids = self.candidates(field, term)
+        if book_ids is None:
+            return None
+        if len(book_ids) > max(MIN_SCAN_CANDIDATES, max_share * self.book_count):
+            return None
+        books = get_books_by_ids(book_ids)
+        matches = [book for book in books.values() if term in book[field].lower()]
+        matches.sort(key=lambda book: book['title'])
+        return matches
+
+    def memory_bytes(self) -> int:
+        """Approximate memory used by the posting lists and their dicts."""
+        total = 0
+        for postings in self.postings.values():
+            total += sys.getsizeof(postings)
+            for gram, posting in postings.items():
+                total += sys.getsizeof(gram) + sys.getsizeof(posting)
+        return total
+
+
+_index: Optional[TrigramIndex] = None
+
+
+def build_search_index() -> TrigramIndex:
+    """Build a new index over the whole catalog."""
+    index = TrigramIndex()
+    index.catch_up(force=True)
+    return index
+
+
+def enable_search_index() -> TrigramIndex:
+    """Build the index and use it for title and author searches in this process."""
+    global _index
+    _index = build_search_index()
+    return _index
+
+
+def disable_search_index():
+    """Drop the index; searches go back to scanning the catalog."""
+    global _index
+    _index = None
+
+
+def get_search_index() -> Optional[TrigramIndex]:
+    """The index in use, or None if searches scan the catalog."""
+    return _index
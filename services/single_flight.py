@@ -0,0 +1,154 @@
+"""
+Single Flight Module - One execution for identical concurrent service calls
+
+When a search term trends, dozens of requests for the same /api/search?q=...
+arrive together and each runs search_books_in_catalog() on its own. Service
+functions decorated with @coalesce can share that work: while a call is in
+flight, callers with the same arguments wait for it and get its result (or
+its exception) instead of running the function again. Nothing is kept once
+the call returns, so this is not a cache: the next caller runs the function
+again.
+
+A caller only joins a call that reads what it would read itself:
+    - the arguments are equal (positional and keyword, as passed),
+    - both read the primary or both may read a replica
+      (database.read_from_primary()),
+    - no book write has committed in this process since the call started
+      (database.BOOK_WRITES), so a patron who just borrowed or returned a
+      book sees it in their next search or status report.
+
+Results are shared between the callers of one execution, so they must be
+treated as read-only, as the routes already do.
+
+Configuration (environment, read by create_app):
+    LIBRARY_SINGLE_FLIGHT   1 to coalesce every @coalesce function, or a
+                            comma-separated list of function names
+"""
+
+import functools
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
+
+import database
+
+# Names of the functions decorated with @coalesce
+COALESCED: Set[str] = set()
+
+
+class _Call:
+    """One execution in flight and the callers waiting for it."""
+
+    def __init__(self, writes: int):
+        self.writes = writes
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs one execution per key at a time and hands its outcome to every caller that joined it."""
+
+    def __init__(self, functions: Iterable[str]):
+        self.functions = frozenset(functions)
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, counter: str):
+        counts = self._counts.setdefault(name, {'calls': 0, 'executions': 0, 'collapsed': 0})
+        counts['calls'] += 1
+        counts[counter] += 1
+
+    def do(self, name: str, key: Hashable, fn: Callable):
+        """
+        Run fn(), or wait for the execution already running under the same name and key.
+
+        Returns:
+            fn()'s result, shared with every caller that joined the execution
+
+        Raises:
+            Whatever fn() raised, in every caller that joined the execution
+        """
+        key = (name, key)
+        writes = database.BOOK_WRITES
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None or call.writes != writes
+            if leader:
+                # A call started before the last write keeps serving the callers it has
+                call = self._calls[key] = _Call(writes)
+            self._count(name, 'executions' if leader else 'collapsed')
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Per function: calls, executions, and collapsed (calls served by another caller's execution).
+        """
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+
+_group: Optional[SingleFlight] = None
+
+
+def coalesce(func: Callable) -> Callable:
+    """
+    Opt a service function in to single-flight execution.
+
+    The function runs as usual until enable_single_flight() names it (or
+    enables every decorated function). Its arguments must be hashable.
+    """
+    name = func.__name__
+    COALESCED.add(name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        group = _group
+        if group is None or name not in group.functions:
+            return func(*args, **kwargs)
+        key = (args, tuple(sorted(kwargs.items())), database.reads_from_primary())
+        return group.do(name, key, lambda: func(*args, **kwargs))
+
+    return wrapper
+
+
+def enable_single_flight(functions: Optional[Iterable[str]] = None) -> SingleFlight:
+    """
+    Coalesce identical concurrent calls of the named @coalesce functions (all of them by default).
+
+    Raises:
+        ValueError: If a name is not a @coalesce function
+    """
+    global _group
+    functions = set(COALESCED if functions is None else functions)
+    unknown = functions - COALESCED
+    if unknown:
+        raise ValueError(f"Not single-flight functions: {', '.join(sorted(unknown))}")
+    _group = SingleFlight(functions)
+    return _group
+
+
+def disable_single_flight():
+    """Run every call on its own again."""
+    global _group
+    _group = None
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    """The SingleFlight in use, or None if calls aren't coalesced."""
+    return _group
@@ -0,0 +1,292 @@
+"""
+Suggest Index Module - Prefix suggestions for titles and authors
+
+Backs /api/suggest, which is called on every keystroke, so lookups never touch
+the database. Each field keeps its distinct normalized values (lowercased,
+whitespace collapsed) in a sorted list; a prefix is a contiguous slice found
+with two bisects. Suggestions in the slice are ranked by how often their books
+have been borrowed. Short prefixes match huge slices, so above SCAN_LIMIT
+entries the ranked result is computed once and cached until a value under
+that prefix is added or borrowed often enough to change the ranking. New
+values go into a small sorted pending list first, merged into the main list
+once it holds more than PENDING_LIMIT, so adding a book doesn't shift the
+whole list.
+
+The index is built on first use, or when the app is created with
+LIBRARY_SUGGEST_INDEX=1 (worth it under a preloading server, where workers
+inherit the built index). New books are picked up incrementally (by ID, like
+services/search_index.py) at most every CATCH_UP_SECONDS, and immediately
+after add_book_to_catalog() in the same process. Every
+LIBRARY_SUGGEST_REFRESH_SECONDS (default 60) a background thread counts the
+borrows made since its last refresh (by borrow record ID) and re-ranks only
+the books they touched; it is started in each process on its first
+suggestion, so forked workers get their own.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from storage import get_books_after, get_borrow_counts_after
+
+SUGGEST_FIELDS = ('title', 'author')
+MAX_SUGGESTIONS = 20
+SCAN_LIMIT = 256
+PENDING_LIMIT = 1024
+CATCH_UP_SECONDS = 1.0
+CATCH_UP_BATCH = 10_000
+POPULARITY_SECONDS = 60.0
+
+logger = logging.getLogger(__name__)
+
+# Sorts after every character, so prefix + _END bounds the slice of keys starting with prefix
+_END = chr(0x10FFFF)
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and collapse runs of whitespace (keeping a trailing space, which ends a word)."""
+    normalized = ' '.join(text.lower().split())
+    if text[-1:].isspace() and normalized:
+        normalized += ' '
+    return normalized
+
+
+class PrefixIndex:
+    """Sorted distinct values of one field, with borrow counts for ranking."""
+
+    def __init__(self):
+        self.keys: List[str] = []
+        # Recently added keys, sorted; merged into keys past PENDING_LIMIT
+        self.pending: List[str] = []
+        self.display: Dict[str, str] = {}
+        self.book_ids: Dict[str, List[int]] = {}
+        self.book_keys: Dict[int, str] = {}
+        self.borrows: Dict[str, int] = {}
+        self._top: Dict[str, List[str]] = {}
+
+    def add(self, text: str, book_id: int, borrows: int = 0):
+        self.add_many([(text, book_id, borrows)])
+
+    def add_many(self, entries: Iterable[Tuple[str, int, int]]):
+        """Add (text, book ID, borrows) entries, sorting the new keys in once."""
+        new_keys = []
+        for text, book_id, borrows in entries:
+            key = normalize(text)
+            if not key:
+                continue
+            if key not in self.display:
+                new_keys.append(key)
+                self.display[key] = text.strip()
+                self.book_ids[key] = []
+                self.borrows[key] = 0
+            self.book_ids[key].append(book_id)
+            self.book_keys[book_id] = key
+            if borrows:
+                self.borrows[key] += borrows
+                # Another book with the same value moves it up
+                self._invalidate(key)
+        for key in new_keys:
+            # Cached rankings for prefixes of the new key no longer cover every value
+            self._invalidate(key)
+        if len(self.pending) + len(new_keys) > PENDING_LIMIT:
+            # Sorted runs plus the new keys: a merge rather than a full sort
+            self.keys += self.pending
+            self.keys += new_keys
+            self.keys.sort()
+            self.pending = []
+        else:
+            for key in new_keys:
+                insort(self.pending, key)
+
+    def add_borrows(self, book_id: int, borrows: int):
+        """Add borrows to the count of the book's value."""
+        key = self.book_keys.get(book_id)
+        if key is None or not borrows:
+            return
+        self.borrows[key] += borrows
+        if borrows < 0:
+            self._invalidate(key)
+            return
+        # A higher count only changes cached rankings that hold the key or that it now enters
+        rank = (-self.borrows[key], key)
+        for end in range(1, len(key) + 1):
+            ranked = self._top.get(key[:end])
+            if ranked is not None and (key in ranked or rank < (-self.borrows[ranked[-1]], ranked[-1])):
+                del self._top[key[:end]]
+
+    def _invalidate(self, key: str):
+        if not self._top:
+            return
+        for end in range(1, len(key) + 1):
+            self._top.pop(key[:end], None)
+
+    def _ranked(self, keys: Iterable[str], limit: int) -> List[str]:
+        # Most borrowed first, then alphabetical
+        return heapq.nsmallest(limit, keys, key=lambda key: (-self.borrows[key], key))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        The most borrowed values starting with prefix.
+
+        Returns:
+            List of (display text, borrow count), at most min(limit, MAX_SUGGESTIONS) long
+        """
+        prefix = normalize(prefix)
+        limit = min(limit, MAX_SUGGESTIONS)
+        if not prefix or limit <= 0:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + _END, start)
+        pending_start = bisect_left(self.pending, prefix)
+        pending_end = bisect_left(self.pending, prefix + _END, pending_start)
+        if end - start + pending_end - pending_start <= SCAN_LIMIT:
+            ranked = self._ranked(self.keys[start:end] + self.pending[pending_start:pending_end], limit)
+        else:
+            ranked = self._top.get(prefix)
+            if ranked is None:
+                keys = chain(self.keys[start:end], self.pending[pending_start:pending_end])
+                ranked = self._top[prefix] = self._ranked(keys, MAX_SUGGESTIONS)
+            ranked = ranked[:limit]
+        return [(self.display[key], self.borrows[key]) for key in ranked]
+
+
+class SuggestIndex:
+    """Prefix indexes over titles and authors, kept current as books are added."""
+
+    def __init__(self, refresh_interval: float = POPULARITY_SECONDS):
+        self.fields = {field: PrefixIndex() for field in SUGGEST_FIELDS}
+        self.last_book_id = 0
+        self.refresh_interval = refresh_interval
+        self._borrow_counts: Dict[int, int] = {}
+        # ID of the newest borrow record counted in _borrow_counts
+        self._borrow_cursor = 0
+        self._last_catch_up = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._pid = None
+        self._stop_event = threading.Event()
+
+    def build(self):
+        """Load borrow counts and every book."""
+        self._borrow_cursor, self._borrow_counts = get_borrow_counts_after(0)
+        self.catch_up(force=True)
+
+    def add_books(self, books: Iterable[Dict]):
+        """Add books (dicts with id, title and author), skipping ones already added."""
+        with self._lock:
+            books = [book for book in books if book['id'] > self.last_book_id]
+            if not books:
+                return
+            for field, index in self.fields.items():
+                index.add_many((book[field], book['id'], self._borrow_counts.get(book['id'], 0)) for book in books)
+            self.last_book_id = books[-1]['id']
+
+    def catch_up(self, force: bool = False):
+        """Add books created since the last call, at most every CATCH_UP_SECONDS unless forced."""
+        now = time.monotonic()
+        if not force and now - self._last_catch_up < CATCH_UP_SECONDS:
+            return
+        self._last_catch_up = now
+        while True:
+            books = get_books_after(self.last_book_id, CATCH_UP_BATCH)
+            self.add_books(books)
+            if len(books) < CATCH_UP_BATCH:
+                return
+
+    def refresh_popularity(self) -> bool:
+        """
+        Count the borrows made since the last refresh and re-rank the books they touched.
+
+        Returns:
+            Whether any borrow count had changed
+        """
+        with self._refresh_lock:
+            cursor, counts = get_borrow_counts_after(self._borrow_cursor)
+            with self._lock:
+                self._borrow_cursor = cursor
+                for book_id, borrows in counts.items():
+                    self._borrow_counts[book_id] = self._borrow_counts.get(book_id, 0) + borrows
+                    for index in self.fields.values():
+                        index.add_borrows(book_id, borrows)
+            return bool(counts)
+
+    def _ensure_refreshing(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._stop_event = threading.Event()
+                    threading.Thread(target=self._refresh, args=(self._stop_event,), name='suggest-popularity',
+                                     daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _refresh(self, stop_event: threading.Event):
+        while not stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh_popularity()
+            except Exception:
+                # Keep the current ranking and retry next interval
+                logger.warning("Refreshing suggestion popularity failed", exc_info=True)
+
+    def stop(self):
+        """Stop the popularity refresh thread (it restarts on the next suggestion)."""
+        with self._lock:
+            self._stop_event.set()
+            self._pid = None
+
+    def suggest(self, prefix: str, suggest_type: str = 'all', limit: int = 10) -> List[Dict]:
+        """
+        Suggestions for a prefix, most borrowed first.
+
+        Args:
+            prefix: What the user has typed so far
+            suggest_type: 'title', 'author' or 'all'
+            limit: Maximum number of suggestions (capped at MAX_SUGGESTIONS)
+
+        Returns:
+            List of dicts with text, type and borrows
+        """
+        self._ensure_refreshing()
+        self.catch_up()
+        fields = SUGGEST_FIELDS if suggest_type == 'all' else (suggest_type,)
+        suggestions = []
+        with self._lock:
+            for field in fields:
+                suggestions += [{'text': text, 'type': field, 'borrows': borrows}
+                                for text, borrows in self.fields[field].suggest(prefix, limit)]
+        if len(fields) > 1:
+            suggestions.sort(key=lambda suggestion: -suggestion['borrows'])
+        return suggestions[:min(limit, MAX_SUGGESTIONS)]
+
+
+_index: Optional[SuggestIndex] = None
+_build_lock = threading.Lock()
+
+
+def get_suggest_index(build: bool = True) -> Optional[SuggestIndex]:
+    """
+    The suggest index of this process.
+
+    Args:
+        build: Build the index if it doesn't exist yet; with False, return None instead
+    """
+    global _index
+    if _index is None and build:
+        with _build_lock:
+            if _index is None:
+                index = SuggestIndex(float(os.environ.get('LIBRARY_SUGGEST_REFRESH_SECONDS', POPULARITY_SECONDS)))
+                index.build()
+                _index = index
+    return _index
+
+
+def reset_suggest_index():
+    """Drop the index; the next suggestion rebuilds it."""
+    global _index
+    if _index is not None:
+        _index.stop()
+    _index = None
@@ -0,0 +1,167 @@
+"""
+Storage package - Pluggable storage backends for the service layer
+
+The service layer imports the module-level functions below, which forward to
+the active backend. They have the same names and signatures as the helpers in
+database.py, so SQLite stays the default and tests can keep patching
+`services.library_service.get_book_by_id` and friends.
+
+Choose the backend with LIBRARY_STORAGE_BACKEND ('sqlite' or 'memory'), or
+in code with set_backend() / use_backend().
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from models import Book, BorrowedBook, BorrowRecord
+from storage.base import StorageBackend
+from storage.memory_backend import InMemoryBackend
+from storage.sqlite_backend import SQLiteBackend
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'memory': InMemoryBackend,
+}
+
+_backend: Optional[StorageBackend] = None
+
+
+def create_backend(name: str) -> StorageBackend:
+    """Create a new backend by name ('sqlite' or 'memory')."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def get_backend() -> StorageBackend:
+    """The active backend, created from LIBRARY_STORAGE_BACKEND on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(os.environ.get('LIBRARY_STORAGE_BACKEND', 'sqlite'))
+    return _backend
+
+
+def set_backend(backend: Optional[StorageBackend]) -> Optional[StorageBackend]:
+    """
+    Make backend the active backend for the whole process.
+
+    Args:
+        backend: Backend instance, or None to go back to the LIBRARY_STORAGE_BACKEND default
+
+    Returns:
+        The previously active backend
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+@contextmanager
+def use_backend(backend: StorageBackend):
+    """Make backend the active backend for the duration of a block."""
+    previous = set_backend(backend)
+    try:
+        yield backend
+    finally:
+        set_backend(previous)
+
+
+# Setup
+
+def init_database():
+    """Create the storage schema if needed."""
+    get_backend().init_database()
+
+def schema_is_current() -> bool:
+    """Check whether the storage already has the current schema."""
+    return get_backend().schema_is_current()
+
+def add_sample_data():
+    """Add sample data if the catalog is empty."""
+    get_backend().add_sample_data()
+
+# Books
+
+def get_all_books() -> List[Book]:
+    """Get all books, ordered by title."""
+    return get_backend().get_all_books()
+
+def get_book_by_id(book_id: int) -> Optional[Book]:
+    """Get a specific book by ID."""
+    return get_backend().get_book_by_id(book_id)
+
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
+    """Get a specific book by ISBN."""
+    return get_backend().get_book_by_isbn(isbn)
+
+def get_books_by_ids(book_ids: List[int]) -> Dict[int, Book]:
+    """Get several books at once, keyed by book ID."""
+    return get_backend().get_books_by_ids(book_ids)
+
+def get_books_after(book_id: int, limit: int = 1000) -> List[Book]:
+    """Get up to limit books with an ID greater than book_id, in ID order."""
+    return get_backend().get_books_after(book_id, limit)
+
+def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+    """Insert a new book."""
+    return get_backend().insert_book(title, author, isbn, total_copies, available_copies)
+
+def update_book_availability(book_id: int, change: int) -> bool:
+    """Update the available copies of a book by a given amount."""
+    return get_backend().update_book_availability(book_id, change)
+
+# Borrow records
+
+def decrement_book_availability(book_id: int, max_attempts: int = 3) -> bool:
+    """Take one available copy of a book; False if none is available."""
+    return get_backend().decrement_book_availability(book_id, max_attempts)
+
+def get_patron_borrowed_books(patron_id: str) -> List[BorrowedBook]:
+    """Get currently borrowed books for a patron."""
+    return get_backend().get_patron_borrowed_books(patron_id)
+
+def get_patron_borrow_records(patron_id: str, include_archived: bool = True,
+                              limit: Optional[int] = None) -> List[BorrowRecord]:
+    """Get a patron's borrow records, active and returned, archived ones last."""
+    return get_backend().get_patron_borrow_records(patron_id, include_archived, limit)
+
+def get_active_borrow_record(patron_id: str, book_id: int) -> Optional[BorrowRecord]:
+    """Get a patron's active borrow record for a book, or None."""
+    return get_backend().get_active_borrow_record(patron_id, book_id)
+
+def get_patron_borrow_count(patron_id: str) -> int:
+    """Get the number of books currently borrowed by a patron."""
+    return get_backend().get_patron_borrow_count(patron_id)
+
+def get_borrow_counts() -> Dict[int, int]:
+    """Get how many times each book has been borrowed, keyed by book ID."""
+    return get_backend().get_borrow_counts()
+
+def get_borrow_counts_after(record_id: int) -> Tuple[int, Dict[int, int]]:
+    """Count the borrows with a record ID greater than record_id, and return the newest ID counted."""
+    return get_backend().get_borrow_counts_after(record_id)
+
+def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+    """Insert a new borrow record."""
+    return get_backend().insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+
+def update_borrow_record_return_date(record_id: int, return_date: datetime) -> bool:
+    """Update the return date for a borrow record by record ID."""
+    return get_backend().update_borrow_record_return_date(record_id, return_date)
+
+def archive_returned_borrow_records(cutoff: datetime, batch_size: int = 1000) -> int:
+    """Move borrow records returned before cutoff into the archive."""
+    return get_backend().archive_returned_borrow_records(cutoff, batch_size)
+
+# Payments
+
+def insert_payment(patron_id: str, book_id: int, amount: float, transaction_id: str, paid_at: datetime) -> bool:
+    """Record a late fee payment."""
+    return get_backend().insert_payment(patron_id, book_id, amount, transaction_id, paid_at)
+
+def get_patron_payments(patron_id: str) -> List[Dict]:
+    """Get all late fee payments made by a patron, newest first."""
+    return get_backend().get_patron_payments(patron_id)
@@ -0,0 +1,167 @@
+"""
+Storage Backend Interface - The operations the service layer needs from storage
+
+Every backend stores the same three kinds of data. Books and borrow records
+are returned as the row models in models.py, payments as plain dicts, all
+shaped like the rows of the SQLite schema in database.py:
+
+    books           id, title, author, isbn, total_copies, available_copies
+    borrow records  id, patron_id, book_id, borrow_date, due_date, return_date
+                    (dates are ISO 8601 strings; return_date is None while active);
+                    old returned records can be moved to an archive
+    payments        id, patron_id, book_id, amount, transaction_id, paid_at
+
+tests/test_storage.py is the conformance suite; a new backend is ready when it
+passes there.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from models import Book, BorrowedBook, BorrowRecord
+
+
+class StorageBackend(ABC):
+    """Abstract base class for storage backends."""
+
+    name = 'abstract'
+
+    # Setup
+
+    @abstractmethod
+    def init_database(self):
+        """Create the tables (or equivalent) if they don't exist yet."""
+
+    @abstractmethod
+    def schema_is_current(self) -> bool:
+        """Check whether init_database() has already run against this storage."""
+
+    @abstractmethod
+    def add_sample_data(self):
+        """Add the demo books and borrow record if there are no books yet."""
+
+    # Books
+
+    @abstractmethod
+    def get_all_books(self) -> List[Book]:
+        """Get all books, ordered by title."""
+
+    @abstractmethod
+    def get_book_by_id(self, book_id: int) -> Optional[Book]:
+        """Get a specific book by ID."""
+
+    @abstractmethod
+    def get_book_by_isbn(self, isbn: str) -> Optional[Book]:
+        """Get a specific book by ISBN."""
+
+    @abstractmethod
+    def get_books_by_ids(self, book_ids: List[int]) -> Dict[int, Book]:
+        """Get several books at once, keyed by book ID. Unknown IDs are left out."""
+
+    @abstractmethod
+    def get_books_after(self, book_id: int, limit: int = 1000) -> List[Book]:
+        """
+        Get up to limit books with an ID greater than book_id, in ID order.
+
+        IDs only ever increase, so this lets in-memory indexes pick up new books.
+        """
+
+    @abstractmethod
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        """Insert a new book. Returns False if the ISBN is already taken."""
+
+    @abstractmethod
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        """
+        Add change (+1 for return, -1 for borrow) to a book's available copies.
+
+        Returns:
+            True if updated; False if the book doesn't exist or the result would
+            be below 0 or above total_copies
+        """
+
+    @abstractmethod
+    def decrement_book_availability(self, book_id: int, max_attempts: int = 3) -> bool:
+        """
+        Take one available copy of a book, atomically with checking there is one.
+
+        Returns:
+            True if a copy was taken; False if none was available or the book doesn't exist
+        """
+
+    # Borrow records
+
+    @abstractmethod
+    def get_patron_borrowed_books(self, patron_id: str) -> List[BorrowedBook]:
+        """
+        Get the books a patron currently has out, oldest borrow first.
+
+        Returns:
+            List of dicts with book_id, title, author, borrow_date and due_date
+            (as datetimes) and is_overdue
+        """
+
+    @abstractmethod
+    def get_patron_borrow_records(self, patron_id: str, include_archived: bool = True,
+                                  limit: Optional[int] = None) -> List[BorrowRecord]:
+        """
+        Get a patron's borrow records, active and returned, newest first.
+
+        Records moved by archive_returned_borrow_records() come after the hot
+        ones. With include_archived=False they are left out; only returned
+        records can be archived, so active ones are all there. With a limit,
+        archived records are only read if there are fewer hot ones.
+        """
+
+    @abstractmethod
+    def get_active_borrow_record(self, patron_id: str, book_id: int) -> Optional[BorrowRecord]:
+        """
+        Get a patron's active borrow record for a book, or None.
+
+        A patron has at most one active record per book, and this lookup must
+        not depend on the length of the patron's history.
+        """
+
+    @abstractmethod
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        """Get the number of books currently borrowed by a patron."""
+
+    @abstractmethod
+    def get_borrow_counts(self) -> Dict[int, int]:
+        """Get how many times each book has been borrowed (archived records included), keyed by book ID."""
+
+    @abstractmethod
+    def get_borrow_counts_after(self, record_id: int) -> Tuple[int, Dict[int, int]]:
+        """
+        Count the borrows with a record ID greater than record_id (archived records included).
+
+        Record IDs are never reused, so an in-memory index can keep borrow
+        counts current by passing the returned ID to the next call.
+
+        Returns:
+            The newest record ID counted (at least record_id), and the counts by book ID
+        """
+
+    @abstractmethod
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+        """Insert a new, active borrow record. Returns False if the patron already has the book out."""
+
+    @abstractmethod
+    def update_borrow_record_return_date(self, record_id: int, return_date: datetime) -> bool:
+        """Set the return date of a borrow record that has not been returned yet."""
+
+    @abstractmethod
+    def archive_returned_borrow_records(self, cutoff: datetime, batch_size: int = 1000) -> int:
+        """Move records returned before cutoff to the archive. Returns how many were moved."""
+
+    # Payments
+
+    @abstractmethod
+    def insert_payment(self, patron_id: str, book_id: int, amount: float, transaction_id: str,
+                       paid_at: datetime) -> bool:
+        """Record a late fee payment. Returns False if the transaction ID is already recorded."""
+
+    @abstractmethod
+    def get_patron_payments(self, patron_id: str) -> List[Dict]:
+        """Get all late fee payments made by a patron, newest first."""
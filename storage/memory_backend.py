@@ -0,0 +1,242 @@
+"""
+In-Memory Storage Backend - Dict-based storage for fast tests and benchmarks
+
+Nothing is persisted and nothing is shared between processes. All methods
+take one lock, so the backend is safe to use from a threaded server. Rows are
+stored as dicts; reads return new row models (see models.py), so callers
+can't modify the stored rows.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from models import Book, BorrowedBook, BorrowRecord
+from storage.base import StorageBackend
+
+
+class InMemoryBackend(StorageBackend):
+    """Storage in Python dicts, one instance per backend object."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._books: Dict[int, Dict] = {}
+        self._book_ids_by_isbn: Dict[str, int] = {}
+        self._borrow_records: Dict[int, Dict] = {}
+        self._archived_records: Dict[int, Dict] = {}
+        # Active record ID by (patron_id, book_id), like idx_borrow_records_active
+        self._active_record_ids: Dict[Tuple[str, int], int] = {}
+        self._payments: Dict[int, Dict] = {}
+        self._next_id = {'books': 1, 'borrow_records': 1, 'payments': 1}
+
+    def _new_id(self, table: str) -> int:
+        new_id = self._next_id[table]
+        self._next_id[table] += 1
+        return new_id
+
+    # Setup
+
+    def init_database(self):
+        self._initialized = True
+
+    def schema_is_current(self) -> bool:
+        return self._initialized
+
+    def add_sample_data(self):
+        with self._lock:
+            if self._books:
+                return
+        sample_books = [
+            ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
+            ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
+            ('1984', 'George Orwell', '9780451524935', 1)
+        ]
+        for title, author, isbn, copies in sample_books:
+            self.insert_book(title, author, isbn, copies, copies)
+
+        # Make 1984 unavailable by adding a borrow record, as database.add_sample_data() does
+        self.insert_borrow_record('123456', 3, datetime.now() - timedelta(days=5),
+                                  datetime.now() + timedelta(days=9))
+        self.update_book_availability(3, -1)
+
+    # Books
+
+    def get_all_books(self) -> List[Book]:
+        with self._lock:
+            return [Book(**book) for book in sorted(self._books.values(), key=lambda book: book['title'])]
+
+    def get_book_by_id(self, book_id: int) -> Optional[Book]:
+        with self._lock:
+            book = self._books.get(book_id)
+            return Book(**book) if book else None
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Book]:
+        with self._lock:
+            book_id = self._book_ids_by_isbn.get(isbn)
+            return Book(**self._books[book_id]) if book_id is not None else None
+
+    def get_books_by_ids(self, book_ids: List[int]) -> Dict[int, Book]:
+        with self._lock:
+            return {book_id: Book(**self._books[book_id]) for book_id in set(book_ids) if book_id in self._books}
+
+    def get_books_after(self, book_id: int, limit: int = 1000) -> List[Book]:
+        with self._lock:
+            # IDs are handed out consecutively and books are never deleted
+            first_id = max(book_id + 1, 1)
+            next_ids = range(first_id, min(first_id + limit, self._next_id['books']))
+            return [Book(**self._books[next_id]) for next_id in next_ids]
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        with self._lock:
+            if isbn in self._book_ids_by_isbn:
+                return False
+            book_id = self._new_id('books')
+            self._books[book_id] = {
+                'id': book_id,
+                'title': title,
+                'author': author,
+                'isbn': isbn,
+                'total_copies': total_copies,
+                'available_copies': available_copies
+            }
+            self._book_ids_by_isbn[isbn] = book_id
+            return True
+
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is None or not 0 <= book['available_copies'] + change <= book['total_copies']:
+                return False
+            book['available_copies'] += change
+            return True
+
+    def decrement_book_availability(self, book_id: int, max_attempts: int = 3) -> bool:
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is None or book['available_copies'] <= 0:
+                return False
+            book['available_copies'] -= 1
+            return True
+
+    # Borrow records
+
+    def _active_records(self, patron_id: str) -> List[Dict]:
+        return [record for record in self._borrow_records.values()
+                if record['patron_id'] == patron_id and record['return_date'] is None]
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[BorrowedBook]:
+        with self._lock:
+            records = sorted(self._active_records(patron_id), key=lambda record: record['borrow_date'])
+            borrowed_books = []
+            for record in records:
+                book = self._books.get(record['book_id'])
+                if book is None:
+                    continue
+                borrowed_books.append(BorrowedBook.row_factory(None, (
+                    record['book_id'], book['title'], book['author'], record['borrow_date'], record['due_date'])))
+            return borrowed_books
+
+    def get_patron_borrow_records(self, patron_id: str, include_archived: bool = True,
+                                  limit: Optional[int] = None) -> List[BorrowRecord]:
+        with self._lock:
+            tables = [self._borrow_records, self._archived_records] if include_archived else [self._borrow_records]
+            records = []
+            for table in tables:
+                if limit is not None and len(records) >= limit:
+                    break
+                found = [record for record in table.values() if record['patron_id'] == patron_id]
+                found.sort(key=lambda record: record['borrow_date'], reverse=True)
+                records += found
+            return [BorrowRecord(record['id'], record['book_id'], record['borrow_date'], record['due_date'],
+                                 record['return_date']) for record in records[:limit]]
+
+    def get_active_borrow_record(self, patron_id: str, book_id: int) -> Optional[BorrowRecord]:
+        with self._lock:
+            record_id = self._active_record_ids.get((patron_id, book_id))
+            if record_id is None:
+                return None
+            record = self._borrow_records[record_id]
+            return BorrowRecord(record['id'], record['book_id'], record['borrow_date'], record['due_date'],
+                                record['return_date'])
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        with self._lock:
+            return len(self._active_records(patron_id))
+
+    def get_borrow_counts(self) -> Dict[int, int]:
+        with self._lock:
+            counts: Dict[int, int] = {}
+            for table in (self._borrow_records, self._archived_records):
+                for record in table.values():
+                    counts[record['book_id']] = counts.get(record['book_id'], 0) + 1
+            return counts
+
+    def get_borrow_counts_after(self, record_id: int) -> Tuple[int, Dict[int, int]]:
+        with self._lock:
+            last_id = max(record_id, self._next_id['borrow_records'] - 1)
+            counts: Dict[int, int] = {}
+            for new_id in range(record_id + 1, last_id + 1):
+                record = self._borrow_records.get(new_id) or self._archived_records.get(new_id)
+                if record is not None:
+                    counts[record['book_id']] = counts.get(record['book_id'], 0) + 1
+            return last_id, counts
+
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+        with self._lock:
+            if (patron_id, book_id) in self._active_record_ids:
+                return False
+            record_id = self._new_id('borrow_records')
+            self._borrow_records[record_id] = {
+                'id': record_id,
+                'patron_id': patron_id,
+                'book_id': book_id,
+                'borrow_date': borrow_date.isoformat(),
+                'due_date': due_date.isoformat(),
+                'return_date': None
+            }
+            self._active_record_ids[(patron_id, book_id)] = record_id
+            return True
+
+    def update_borrow_record_return_date(self, record_id: int, return_date: datetime) -> bool:
+        with self._lock:
+            record = self._borrow_records.get(record_id)
+            if record is not None and record['return_date'] is None:
+                record['return_date'] = return_date.isoformat()
+                del self._active_record_ids[(record['patron_id'], record['book_id'])]
+            return True
+
+    def archive_returned_borrow_records(self, cutoff: datetime, batch_size: int = 1000) -> int:
+        # Nothing else can read half-moved state, so one pass under the lock is enough
+        with self._lock:
+            archived = [record_id for record_id, record in self._borrow_records.items()
+                        if record['return_date'] is not None and record['return_date'] < cutoff.isoformat()]
+            for record_id in archived:
+                self._archived_records[record_id] = self._borrow_records.pop(record_id)
+            return len(archived)
+
+    # Payments
+
+    def insert_payment(self, patron_id: str, book_id: int, amount: float, transaction_id: str,
+                       paid_at: datetime) -> bool:
+        with self._lock:
+            if any(payment['transaction_id'] == transaction_id for payment in self._payments.values()):
+                return False
+            payment_id = self._new_id('payments')
+            self._payments[payment_id] = {
+                'id': payment_id,
+                'patron_id': patron_id,
+                'book_id': book_id,
+                'amount': amount,
+                'transaction_id': transaction_id,
+                'paid_at': paid_at.isoformat()
+            }
+            return True
+
+    def get_patron_payments(self, patron_id: str) -> List[Dict]:
+        with self._lock:
+            payments = [dict(payment) for payment in self._payments.values() if payment['patron_id'] == patron_id]
+            payments.sort(key=lambda payment: payment['paid_at'], reverse=True)
+            return payments
@@ -0,0 +1,88 @@
+"""
+SQLite Storage Backend - The default backend, backed by database.py
+
+Every method delegates to the module-level function of the same name in
+database.py, so connection handling, read replicas and query tracing work
+exactly as before.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import database
+from models import Book, BorrowedBook, BorrowRecord
+from storage.base import StorageBackend
+
+
+class SQLiteBackend(StorageBackend):
+    """Storage in the SQLite file at database.DATABASE."""
+
+    name = 'sqlite'
+
+    def init_database(self):
+        database.init_database()
+
+    def schema_is_current(self) -> bool:
+        return database.schema_is_current()
+
+    def add_sample_data(self):
+        database.add_sample_data()
+
+    def get_all_books(self) -> List[Book]:
+        return database.get_all_books()
+
+    def get_book_by_id(self, book_id: int) -> Optional[Book]:
+        return database.get_book_by_id(book_id)
+
+    def get_book_by_isbn(self, isbn: str) -> Optional[Book]:
+        return database.get_book_by_isbn(isbn)
+
+    def get_books_by_ids(self, book_ids: List[int]) -> Dict[int, Book]:
+        return database.get_books_by_ids(book_ids)
+
+    def get_books_after(self, book_id: int, limit: int = 1000) -> List[Book]:
+        return database.get_books_after(book_id, limit)
+
+    def insert_book(self, title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
+        return database.insert_book(title, author, isbn, total_copies, available_copies)
+
+    def update_book_availability(self, book_id: int, change: int) -> bool:
+        return database.update_book_availability(book_id, change)
+
+    def decrement_book_availability(self, book_id: int, max_attempts: int = 3) -> bool:
+        return database.decrement_book_availability(book_id, max_attempts)
+
+    def get_patron_borrowed_books(self, patron_id: str) -> List[BorrowedBook]:
+        return database.get_patron_borrowed_books(patron_id)
+
+    def get_patron_borrow_records(self, patron_id: str, include_archived: bool = True,
+                                  limit: Optional[int] = None) -> List[BorrowRecord]:
+        return database.get_patron_borrow_records(patron_id, include_archived, limit)
+
+    def get_active_borrow_record(self, patron_id: str, book_id: int) -> Optional[BorrowRecord]:
+        return database.get_active_borrow_record(patron_id, book_id)
+
+    def get_patron_borrow_count(self, patron_id: str) -> int:
+        return database.get_patron_borrow_count(patron_id)
+
+    def get_borrow_counts(self) -> Dict[int, int]:
+        return database.get_borrow_counts()
+
+    def get_borrow_counts_after(self, record_id: int) -> Tuple[int, Dict[int, int]]:
+        return database.get_borrow_counts_after(record_id)
+
+    def insert_borrow_record(self, patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
+        return database.insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+
+    def update_borrow_record_return_date(self, record_id: int, return_date: datetime) -> bool:
+        return database.update_borrow_record_return_date(record_id, return_date)
+
+    def archive_returned_borrow_records(self, cutoff: datetime, batch_size: int = 1000) -> int:
+        return database.archive_returned_borrow_records(cutoff, batch_size)
+
+    def insert_payment(self, patron_id: str, book_id: int, amount: float, transaction_id: str,
+                       paid_at: datetime) -> bool:
+        return database.insert_payment(patron_id, book_id, amount, transaction_id, paid_at)
+
+    def get_patron_payments(self, patron_id: str) -> List[Dict]:
+        return database.get_patron_payments(patron_id)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import pytest
+import database
+from services.suggest_index import reset_suggest_index
+
+
+@pytest.fixture
+def library_db():
+    """Temporary database initialised with the sample data."""
+    original = database.DATABASE
+    db_fd, database.DATABASE = tempfile.mkstemp()
+    database.init_database()
+    database.add_sample_data()
+    yield database.DATABASE
+    os.close(db_fd)
+    os.unlink(database.DATABASE)
+    database.DATABASE = original
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Context manager asserting a maximum query count and SQL time for a block.
+
+    Usage:
+        with query_budget(max_queries=2, max_seconds=0.05):
+            get_patron_status_report("123456")
+    """
+    return database.query_budget
+
+
+@pytest.fixture(autouse=True)
+def suggest_index():
+    """Drop the suggest index create_app builds, so it doesn't outlive the test's database."""
+    yield
+    reset_suggest_index()
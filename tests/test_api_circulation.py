@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import database
+from app import create_app
+
+
+class TestCirculationApi(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_borrow_returns_availability_and_due_date(self):
+        response = self.client.post('/api/borrow', json={'patron_id': '654321', 'book_id': 1})
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertTrue(payload['success'])
+        self.assertEqual(payload['book'], {'id': 1, 'available_copies': 2, 'total_copies': 3})
+        due_date = datetime.fromisoformat(payload['due_date'])
+        self.assertAlmostEqual((due_date - datetime.now()).total_seconds(), timedelta(days=14).total_seconds(),
+                               delta=60)
+        self.assertEqual(payload['due_date'], database.get_active_borrow_record('654321', 1)['due_date'])
+
+    def test_refused_borrow_still_reports_availability(self):
+        response = self.client.post('/api/borrow', json={'patron_id': '654321', 'book_id': 3})
+        self.assertEqual(response.status_code, 400)
+        payload = response.get_json()
+        self.assertFalse(payload['success'])
+        self.assertEqual(payload['message'], 'This book is currently not available.')
+        self.assertEqual(payload['book'], {'id': 3, 'available_copies': 0, 'total_copies': 1})
+        self.assertIsNone(payload['due_date'])
+
+        response = self.client.post('/api/borrow', json={'patron_id': '654321', 'book_id': 99})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(response.get_json()['book'])
+
+    def test_invalid_book_id(self):
+        for body in ({'patron_id': '654321', 'book_id': 'x'}, {'patron_id': '654321'}):
+            response = self.client.post('/api/borrow', json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json(), {'success': False, 'message': 'Invalid book ID.'})
+        self.assertEqual(self.client.post('/api/return', data={'patron_id': '654321'}).status_code, 400)
+
+    def test_return_reports_the_returned_loan(self):
+        loan = database.get_active_borrow_record('123456', 3)
+        # Desk clients may post form fields instead of JSON
+        response = self.client.post('/api/return', data={'patron_id': '123456', 'book_id': '3'})
+        self.assertEqual(response.status_code, 200)
+        payload = response.get_json()
+        self.assertTrue(payload['success'])
+        self.assertEqual(payload['book'], {'id': 3, 'available_copies': 1, 'total_copies': 1})
+        self.assertEqual(payload['due_date'], loan['due_date'])
+
+        response = self.client.post('/api/return', json={'patron_id': '123456', 'book_id': 3})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], 'No active borrow record found for this book and patron.')
+
+    def test_borrow_reads_only_the_changed_book(self):
+        # The borrow itself, then the book's availability and the new loan; no catalog read
+        with database.query_budget(max_queries=6) as statements:
+            self.client.post('/api/borrow', json={'patron_id': '654321', 'book_id': 2})
+        self.assertFalse(any('ORDER BY title' in sql for sql, _ in statements))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import database
+from asgi import create_asgi_app
+from services import async_library_service
+
+
+async def call(app, path, query=b'', method='GET', body=b'', headers=()):
+    """Send one HTTP request to an ASGI app and collect (status, headers, body)."""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': list(headers), 'http_version': '1.1', 'scheme': 'http',
+             'server': ('testserver', 80), 'client': ('127.0.0.1', 5000), 'root_path': ''}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, body_message = messages
+    return start['status'], dict(start['headers']), body_message['body']
+
+
+class TestAsyncAPI(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        self.app = create_asgi_app()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_search_matches_flask_api(self):
+        status, headers, body = asyncio.run(call(self.app, '/api/search', b'q=gatsby&type=title'))
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        flask_response = self.app.flask_app.test_client().get('/api/search?q=gatsby&type=title')
+        self.assertEqual(json.loads(body), flask_response.get_json())
+
+    def test_search_requires_term(self):
+        status, _, body = asyncio.run(call(self.app, '/api/search'))
+        self.assertEqual(status, 400)
+        self.assertIn('error', json.loads(body))
+
+    def test_late_fee(self):
+        now = datetime.now()
+        database.insert_borrow_record("654321", 1, now - timedelta(days=20), now - timedelta(days=6))
+        status, _, body = asyncio.run(call(self.app, '/api/late_fee/654321/1'))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['days_overdue'], 6)
+
+        status, _, _ = asyncio.run(call(self.app, '/api/late_fee/654321/9999'))
+        self.assertEqual(status, 400)
+
+    def test_late_fee_rejects_negative_book_ids_like_flask(self):
+        # Flask's <int:book_id> doesn't match "-1", so both front ends answer 404
+        status, _, _ = asyncio.run(call(self.app, '/api/late_fee/654321/-1'))
+        flask_response = self.app.flask_app.test_client().get('/api/late_fee/654321/-1')
+        self.assertEqual((status, flask_response.status_code), (404, 404))
+
+    def test_other_paths_are_served_by_flask(self):
+        status, headers, body = asyncio.run(call(self.app, '/catalog'))
+        self.assertEqual(status, 200)
+        self.assertIn(b'Book Catalog', body)
+
+        form = b'patron_id=654321&book_id=1'
+        status, headers, _ = asyncio.run(call(
+            self.app, '/borrow', method='POST', body=form,
+            headers=[(b'content-type', b'application/x-www-form-urlencoded')]))
+        self.assertEqual(status, 302)
+        self.assertEqual(database.get_patron_borrow_count("654321"), 1)
+
+    def test_concurrent_requests_share_small_thread_pool(self):
+        def slow_search(term, search_type):
+            time.sleep(0.05)
+            return []
+
+        async def many():
+            return await asyncio.gather(*(call(self.app, '/api/search', b'q=x') for _ in range(40)))
+
+        with patch.object(async_library_service, 'search_books_in_catalog', slow_search):
+            responses = asyncio.run(many())
+        self.assertEqual({status for status, _, _ in responses}, {200})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import database
+from app import create_app
+from asgi import create_asgi_app
+from services import availability_feed
+from services.availability_feed import AvailabilityFeed, format_event, stream_availability
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+def _events(messages):
+    """The (event ID, event type) pairs in a text/event-stream body."""
+    events = []
+    for message in messages.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']) if 'id' in fields else None, fields['event']))
+    return events
+
+
+class TestAvailabilityFeed(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+        # Polled by hand in these tests
+        self.feed = AvailabilityFeed(poll_interval=60, history=3)
+
+    def tearDown(self):
+        self.feed.stop()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_book_updates_become_events(self):
+        start = database.get_last_change_id()
+        self.assertEqual(self.feed.events_after(start), [])
+        borrow_book_by_patron('654321', 1)
+        borrow_book_by_patron('654321', 2)
+        return_book_by_patron('654321', 1)
+        self.assertEqual(self.feed.poll(), 2)
+        events = self.feed.events_after(start)
+        # Book 1 changed twice; only its newest state is sent, under its newest change ID
+        self.assertEqual([book for _, book in events], [
+            {'id': 2, 'available_copies': 1, 'total_copies': 2},
+            {'id': 1, 'available_copies': 3, 'total_copies': 3},
+        ])
+        self.assertEqual(events[-1][0], database.get_last_change_id())
+        self.assertEqual(self.feed.events_after(events[0][0]), events[1:])
+        self.assertEqual(self.feed.events_after(events[-1][0]), [])
+
+    def test_old_cursors_catch_up_from_the_log(self):
+        rendered_at = database.get_last_change_id()
+        database.update_book_availability(1, -1)
+        self.feed.events_after(database.get_last_change_id())
+        for book_id, change in ((2, -1), (3, 1), (2, 1), (1, 1)):
+            database.update_book_availability(book_id, change)
+            self.feed.poll()
+        # The first two changes are older than the feed's history, so they come from the log
+        self.assertEqual([(book['id'], book['available_copies']) for _, book in self.feed.events_after(rendered_at)],
+                         [(1, 3), (2, 2), (3, 1), (2, 2), (1, 3)])
+
+    def test_pruned_log_cannot_be_replayed(self):
+        rendered_at = database.get_last_change_id()
+        database.update_book_availability(1, -1)
+        database.update_book_availability(2, -1)
+        self.feed.events_after(database.get_last_change_id())
+        database.prune_change_log(rendered_at + 1)
+        self.assertIsNone(self.feed.events_after(rendered_at))
+
+    def test_waits_for_the_next_event(self):
+        self.feed.poll_interval = 0.01
+        cursor = database.get_last_change_id()
+        self.feed.events_after(cursor)
+        timer = threading.Timer(0.05, database.update_book_availability, args=(1, -1))
+        timer.start()
+        events = self.feed.events_after(cursor, timeout=5)
+        timer.join()
+        self.assertEqual([book['id'] for _, book in events], [1])
+
+    def test_feed_thread_survives_a_locked_database(self):
+        self.feed.poll_interval = 0.01
+        cursor = database.get_last_change_id()
+        read_events = availability_feed._read_events
+        calls = []
+
+        def flaky_read_events(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise sqlite3.OperationalError('database is locked')
+            return read_events(*args)
+
+        with patch.object(availability_feed, '_read_events', flaky_read_events), \
+                self.assertLogs('services.availability_feed', 'WARNING'):
+            self.feed.events_after(cursor)
+            database.update_book_availability(1, -1)
+            events = self.feed.events_after(cursor, timeout=5)
+        self.assertEqual(self.feed.failures, 1)
+        self.assertEqual([book['id'] for _, book in events], [1])
+
+    def test_stream(self):
+        cursor = database.get_last_change_id()
+        borrow_book_by_patron('654321', 1)
+        with patch.object(availability_feed, '_feed', self.feed):
+            messages = ''.join(stream_availability(cursor, max_seconds=0.05))
+        self.assertTrue(messages.startswith('retry: '))
+        self.assertEqual(_events(messages), [(cursor + 1, 'availability')])
+        self.assertIn(format_event(cursor + 1, {'id': 1, 'available_copies': 2, 'total_copies': 3}), messages)
+
+
+class TestAvailabilityRoutes(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        self.feed = AvailabilityFeed(poll_interval=0.01)
+        self.patches = [patch.object(availability_feed, '_feed', self.feed),
+                        patch.object(availability_feed, 'MAX_STREAM_SECONDS', 0.1),
+                        patch.object(availability_feed, 'WSGI_STREAMS', True)]
+        for patcher in self.patches:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self.patches:
+            patcher.stop()
+        self.feed.stop()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_catalog_page_subscribes_after_its_rows(self):
+        page = self.client.get('/catalog').get_data(as_text=True)
+        self.assertIn('<tr data-book-id="1">', page)
+        self.assertIn(f'/api/availability/stream?after={database.get_last_change_id()}', page)
+
+    def test_threaded_wsgi_polls_instead_of_streaming(self):
+        rendered_at = database.get_last_change_id()
+        with patch.object(availability_feed, 'WSGI_STREAMS', False):
+            page = self.client.get('/catalog').get_data(as_text=True)
+            self.assertIn('if (false && window.EventSource)', page)
+            self.assertIn(f'let cursor = {rendered_at};', page)
+            self.assertEqual(self.client.get('/api/availability/stream').status_code, 404)
+
+            self.client.post('/borrow', data={'patron_id': '654321', 'book_id': '2'})
+            changes = self.client.get(f'/api/availability/changes?after={rendered_at}').get_json()
+            self.assertEqual(changes['books'], [{'id': 2, 'available_copies': 1, 'total_copies': 2}])
+            # The cursor skips the loan's own change_log entry too
+            self.assertEqual(changes['cursor'], database.get_last_change_id())
+            changes = self.client.get(f"/api/availability/changes?after={changes['cursor']}").get_json()
+            self.assertEqual((changes['reset'], changes['books']), (False, []))
+            self.assertEqual(self.client.get('/api/availability/changes?after=x').status_code, 400)
+
+            database.prune_change_log(database.get_last_change_id())
+            self.assertTrue(self.client.get('/api/availability/changes?after=0').get_json()['reset'])
+
+    def test_asgi_catalog_page_streams(self):
+        with patch.object(availability_feed, 'WSGI_STREAMS', False):
+            scope = {'type': 'http', 'method': 'GET', 'path': '/catalog', 'query_string': b'', 'headers': []}
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                sent.append(message)
+
+            asyncio.run(create_asgi_app(self.app)(scope, receive, send))
+        self.assertIn(b'if (true && window.EventSource)', sent[1]['body'])
+
+    def test_stream_resumes_after_the_rendered_change(self):
+        rendered_at = database.get_last_change_id()
+        self.client.post('/borrow', data={'patron_id': '654321', 'book_id': '2'})
+        response = self.client.get(f'/api/availability/stream?after={rendered_at}')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        body = response.get_data(as_text=True)
+        self.assertEqual(_events(body), [(rendered_at + 1, 'availability')])
+        self.assertIn('"available_copies":1', body.replace(' ', ''))
+
+        # A reconnecting browser sends the last ID it saw instead
+        response = self.client.get(f'/api/availability/stream?after={rendered_at}',
+                                   headers={'Last-Event-ID': str(rendered_at + 1)})
+        self.assertEqual(_events(response.get_data(as_text=True)), [])
+
+    def test_stream_reset_and_errors(self):
+        database.update_book_availability(1, -1)
+        database.prune_change_log(database.get_last_change_id())
+        body = self.client.get('/api/availability/stream?after=0').get_data(as_text=True)
+        self.assertEqual(_events(body), [(None, 'reset')])
+        self.assertEqual(self.client.get('/api/availability/stream?after=x').status_code, 400)
+
+    def test_asgi_stream_until_disconnect(self):
+        rendered_at = database.get_last_change_id()
+        database.update_book_availability(1, -1)
+        app = create_asgi_app(self.app)
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/availability/stream',
+                 'query_string': f'after={rendered_at}'.encode(), 'headers': []}
+        sent = []
+
+        async def run():
+            requested = asyncio.Event()
+
+            async def receive():
+                if not requested.is_set():
+                    requested.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client hangs up once the event has arrived
+                while not any(b'event: availability' in message.get('body', b'') for message in sent):
+                    await asyncio.sleep(0.01)
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            with patch.object(availability_feed, 'MAX_STREAM_SECONDS', 5):
+                await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+        asyncio.run(run())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream; charset=utf-8'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:]).decode()
+        self.assertEqual(_events(body), [(rendered_at + 1, 'availability')])
+
+
+if __name__ == '__main__':
+    unittest.main()
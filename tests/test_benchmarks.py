@@ -0,0 +1,47 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+import database
+from common import compare_results, load_memory_backend, remove_database, seed_database, temp_database
+
+
+def _results(**timings):
+    return {'results': {'1k': {name: {'median_ms': value} for name, value in timings.items()}}}
+
+
+def test_compare_results_flags_only_regressions_over_threshold():
+    baseline = _results(search=10.0, catalog=10.0, borrow=10.0)
+    current = _results(search=12.0, catalog=10.5, borrow=5.0, new_benchmark=99.0)
+    regressions = compare_results(baseline, current, threshold=0.15)
+    assert [(group, name) for group, name, *_ in regressions] == [('1k', 'search')]
+    assert regressions[0][4] == 1.2
+
+
+def test_seed_database_uses_named_scale():
+    original = database.DATABASE
+    path = temp_database()
+    try:
+        counts = seed_database(path, '1k')
+        assert counts['books'] == 1000
+        assert len(database.get_all_books()) == 1000
+    finally:
+        remove_database(path)
+        database.DATABASE = original
+
+
+def test_load_memory_backend_matches_seeded_database():
+    original = database.DATABASE
+    path = temp_database()
+    try:
+        seed_database(path, '1k')
+        backend = load_memory_backend(path)
+        assert backend.get_all_books() == database.get_all_books()
+        conn = database.get_db_connection()
+        patron_id = conn.execute('SELECT patron_id FROM borrow_records LIMIT 1').fetchone()[0]
+        conn.close()
+        by_id = lambda records: sorted(records, key=lambda record: record['id'])
+        assert by_id(backend.get_patron_borrow_records(patron_id)) == \
+            by_id(database.get_patron_borrow_records(patron_id))
+        assert backend.get_patron_borrow_count(patron_id) == database.get_patron_borrow_count(patron_id)
+    finally:
+        remove_database(path)
+        database.DATABASE = original
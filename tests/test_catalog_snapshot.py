@@ -0,0 +1,153 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import database
+from catalog_snapshot import (CatalogSnapshot, SnapshotPublisher, SnapshotReader, disable_catalog_snapshot,
+                              enable_catalog_snapshot, encode_snapshot, get_catalog_snapshot)
+import catalog_snapshot
+from invalidation import get_bus, reset_bus
+from services.library_service import (borrow_book_by_patron, calculate_late_fee_for_book, get_catalog_books,
+                                      search_books_in_catalog)
+
+VERSIONS = {'catalog': 3, 'availability': 7}
+
+
+class TestSnapshotFormat(unittest.TestCase):
+    def setUp(self):
+        books = [
+            (7, 'Ærø Ø', 'Ünïcode Author', '9780000000007', 2, 1),
+            (2, 'Alpha', 'Zed', '9780000000002', 1, 0),
+            (5, 'Beta Alpha', 'Ann Leigh', '9780000000005', 4, 4),
+        ]
+        self.snapshot = CatalogSnapshot(encode_snapshot(books, VERSIONS))
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.snapshot), 3)
+        self.assertEqual(self.snapshot.versions, VERSIONS)
+        self.assertEqual(list(self.snapshot.rows())[0], (7, 'Ærø Ø', 'Ünïcode Author', '9780000000007', 2, 1))
+        self.assertEqual([book['id'] for book in self.snapshot.books()], [7, 2, 5])
+        self.assertEqual(self.snapshot.get_book(5)['author'], 'Ann Leigh')
+        self.assertEqual(self.snapshot.get_book(2)['available_copies'], 0)
+        self.assertIsNone(self.snapshot.get_book(3))
+        self.assertIsNone(self.snapshot.get_book(99))
+
+    def test_search(self):
+        self.assertEqual([book['id'] for book in self.snapshot.search('title', 'alpha')], [2, 5])
+        self.assertEqual([book['id'] for book in self.snapshot.search('title', 'ærø')], [7])
+        self.assertEqual([book['id'] for book in self.snapshot.search('author', 'ünï')], [7])
+        self.assertEqual([book['id'] for book in self.snapshot.search('isbn', '0005')], [5])
+        # Text only matches within one book, never across two neighbouring ones
+        self.assertEqual(self.snapshot.search('title', 'alphabeta'), [])
+        self.assertEqual(self.snapshot.search('author', 'zedann'), [])
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            CatalogSnapshot(b'\0' * 64)
+
+
+class TestPublishedSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+        self.snapshot_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.snapshot_dir.name, 'catalog.snapshot')
+        self.publisher = SnapshotPublisher(self.path)
+
+    def tearDown(self):
+        disable_catalog_snapshot()
+        reset_bus()
+        self.snapshot_dir.cleanup()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_publishes_new_generations_only_when_books_change(self):
+        self.assertTrue(self.publisher.publish_if_changed())
+        self.assertFalse(self.publisher.publish_if_changed())
+        reader = SnapshotReader(self.path)
+        first = reader.current()
+        self.assertIs(reader.current(), first)
+
+        # Copy counts alone wait for the availability interval
+        database.update_book_availability(1, -1)
+        self.assertFalse(self.publisher.publish_if_changed())
+        self.publisher.availability_interval = 0
+        self.assertTrue(self.publisher.publish_if_changed())
+        second = reader.current()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.get_book(1)['available_copies'], 2)
+        # Readers still holding the old generation keep a consistent view
+        self.assertEqual(first.get_book(1)['available_copies'], 3)
+        self.assertEqual(os.listdir(self.snapshot_dir.name), ['catalog.snapshot'])
+
+        self.publisher.availability_interval = 3600
+        database.insert_book('The Hobbit', 'J. R. R. Tolkien', '9780547928227', 1, 1)
+        self.assertTrue(self.publisher.publish_if_changed())
+        self.assertEqual(len(reader.current()), 4)
+
+    def test_copy_counts_are_overlaid(self):
+        enable_catalog_snapshot(self.path)
+        self.assertIsNone(get_catalog_snapshot())
+        self.publisher.publish_if_changed()
+        published = get_catalog_snapshot()
+        self.assertEqual(published.overlay, {})
+
+        database.update_book_availability(1, -1)
+        snapshot = get_catalog_snapshot()
+        self.assertEqual(snapshot.change_id, published.change_id)
+        self.assertEqual(snapshot.get_book(1)['available_copies'], 2)
+        self.assertEqual([row[5] for row in snapshot.rows()], [0, 2, 2])
+        self.assertEqual([book['id'] for book in snapshot.search('title', 'the')], [1])
+        # Only the changed book is re-read, once
+        with database.query_budget(max_queries=1):
+            get_catalog_snapshot()
+        self.assertEqual(len(catalog_snapshot._overlay), 1)
+
+        # A generation that includes the change empties the overlay
+        self.publisher.availability_interval = 0
+        self.publisher.publish_if_changed()
+        self.assertEqual(get_catalog_snapshot().get_book(1)['available_copies'], 2)
+        self.assertEqual(len(catalog_snapshot._overlay), 0)
+
+    def test_stale_catalog_is_not_served(self):
+        enable_catalog_snapshot(self.path)
+        self.publisher.publish_if_changed()
+        database.insert_book('The Hobbit', 'J. R. R. Tolkien', '9780547928227', 1, 1)
+        self.assertIsNone(get_catalog_snapshot())
+        self.publisher.publish_if_changed()
+        self.assertEqual(get_catalog_snapshot().get_book(4)['title'], 'The Hobbit')
+
+    def test_snapshot_older_than_the_overlay_is_not_served(self):
+        self.publisher.publish_if_changed()
+        database.update_book_availability(1, -1)
+        # This process's bus starts tracking after the change, so the overlay can't cover it
+        get_bus().poll()
+        enable_catalog_snapshot(self.path)
+        self.assertIsNone(get_catalog_snapshot())
+        self.publisher.availability_interval = 0
+        self.publisher.publish_if_changed()
+        self.assertEqual(get_catalog_snapshot().get_book(1)['available_copies'], 2)
+
+    def test_service_reads_from_the_snapshot(self):
+        enable_catalog_snapshot(self.path)
+        self.publisher.publish_if_changed()
+        expected = [dict(book) for book in database.get_all_books()]
+
+        unused = AssertionError('read from storage')
+        with patch('services.library_service.get_all_books', side_effect=unused), \
+                patch('services.library_service.get_book_by_id', side_effect=unused):
+            self.assertEqual([dict(book) for book in get_catalog_books()],
+                             [dict(book, borrowable=book['available_copies'] > 0) for book in expected])
+            self.assertEqual([book['title'] for book in search_books_in_catalog('the', 'title')],
+                             ['The Great Gatsby'])
+            self.assertEqual(calculate_late_fee_for_book('654321', 1)['fee_amount'], 0.0)
+
+        # Borrowing reads storage; the snapshot keeps serving the catalog with the new count
+        self.assertTrue(borrow_book_by_patron('654321', 1)[0])
+        with patch('services.library_service.get_all_books', side_effect=unused):
+            self.assertEqual(next(book for book in get_catalog_books() if book['id'] == 1)['available_copies'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
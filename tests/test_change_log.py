@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+import database
+from change_log import iter_changes, tail_changes
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def _changes(self, after_id=0):
+        return [(change.table_name, change.row_id, change.operation) for change in iter_changes(after_id)]
+
+    def test_sample_data_is_logged(self):
+        self.assertEqual(self._changes(), [
+            ('books', 1, 'insert'), ('books', 2, 'insert'), ('books', 3, 'insert'),
+            ('borrow_records', 1, 'insert'), ('books', 3, 'update'),
+        ])
+
+    def test_borrow_and_return_are_logged(self):
+        cursor = database.get_last_change_id()
+        self.assertTrue(borrow_book_by_patron('654321', 1)[0])
+        self.assertTrue(return_book_by_patron('654321', 1)[0])
+        self.assertEqual(self._changes(cursor), [
+            ('books', 1, 'update'), ('borrow_records', 2, 'insert'),
+            ('borrow_records', 2, 'update'), ('books', 1, 'update'),
+        ])
+        change = next(iter_changes(cursor))
+        self.assertTrue(change.changed_at.startswith(datetime.utcnow().strftime('%Y-%m-%d')))
+
+    def test_archived_records_are_logged_as_archive(self):
+        now = datetime.now()
+        database.insert_borrow_record('654321', 1, now - timedelta(days=400), now - timedelta(days=386))
+        record = database.get_active_borrow_record('654321', 1)
+        database.update_borrow_record_return_date(record['id'], now - timedelta(days=380))
+        cursor = database.get_last_change_id()
+        database.archive_returned_borrow_records(now - timedelta(days=365))
+
+        conn = database.get_db_connection()
+        conn.execute('DELETE FROM borrow_records WHERE id = 1')
+        conn.commit()
+        conn.close()
+        self.assertEqual(self._changes(cursor), [
+            ('borrow_records', record['id'], 'archive'), ('borrow_records', 1, 'delete')])
+
+    def test_iter_changes_batches_and_filters(self):
+        for n in range(5):
+            database.insert_book(f'Book {n}', 'Author', f'100000000000{n}', 1, 1)
+        books = [change.row_id for change in iter_changes(0, tables=['books'], batch_size=2)]
+        self.assertEqual(books, [1, 2, 3, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(list(iter_changes(database.get_last_change_id())), [])
+
+    def test_tail_changes_follows_the_log(self):
+        stop = threading.Event()
+        seen = []
+
+        def follow(after_id):
+            for change in tail_changes(after_id, tables=['books'], poll_interval=0.01, stop=stop):
+                seen.append(change.row_id)
+                if len(seen) == 2:
+                    stop.set()
+
+        follower = threading.Thread(target=follow, args=(database.get_last_change_id(),))
+        follower.start()
+        try:
+            database.insert_borrow_record('654321', 1, datetime.now(), datetime.now() + timedelta(days=14))
+            database.insert_book('New', 'Author', '1000000000001', 1, 1)
+            database.update_book_availability(2, -1)
+            follower.join(timeout=5)
+        finally:
+            stop.set()
+        self.assertFalse(follower.is_alive())
+        self.assertEqual(seen, [4, 2])
+
+    def test_tail_changes_starts_from_the_end_of_the_log(self):
+        changes = tail_changes(poll_interval=0.01)
+        database.insert_book('New', 'Author', '1000000000001', 1, 1)
+        self.assertEqual(next(changes).row_id, 4)
+
+    def test_prune_change_log(self):
+        last_id = database.get_last_change_id()
+        self.assertEqual(database.prune_change_log(last_id - 1), last_id - 1)
+        self.assertEqual([change.id for change in iter_changes()], [last_id])
+        self.assertEqual(database.get_last_change_id(), last_id)
+
+    def test_init_database_adds_change_log_to_older_databases(self):
+        conn = database.get_db_connection()
+        database.drop_change_log_triggers(conn)
+        conn.execute('DROP TABLE change_log')
+        conn.commit()
+        conn.close()
+
+        database.init_database()
+        database.insert_book('New', 'Author', '1000000000001', 1, 1)
+        self.assertEqual(self._changes(), [('books', 4, 'insert')])
+
+
+if __name__ == '__main__':
+    unittest.main()
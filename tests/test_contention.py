@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import database
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+COPIES = 3
+THREADS = 12
+
+
+def _run_threads(target, count):
+    start = threading.Barrier(count)
+
+    def run(index):
+        start.wait()
+        target(index)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestHotTitleContention(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.enable_wal_mode()
+        database.insert_book('Hot Title', 'Popular Author', '9990000000001', COPIES, COPIES)
+        self.book_id = database.get_book_by_isbn('9990000000001')['id']
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database.DATABASE + suffix):
+                os.unlink(database.DATABASE + suffix)
+
+    def _active_loans(self):
+        conn = sqlite3.connect(database.DATABASE)
+        count = conn.execute('SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL',
+                             (self.book_id,)).fetchone()[0]
+        conn.close()
+        return count
+
+    def test_last_copies_are_never_oversold(self):
+        results = []
+        _run_threads(lambda index: results.append(borrow_book_by_patron(str(300000 + index), self.book_id)),
+                     THREADS)
+        self.assertEqual(sum(success for success, _ in results), COPIES)
+        self.assertTrue(all('not available' in message for success, message in results if not success))
+        self.assertEqual(database.get_book_by_id(self.book_id)['available_copies'], 0)
+        self.assertEqual(self._active_loans(), COPIES)
+
+    def test_borrow_return_churn_keeps_invariants(self):
+        rounds = 10
+        borrowed = [0] * THREADS
+        violations = []
+
+        def desk(index):
+            patron_id = str(300000 + index)
+            for _ in range(rounds):
+                if borrow_book_by_patron(patron_id, self.book_id)[0]:
+                    borrowed[index] += 1
+                    if not return_book_by_patron(patron_id, self.book_id)[0]:
+                        violations.append(f'{patron_id} could not return')
+                available = database.get_book_by_id(self.book_id)['available_copies']
+                if not 0 <= available <= COPIES:
+                    violations.append(f'available_copies = {available}')
+
+        _run_threads(desk, THREADS)
+        self.assertEqual(violations, [])
+        self.assertGreater(sum(borrowed), 0)
+        self.assertEqual(database.get_book_by_id(self.book_id)['available_copies'], COPIES)
+        self.assertEqual(self._active_loans(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
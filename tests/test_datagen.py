@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from collections import Counter
+from datetime import datetime
+from datagen import generate_library, _isbn13
+
+NOW = datetime(2026, 6, 1)
+
+
+class TestDatagen(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.unlink(path)
+
+    def _generate(self, **kwargs):
+        db_fd, path = tempfile.mkstemp()
+        os.close(db_fd)
+        self.paths.append(path)
+        options = dict(n_books=2000, n_patrons=300, n_loans=6000, seed=11, now=NOW)
+        options.update(kwargs)
+        counts = generate_library(path, **options)
+        return path, counts
+
+    def _query(self, path, sql):
+        conn = sqlite3.connect(path)
+        rows = conn.execute(sql).fetchall()
+        conn.close()
+        return rows
+
+    def test_same_seed_gives_identical_data(self):
+        first, _ = self._generate()
+        second, _ = self._generate()
+        for table in ('books', 'borrow_records'):
+            self.assertEqual(self._query(first, f'SELECT * FROM {table} ORDER BY id'),
+                             self._query(second, f'SELECT * FROM {table} ORDER BY id'))
+        third, _ = self._generate(seed=12)
+        self.assertNotEqual(self._query(first, 'SELECT title FROM books ORDER BY id'),
+                            self._query(third, 'SELECT title FROM books ORDER BY id'))
+
+    def test_counts_and_loan_mix(self):
+        path, counts = self._generate()
+        self.assertEqual(self._query(path, 'SELECT COUNT(*) FROM books')[0][0], 2000)
+        self.assertEqual(self._query(path, 'SELECT COUNT(*) FROM borrow_records')[0][0], 6000)
+        self.assertGreater(counts['active_loans'], 0)
+        self.assertGreater(counts['overdue_loans'], 0)
+        self.assertLess(counts['active_loans'], counts['loans'])
+        overdue = self._query(path, f"SELECT COUNT(*) FROM borrow_records "
+                                    f"WHERE return_date IS NULL AND due_date < '{NOW.isoformat()}'")
+        self.assertEqual(overdue[0][0], counts['overdue_loans'])
+
+    def test_active_loans_respect_copies_and_patron_limit(self):
+        path, _ = self._generate()
+        bad_books = self._query(path, '''
+            SELECT COUNT(*) FROM books b
+            WHERE b.available_copies < 0 OR b.available_copies != b.total_copies -
+                (SELECT COUNT(*) FROM borrow_records r WHERE r.book_id = b.id AND r.return_date IS NULL)
+        ''')
+        self.assertEqual(bad_books[0][0], 0)
+        busiest_patron = self._query(path, '''
+            SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM borrow_records
+                                WHERE return_date IS NULL GROUP BY patron_id)
+        ''')
+        self.assertLessEqual(busiest_patron[0][0], 5)
+        early_returns = self._query(path, 'SELECT COUNT(*) FROM borrow_records WHERE return_date < borrow_date')
+        self.assertEqual(early_returns[0][0], 0)
+
+    def test_borrowing_is_skewed_towards_popular_books(self):
+        path, _ = self._generate()
+        loans = Counter(dict(self._query(path, 'SELECT book_id, COUNT(*) FROM borrow_records GROUP BY book_id')))
+        top_one_percent = sum(count for _, count in loans.most_common(20))
+        self.assertGreater(top_one_percent / 6000, 0.2)
+
+    def test_isbns_are_valid_and_unique(self):
+        path, _ = self._generate(n_books=500, n_loans=0)
+        isbns = [row[0] for row in self._query(path, 'SELECT isbn FROM books')]
+        self.assertEqual(len(set(isbns)), 500)
+        self.assertTrue(all(len(isbn) == 13 and isbn.isdigit() for isbn in isbns))
+        self.assertEqual(_isbn13(30640615), '9780306406157')
+
+    def test_refuses_to_fill_non_empty_database(self):
+        path, _ = self._generate(n_books=10, n_loans=0)
+        with self.assertRaises(ValueError):
+            generate_library(path, 10, 5, 0, now=NOW)
+
+
+if __name__ == '__main__':
+    unittest.main()
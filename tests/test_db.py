@@ -22,7 +22,8 @@ class TestDatabaseModule(unittest.TestCase):
         conn.close()
 
     def test_get_all_books(self):
-        books = database.get_all_books()
+        with database.query_budget(max_queries=1):
+            books = database.get_all_books()
         self.assertGreaterEqual(len(books), 3)
         self.assertIn('title', books[0])
 
@@ -41,20 +42,27 @@ class TestDatabaseModule(unittest.TestCase):
         self.assertIsNone(book_none2)
 
     def test_get_patron_borrowed_books(self):
-        borrowed = database.get_patron_borrowed_books("123456")
+        with database.query_budget(max_queries=1):
+            borrowed = database.get_patron_borrowed_books("123456")
         self.assertTrue(any(b['book_id'] == 3 for b in borrowed))
         for b in borrowed:
             self.assertTrue(isinstance(b['borrow_date'], datetime))
             self.assertTrue(isinstance(b['due_date'], datetime))
 
     def test_get_patron_borrow_records(self):
-        records = database.get_patron_borrow_records("123456")
+        with database.query_budget(max_queries=1):
+            hot = database.get_patron_borrow_records("123456", include_archived=False)
+        # The archive is read after the hot table
+        with database.query_budget(max_queries=2):
+            records = database.get_patron_borrow_records("123456")
+        self.assertEqual(records, hot)
         self.assertGreaterEqual(len(records), 1)
         self.assertIn('id', records[0])
         self.assertIn('borrow_date', records[0])
 
     def test_get_patron_borrow_count(self):
-        count = database.get_patron_borrow_count("123456")
+        with database.query_budget(max_queries=1):
+            count = database.get_patron_borrow_count("123456")
         self.assertGreaterEqual(count, 0)
 
     def test_insert_borrow_record_success_and_failure(self):
@@ -78,24 +86,26 @@ class TestDatabaseModule(unittest.TestCase):
         original_copies = row['available_copies']
         conn.close()
 
-        # Success: increase by 1
+        # Success: take a copy, then give it back
+        self.assertTrue(database.update_book_availability(1, -1))
         success = database.update_book_availability(1, 1)
         self.assertTrue(success)
 
         conn = database.get_db_connection()
         row = conn.execute("SELECT available_copies FROM books WHERE id=1").fetchone()
         conn.close()
-        self.assertEqual(row['available_copies'], original_copies + 1)
+        self.assertEqual(row['available_copies'], original_copies)
 
-        # Failure: invalid book_id - expect True returned but copies unchanged
+        # Failure: a second return would exceed total_copies, and invalid book_id
+        self.assertFalse(database.update_book_availability(1, 1))
         failure = database.update_book_availability(9999, 1)
-        self.assertTrue(failure)  # As per current implementation returns True anyway
+        self.assertFalse(failure)
 
-        # Verify unchanged count for invalid id
+        # Verify unchanged count
         conn = database.get_db_connection()
         row = conn.execute("SELECT available_copies FROM books WHERE id=1").fetchone()
         conn.close()
-        self.assertEqual(row['available_copies'], original_copies + 1)
+        self.assertEqual(row['available_copies'], original_copies)
 
 
     def test_update_borrow_record_return_date_success_and_failure(self):
@@ -122,5 +132,62 @@ class TestDatabaseModule(unittest.TestCase):
         conn.close()
         self.assertEqual(row['return_date'], row2['return_date'])
 
+    def test_get_books_by_ids_single_query(self):
+        with database.query_budget(max_queries=1):
+            books = database.get_books_by_ids([1, 3, 3, 9999])
+        self.assertEqual(sorted(books), [1, 3])
+        self.assertEqual(database.get_books_by_ids([]), {})
+
+    def test_get_active_borrow_record_uses_partial_index(self):
+        record = database.get_active_borrow_record("123456", 3)
+        self.assertEqual(record['book_id'], 3)
+        self.assertIsNone(database.get_active_borrow_record("123456", 1))
+
+        conn = database.get_db_connection()
+        plan = ' '.join(row['detail'] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT id FROM borrow_records '
+            'WHERE patron_id = ? AND book_id = ? AND return_date IS NULL', ("123456", 3)))
+        conn.close()
+        self.assertIn('idx_borrow_records_active', plan)
+
+    def test_init_database_keeps_duplicate_active_loans(self):
+        # Databases from before the unique index may hold a patron's book out twice
+        conn = database.get_db_connection()
+        conn.execute('DROP INDEX idx_borrow_records_active')
+        conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                     "VALUES ('123456', 3, '2024-01-01T00:00:00', '2024-01-15T00:00:00')")
+        conn.commit()
+        conn.close()
+
+        database.init_database()
+        self.assertTrue(database.schema_is_current())
+        self.assertIsNotNone(database.get_active_borrow_record("123456", 3))
+
+    def test_archive_returned_borrow_records_in_batches(self):
+        now = datetime.now()
+        for day in range(5):
+            database.insert_borrow_record("654321", 1, now - timedelta(days=400 + day), now - timedelta(days=386 + day))
+            record = database.get_active_borrow_record("654321", 1)
+            database.update_borrow_record_return_date(record['id'], now - timedelta(days=380))
+        database.insert_borrow_record("654321", 2, now - timedelta(days=10), now + timedelta(days=4))
+        records = database.get_patron_borrow_records("654321")
+
+        with database.trace_queries() as statements:
+            archived = database.archive_returned_borrow_records(now - timedelta(days=365), batch_size=2)
+        self.assertEqual(archived, 5)
+        self.assertEqual(sum(sql.lstrip().startswith('DELETE') for sql, _ in statements), 3)
+
+        # The active loan stays hot; history merges both tables with the same IDs and order
+        hot = database.get_patron_borrow_records("654321", include_archived=False)
+        self.assertEqual([record['book_id'] for record in hot], [2])
+        self.assertEqual(database.get_patron_borrow_records("654321"), records)
+        self.assertEqual(database.archive_returned_borrow_records(now - timedelta(days=365)), 0)
+
+        # The archive is only queried once the hot rows run out
+        with database.trace_queries() as statements:
+            self.assertEqual(database.get_patron_borrow_records("654321", limit=1), records[:1])
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(database.get_patron_borrow_records("654321", limit=3), records[:3])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import database
+from group_commit import GroupCommitWriter, disable_group_commit, enable_group_commit, init_group_commit
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+
+class TestGroupCommit(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+
+    def tearDown(self):
+        disable_group_commit()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def _borrow_concurrently(self, patron_ids, book_id=1):
+        now = datetime.now()
+        results = {}
+
+        def borrow(patron_id):
+            results[patron_id] = database.insert_borrow_record(patron_id, book_id, now, now + timedelta(days=14))
+
+        threads = [threading.Thread(target=borrow, args=(patron_id,)) for patron_id in patron_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(database.GROUP_COMMIT_WRITER)
+        self.assertIsNone(init_group_commit())
+
+    def test_concurrent_writes_share_commits(self):
+        writer = enable_group_commit(max_batch_size=100, max_delay_ms=200)
+        patron_ids = [str(200000 + i) for i in range(10)]
+        results = self._borrow_concurrently(patron_ids)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(writer.writes, 10)
+        self.assertLess(writer.batches, 10)
+        # Every write is committed by the time its caller returns
+        for patron_id in patron_ids:
+            self.assertIsNotNone(database.get_active_borrow_record(patron_id, 1))
+
+    def test_max_batch_size(self):
+        writer = enable_group_commit(max_batch_size=2, max_delay_ms=200)
+        self._borrow_concurrently([str(200000 + i) for i in range(6)])
+        self.assertEqual(writer.writes, 6)
+        self.assertGreaterEqual(writer.batches, 3)
+
+    def test_failed_write_does_not_fail_its_batch(self):
+        writer = enable_group_commit(max_batch_size=100, max_delay_ms=200)
+        # The sample data already has patron 123456 borrowing book 3
+        results = self._borrow_concurrently(['123456', '200001', '200002'], book_id=3)
+        self.assertEqual(results, {'123456': False, '200001': True, '200002': True})
+        self.assertEqual(writer.writes, 3)
+
+    def test_service_layer(self):
+        writer = enable_group_commit(max_delay_ms=1)
+        self.assertTrue(borrow_book_by_patron('654321', 1)[0])
+        self.assertEqual(borrow_book_by_patron('654321', 1), (False, "You have already borrowed this book."))
+        self.assertTrue(return_book_by_patron('654321', 1)[0])
+        self.assertIsNone(database.get_active_borrow_record('654321', 1))
+        # The copy counts go through the writer too: take and record, take, fail to
+        # record and put back for the duplicate, then record the return and give back
+        self.assertEqual(writer.writes, 7)
+        self.assertEqual(database.get_book_by_id(1)['available_copies'], 3)
+
+    def test_conditional_decrement(self):
+        writer = enable_group_commit(max_delay_ms=1)
+        # Book 3 has a single copy, already lent out in the sample data
+        self.assertFalse(database.decrement_book_availability(3))
+        self.assertTrue(database.decrement_book_availability(2))
+        self.assertEqual(database.get_book_by_id(2)['available_copies'], 1)
+        self.assertEqual(writer.writes, 2)
+
+    def test_stop_and_restart(self):
+        writer = GroupCommitWriter(max_delay_ms=0)
+        self.assertEqual(writer.execute('UPDATE books SET total_copies = total_copies WHERE id = ?', (1,)), 1)
+        writer.stop()
+        self.assertEqual(writer.execute('UPDATE books SET total_copies = total_copies WHERE id = ?', (9,)), 0)
+        writer.stop()
+        self.assertEqual(writer.batches, 2)
+
+    @patch.dict(os.environ, {'LIBRARY_GROUP_COMMIT': '1', 'LIBRARY_GROUP_COMMIT_MAX_BATCH': '8',
+                             'LIBRARY_GROUP_COMMIT_MAX_DELAY_MS': '5'})
+    def test_init_from_environment(self):
+        writer = init_group_commit()
+        self.assertIs(database.GROUP_COMMIT_WRITER, writer)
+        self.assertEqual((writer.max_batch_size, writer.max_delay), (8, 0.005))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+import database
+from invalidation import InvalidationBus, reset_bus
+from services.book_cache import BookCache, disable_book_cache, enable_book_cache
+from services.library_service import borrow_book_by_patron, calculate_late_fee_for_book, get_catalog_books
+
+
+def _by_id(books):
+    return {book['id']: book for book in books}
+
+
+def _write_from_another_process(path, book_id):
+    database.DATABASE = path
+    database.update_book_availability(book_id, -1)
+
+
+class TestInvalidationBus(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+        self.bus = InvalidationBus(poll_interval=60)
+        self.events = []
+        self.bus.subscribe(lambda changed, book_ids: self.events.append((changed, book_ids)))
+        self.bus.poll()
+        self.events.clear()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def _write_directly(self, sql, params=()):
+        # As another worker process would: no BOOK_WRITES bump in this one
+        conn = sqlite3.connect(database.DATABASE)
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def test_versions_follow_book_writes(self):
+        before = database.get_cache_versions()
+        database.update_book_availability(1, -1)
+        after = database.get_cache_versions()
+        self.assertEqual(after['catalog'], before['catalog'])
+        self.assertEqual(after['availability'], before['availability'] + 1)
+
+        database.insert_book('New', 'Author', '1000000000001', 1, 1)
+        self.assertEqual(database.get_cache_versions()['catalog'], before['catalog'] + 1)
+        # Loans alone don't touch the book rows
+        database.insert_borrow_record('654321', 2, datetime.now(), datetime.now())
+        self.assertEqual(database.get_cache_versions()['catalog'], before['catalog'] + 1)
+
+    def test_local_writes_are_seen_immediately(self):
+        database.update_book_availability(2, -1)
+        self.assertEqual(self.bus.poll(), {'availability'})
+        self.assertEqual(self.events, [({'availability'}, [2])])
+
+    def test_other_process_writes_are_seen_on_the_next_poll(self):
+        self._write_directly('UPDATE books SET available_copies = 0 WHERE id = 1')
+        self._write_directly("UPDATE books SET title = 'Renamed' WHERE id = 3")
+        self.assertEqual(self.bus.poll(), set())
+        self.assertEqual(self.bus.poll(force=True), {'catalog', 'availability'})
+        self.assertEqual(self.events, [({'catalog', 'availability'}, [1, 3])])
+        self.assertEqual(self.bus.poll(force=True), set())
+
+    def test_pruned_change_log_reports_unknown_books(self):
+        self._write_directly('UPDATE books SET available_copies = 0 WHERE id = 1')
+        self._write_directly('UPDATE books SET available_copies = 1 WHERE id = 2')
+        database.prune_change_log(database.get_last_change_id() - 1)
+        self.bus.poll(force=True)
+        self.assertEqual(self.events, [({'availability'}, None)])
+
+
+class TestBookCache(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+        self.bus = InvalidationBus(poll_interval=60)
+        self.cache = BookCache(self.bus)
+
+    def tearDown(self):
+        disable_book_cache()
+        reset_bus()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_hits_until_invalidated(self):
+        self.assertEqual(self.cache.get_book(1)['available_copies'], 3)
+        self.assertEqual(len(self.cache.get_all_books()), 3)
+        self.cache.get_book(1)
+        self.cache.get_book(2)
+        self.cache.get_all_books()
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 3))
+
+        database.update_book_availability(1, -1)
+        self.assertEqual(self.cache.get_book(1)['available_copies'], 2)
+        self.assertEqual(_by_id(self.cache.get_all_books())[1]['available_copies'], 2)
+        # Book 2 didn't change and stays cached
+        self.cache.get_book(2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (3, 5))
+
+    def test_other_process_write_reaches_the_cache(self):
+        self.assertEqual(self.cache.get_book(1)['available_copies'], 3)
+        process = multiprocessing.get_context('fork').Process(target=_write_from_another_process,
+                                                              args=(database.DATABASE, 1))
+        process.start()
+        process.join()
+        # Stale until this process polls again
+        self.assertEqual(self.cache.get_book(1)['available_copies'], 3)
+        self.bus.poll_interval = 0
+        self.assertEqual(self.cache.get_book(1)['available_copies'], 2)
+
+    def test_service_reads_through_the_cache(self):
+        cache = enable_book_cache()
+        self.assertEqual(_by_id(get_catalog_books())[1]['available_copies'], 3)
+        self.assertIsNotNone(calculate_late_fee_for_book('123456', 1))
+        self.assertTrue(borrow_book_by_patron('654321', 1)[0])
+        self.assertEqual(_by_id(get_catalog_books())[1]['available_copies'], 2)
+        self.assertEqual(cache.get_book(1)['available_copies'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+from flask.json.provider import DefaultJSONProvider
+import database
+from app import create_app
+from json_provider import ENCODERS, FastJSONProvider, get_encoder, stream_json_object
+from models import Book
+
+
+class TestEncoders(unittest.TestCase):
+    def setUp(self):
+        self.payload = {
+            'results': [Book(1, 'Dune', 'Frank Herbert', '9780441172719', 3, 2)],
+            'due_date': datetime(2024, 3, 1, 12, 30),
+            'fee': Decimal('1.50'),
+            'title': 'Café',
+        }
+        self.app = create_app()
+
+    def test_encoders_match_flask_default_provider(self):
+        expected = json.loads(DefaultJSONProvider(self.app).dumps(self.payload))
+        self.assertEqual(expected['due_date'], 'Fri, 01 Mar 2024 12:30:00 GMT')
+        for name, encoder in ENCODERS.items():
+            with self.subTest(encoder=name):
+                self.assertEqual(json.loads(encoder(self.payload)), expected)
+
+    def test_get_encoder(self):
+        self.assertIs(get_encoder('stdlib'), ENCODERS['stdlib'])
+        with self.assertRaises(ValueError):
+            get_encoder('simplejson')
+        with patch.dict(os.environ, {'LIBRARY_JSON_ENCODER': 'stdlib'}):
+            self.assertIs(get_encoder(), ENCODERS['stdlib'])
+
+    def test_stream_json_object(self):
+        books = [Book(i, f'Book {i}', 'Author', f'{i:013d}', 1, 1) for i in range(25)]
+        for name, encoder in ENCODERS.items():
+            with self.subTest(encoder=name):
+                chunks = list(stream_json_object({'count': 25}, 'results', books, encoder, chunk_size=10))
+                self.assertEqual(len(chunks), 5)
+                streamed = json.loads(b''.join(chunks))
+                self.assertEqual(streamed, json.loads(encoder({'count': 25, 'results': books})))
+
+        self.assertEqual(json.loads(b''.join(stream_json_object({}, 'results', []))), {'results': []})
+
+    def test_provider_response(self):
+        with self.app.app_context():
+            for name in ENCODERS:
+                with self.subTest(encoder=name):
+                    provider = FastJSONProvider(self.app, name)
+                    response = provider.response(self.payload)
+                    self.assertEqual(response.mimetype, 'application/json')
+                    self.assertEqual(json.loads(response.get_data()),
+                                     json.loads(DefaultJSONProvider(self.app).dumps(self.payload)))
+                    self.assertEqual(json.loads(provider.dumps(self.payload, indent=4))['fee'], '1.50')
+
+
+class TestSearchApiStreaming(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_app_uses_fast_provider(self):
+        self.assertIsInstance(self.app.json, FastJSONProvider)
+
+    def test_large_results_are_streamed(self):
+        buffered = self.client.get('/api/search?q=t&type=title')
+        self.assertIn('Content-Length', buffered.headers)
+
+        with patch('routes.api_routes.STREAM_MIN_RESULTS', 2):
+            streamed = self.client.get('/api/search?q=t&type=title')
+        self.assertNotIn('Content-Length', streamed.headers)
+        self.assertEqual(streamed.get_json(), buffered.get_json())
+        self.assertEqual(streamed.get_json()['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,40 +24,57 @@ class TestLibraryService(unittest.TestCase):
     @patch('services.library_service.get_book_by_id')
     @patch('services.library_service.get_patron_borrow_count')
     @patch('services.library_service.insert_borrow_record')
-    @patch('services.library_service.update_book_availability')
-    def test_borrow_book_by_patron_success(self, mock_update_avail, mock_insert_borrow,
+    @patch('services.library_service.decrement_book_availability')
+    def test_borrow_book_by_patron_success(self, mock_decrement_avail, mock_insert_borrow,
                                           mock_borrow_count, mock_get_book):
         mock_get_book.return_value = {'id': 1, 'title': 'Book', 'available_copies': 1}
         mock_borrow_count.return_value = 0
         mock_insert_borrow.return_value = True
-        mock_update_avail.return_value = True
+        mock_decrement_avail.return_value = True
         success, msg = borrow_book_by_patron("123456", 1)
         self.assertTrue(success)
         self.assertIn("Successfully borrowed", msg)
+        mock_decrement_avail.assert_called_once_with(1)
+
+    @patch('services.library_service.get_book_by_id')
+    @patch('services.library_service.get_patron_borrow_count')
+    @patch('services.library_service.insert_borrow_record')
+    @patch('services.library_service.decrement_book_availability')
+    def test_borrow_book_last_copy_taken_concurrently(self, mock_decrement_avail, mock_insert_borrow,
+                                                      mock_borrow_count, mock_get_book):
+        # The book looked available, but another borrower took the last copy first
+        mock_get_book.return_value = {'id': 1, 'title': 'Book', 'available_copies': 1}
+        mock_borrow_count.return_value = 0
+        mock_decrement_avail.return_value = False
+        success, msg = borrow_book_by_patron("123456", 1)
+        self.assertFalse(success)
+        self.assertIn("not available", msg)
+        mock_insert_borrow.assert_not_called()
 
-    @patch('services.library_service.get_patron_borrow_records')
+    @patch('services.library_service.get_active_borrow_record')
     @patch('services.library_service.get_book_by_id')
     @patch('services.library_service.update_borrow_record_return_date')
     @patch('services.library_service.update_book_availability')
     def test_return_book_by_patron_on_time(self, mock_update_avail, mock_update_return,
                                            mock_get_book, mock_get_borrows):
         mock_get_book.return_value = {'id': 1, 'title': 'Test Book'}
-        mock_get_borrows.return_value = [{
+        mock_get_borrows.return_value = {
             'id': 123,                    # add this id field
             'book_id': 1,
             'return_date': None,
             'due_date': '2099-01-01T00:00:00'  # future date, no late fee
-        }]
+        }
         mock_update_return.return_value = True
         mock_update_avail.return_value = True
         success, msg = return_book_by_patron("123456", 1)
         self.assertTrue(success)
         self.assertIn("returned successfully on time", msg)
 
+    @patch('services.library_service.insert_payment', return_value=True)
     @patch('services.library_service.calculate_late_fee_for_book')
     @patch('services.library_service.get_book_by_id')
     @patch('services.library_service.PaymentGateway')
-    def test_pay_late_fees_success(self, MockGateway, mock_get_book, mock_calc_fee):
+    def test_pay_late_fees_success(self, MockGateway, mock_get_book, mock_calc_fee, mock_insert_payment):
         mock_calc_fee.return_value = {'fee_amount': 5.0}
         mock_get_book.return_value = {'title': 'Book'}
         mock_gateway_instance = MockGateway.return_value
@@ -120,24 +137,31 @@ class TestLibraryService(unittest.TestCase):
         success, msg = borrow_book_by_patron("123456", 1)
         self.assertFalse(success)
 
-    @patch('services.library_service.get_patron_borrow_records')
+    @patch('services.library_service.get_active_borrow_record')
     @patch('services.library_service.get_book_by_id')
     @patch('services.library_service.update_borrow_record_return_date')
     @patch('services.library_service.update_book_availability')
     def test_return_book_by_patron_edge_cases(self, mock_update_avail, mock_update_return, mock_get_book, mock_get_borrows):
         # No active borrow record found
         mock_get_book.return_value = {'id': 1, 'title': 'Test Book'}
-        mock_get_borrows.return_value = []
+        mock_get_borrows.return_value = None
         success, msg = return_book_by_patron("123456", 1)
         self.assertFalse(success)
 
         # Fail update borrow record return date
-        mock_get_borrows.return_value = [{'id': 123, 'book_id': 1, 'return_date': None, 'duedate': '2099-01-01T00:00:00'}]
+        mock_get_borrows.return_value = {'id': 123, 'book_id': 1, 'return_date': None, 'duedate': '2099-01-01T00:00:00'}
         mock_update_return.return_value = False
         mock_update_avail.return_value = True
         success, msg = return_book_by_patron("123456", 1)
         self.assertFalse(success)
 
+        # The copy can't be given back, e.g. all copies are already on the shelf
+        mock_update_return.return_value = True
+        mock_update_avail.return_value = False
+        success, msg = return_book_by_patron("123456", 1)
+        self.assertFalse(success)
+        self.assertIn("book availability", msg)
+
     @patch('services.library_service.calculate_late_fee_for_book')
     def test_pay_late_fees_edge_cases(self, mock_calc_fee):
         # No late fee to pay
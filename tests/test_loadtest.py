@@ -0,0 +1,55 @@
+import sys, os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+from loadtest import RequestMix, FlaskClientTarget, load_scenario, run_load
+from app import create_app
+
+SCENARIO_DIR = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'scenarios')
+
+
+def test_shipped_scenarios_load():
+    for name in os.listdir(SCENARIO_DIR):
+        scenario = load_scenario(os.path.join(SCENARIO_DIR, name))
+        mix = RequestMix(scenario, seed=1)
+        for _ in range(20):
+            _, method, path, form = mix.next()
+            assert method in ('GET', 'POST')
+            assert '{' not in path
+            assert form is None or all('{' not in value for value in form.values())
+
+
+def test_request_mix_fills_ranges_and_choices():
+    scenario = {
+        'requests': [{'name': 'borrow', 'method': 'POST', 'path': '/borrow',
+                      'form': {'patron_id': '{patron_id}', 'book_id': '{book_id}'}}],
+        'params': {'patron_id': [100000, 100000], 'book_id': ['7']},
+    }
+    assert RequestMix(scenario, seed=1).next() == (
+        'borrow', 'POST', '/borrow', {'patron_id': '100000', 'book_id': '7'})
+
+
+def test_request_mix_quotes_path_values():
+    scenario = {
+        'requests': [{'name': 'search', 'path': '/api/search?q={term}&type=title'}],
+        'params': {'term': ['silent garden']},
+    }
+    assert RequestMix(scenario, seed=1).next() == (
+        'search', 'GET', '/api/search?q=silent%20garden&type=title', None)
+    # Form values stay as they are; they are urlencoded when the request is sent
+    scenario['requests'] = [{'name': 'search', 'method': 'POST', 'path': '/search', 'form': {'q': '{term}'}}]
+    assert RequestMix(scenario, seed=1).next()[3] == {'q': 'silent garden'}
+
+
+def test_run_load_reports_per_endpoint_stats(library_db):
+    scenario = {
+        'requests': [
+            {'name': 'catalog', 'weight': 1, 'path': '/catalog'},
+            {'name': 'api_search', 'weight': 1, 'path': '/api/search?q={term}'},
+        ],
+        'params': {'term': ['the', 'gatsby']},
+    }
+    results = run_load(FlaskClientTarget(create_app()), scenario, workers=4, duration=30, max_requests=40)
+    assert results['overall']['requests'] == 40
+    assert results['overall']['errors'] == 0
+    assert results['catalog']['requests'] + results['api_search']['requests'] == 40
+    assert results['catalog']['statuses'] == {'200': results['catalog']['requests']}
+    assert results['overall']['p50_ms'] <= results['overall']['p99_ms'] <= results['overall']['max_ms']
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import database
+from app import create_app
+from json_provider import json_default
+from models import Book, BorrowedBook, BorrowRecord, CatalogBook, Change, RowMapping, _row_model
+from services.library_service import get_catalog_books
+
+
+class TestRowModels(unittest.TestCase):
+    def setUp(self):
+        self.book = Book(1, 'Dune', 'Frank Herbert', '9780441172719', 3, 2)
+
+    def test_dict_style_access(self):
+        self.assertEqual(self.book['title'], 'Dune')
+        self.assertEqual(self.book.title, 'Dune')
+        self.assertEqual(self.book.get('isbn'), '9780441172719')
+        self.assertIsNone(self.book.get('borrowable'))
+        self.assertIn('author', self.book)
+        self.assertNotIn('borrowable', self.book)
+        with self.assertRaises(KeyError):
+            self.book['borrowable']
+
+        self.book['available_copies'] -= 1
+        self.assertEqual(self.book.available_copies, 1)
+        with self.assertRaises(KeyError):
+            self.book['borrowable'] = True
+
+    def test_converts_and_compares_like_a_dict(self):
+        expected = {'id': 1, 'title': 'Dune', 'author': 'Frank Herbert', 'isbn': '9780441172719',
+                    'total_copies': 3, 'available_copies': 2}
+        self.assertEqual(dict(self.book), expected)
+        self.assertEqual({**self.book}, expected)
+        self.assertEqual(self.book, expected)
+        self.assertEqual(expected, self.book)
+        self.assertNotEqual(self.book, dict(expected, available_copies=0))
+        self.assertEqual(self.book, Book(**expected))
+
+    def test_slotted(self):
+        self.assertFalse(hasattr(self.book, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.book.borrowable = True
+        for model in (Book, CatalogBook, BorrowRecord, BorrowedBook, Change):
+            self.assertEqual(model.__slots__, model._keys)
+
+        with self.assertRaises(TypeError):
+            @_row_model
+            class Misdeclared(RowMapping):
+                __slots__ = ('title', 'id')
+
+                id: int
+                title: str
+
+    def test_json(self):
+        payload = json.dumps([self.book], default=json_default)
+        self.assertEqual(json.loads(payload)[0]['title'], 'Dune')
+        with self.assertRaises(TypeError):
+            json.dumps(object(), default=json_default)
+
+        with create_app().app_context():
+            from flask import jsonify
+            self.assertEqual(jsonify(self.book).get_json()['isbn'], '9780441172719')
+
+    def test_borrowed_book_row_factory_parses_dates(self):
+        now = datetime.now()
+        row = (1, 'Dune', 'Frank Herbert', (now - timedelta(days=20)).isoformat(),
+               (now - timedelta(days=6)).isoformat())
+        borrowed = BorrowedBook.row_factory(None, row)
+        self.assertIsInstance(borrowed['borrow_date'], datetime)
+        self.assertTrue(borrowed['is_overdue'])
+
+
+class TestDatabaseReturnsModels(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_readers_return_models(self):
+        books = database.get_all_books()
+        self.assertTrue(all(isinstance(book, Book) for book in books))
+        self.assertEqual([book['title'] for book in books],
+                         ['1984', 'The Great Gatsby', 'To Kill a Mockingbird'])
+        self.assertIsInstance(database.get_book_by_isbn('9780451524935'), Book)
+
+        now = datetime.now()
+        database.insert_borrow_record('123456', 1, now, now + timedelta(days=14))
+        self.assertIsInstance(database.get_patron_borrowed_books('123456')[0], BorrowedBook)
+        record = database.get_patron_borrow_records('123456')[0]
+        self.assertIsInstance(record, BorrowRecord)
+        self.assertIsNone(record['return_date'])
+
+    def test_catalog_books(self):
+        books = get_catalog_books()
+        self.assertTrue(all(isinstance(book, CatalogBook) for book in books))
+        self.assertEqual([book['borrowable'] for book in books], [False, True, True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,10 @@ from services.payment_service import PaymentGateway
 
 class TestPaymentFunctions(unittest.TestCase):
 
+    @patch('services.library_service.insert_payment', return_value=True)
     @patch('services.library_service.calculate_late_fee_for_book')
     @patch('services.library_service.get_book_by_id')
-    def test_pay_late_fees_success(self, mock_get_book, mock_calc_fee):
+    def test_pay_late_fees_success(self, mock_get_book, mock_calc_fee, mock_insert_payment):
         mock_calc_fee.return_value = {"fee_amount": 10.0}
         mock_get_book.return_value = {"title": "Example Book"}
         mock_gateway = Mock(spec=PaymentGateway)
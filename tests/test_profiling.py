@@ -0,0 +1,89 @@
+import unittest
+import os
+import json
+import tempfile
+import shutil
+import time
+from unittest.mock import patch
+import database
+from app import create_app
+from profiling import ProfilingMiddleware, summarize_captures
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        self.capture_dir = tempfile.mkdtemp()
+        self.app = create_app()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+        shutil.rmtree(self.capture_dir)
+
+    def _captures(self):
+        return [name for name in os.listdir(self.capture_dir) if name.endswith('.json')]
+
+    def test_trace_queries_records_statements(self):
+        with database.trace_queries() as statements:
+            database.get_book_by_id(1)
+        self.assertEqual(len(statements), 1)
+        sql, seconds = statements[0]
+        self.assertIn('FROM books WHERE id', sql)
+        self.assertGreaterEqual(seconds, 0)
+
+        # Connections opened outside a trace are not traced
+        database.get_book_by_id(1)
+        self.assertEqual(len(statements), 1)
+
+    def test_sampled_request_writes_profile_and_sql(self):
+        self.app.wsgi_app = ProfilingMiddleware(self.app.wsgi_app, self.capture_dir, sample_rate=1.0)
+        response = self.app.test_client().get('/catalog')
+        self.assertEqual(response.status_code, 200)
+
+        captures = self._captures()
+        self.assertEqual(len(captures), 1)
+        with open(os.path.join(self.capture_dir, captures[0])) as f:
+            capture = json.load(f)
+        self.assertEqual(capture['path'], '/catalog')
+        self.assertTrue(capture['status'].startswith('200'))
+        self.assertTrue(capture['functions'])
+        self.assertTrue(any('FROM books' in q['statement'] for q in capture['sql']))
+
+    def test_unsampled_fast_request_is_not_captured(self):
+        self.app.wsgi_app = ProfilingMiddleware(self.app.wsgi_app, self.capture_dir,
+                                                sample_rate=0.0, slow_threshold_ms=10000)
+        self.app.test_client().get('/catalog')
+        self.assertEqual(self._captures(), [])
+
+    def test_slow_request_captures_stack_samples(self):
+        @self.app.route('/slow')
+        def slow():
+            time.sleep(0.1)
+            return 'done'
+
+        self.app.wsgi_app = ProfilingMiddleware(self.app.wsgi_app, self.capture_dir, slow_threshold_ms=20)
+        self.app.test_client().get('/slow')
+
+        summary = summarize_captures(self.capture_dir, top=1000)
+        self.assertEqual(summary['captures'], 1)
+        self.assertTrue(any('(slow)' in f['function'] for f in summary['stack_functions']))
+
+    def test_capture_directory_is_rotated(self):
+        self.app.wsgi_app = ProfilingMiddleware(self.app.wsgi_app, self.capture_dir,
+                                                sample_rate=1.0, max_files=2)
+        client = self.app.test_client()
+        for _ in range(4):
+            client.get('/catalog')
+        self.assertEqual(len(self._captures()), 2)
+
+    @patch.dict(os.environ, {'LIBRARY_SQL_TRACE': '1'})
+    def test_query_tracing_reports_per_request_headers(self):
+        response = create_app().test_client().get('/catalog')
+        # The books, and the change ID the page's live updates resume after
+        self.assertEqual(response.headers['X-SQL-Queries'], '2')
+        self.assertIn('X-SQL-Time-Ms', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import pytest
+from datetime import datetime, timedelta
+import database
+from services.library_service import (
+    add_book_to_catalog, get_catalog_books, borrow_book_by_patron,
+    return_book_by_patron, search_books_in_catalog, get_patron_status_report)
+
+# Generous per-call SQL time budget; the query counts are the real guard
+MAX_SQL_SECONDS = 0.5
+
+
+def test_query_budget_fails_when_exceeded(library_db):
+    with pytest.raises(AssertionError, match="Ran 2 queries, budget is 1"):
+        with database.query_budget(max_queries=1):
+            database.get_book_by_id(1)
+            database.get_book_by_id(2)
+
+
+def test_repeated_statements_count_every_time(library_db):
+    with database.trace_queries() as statements:
+        conn = database.get_db_connection()
+        for _ in range(3):
+            conn.execute('SELECT * FROM books WHERE id = ?', (1,)).fetchone()
+        conn.close()
+    assert len(statements) == 3
+
+
+def test_trigger_reports_count_toward_their_statement(library_db):
+    # The update fires the change_log and cache_versions triggers, which SQLite reports again
+    with database.trace_queries() as statements:
+        database.update_book_availability(1, -1)
+        database.update_book_availability(1, 1)
+    assert [' '.join(sql.split())[:17] for sql, _ in statements
+            if not sql.lstrip().upper().startswith(('BEGIN', 'COMMIT'))] == ['UPDATE books SET '] * 2
+
+
+def test_add_book_query_budget(library_db, query_budget):
+    with query_budget(max_queries=2, max_seconds=MAX_SQL_SECONDS):
+        success, _ = add_book_to_catalog("Budget Book", "Author", "1234567890123", 2)
+    assert success
+
+
+def test_catalog_and_search_query_budget(library_db, query_budget):
+    with query_budget(max_queries=1, max_seconds=MAX_SQL_SECONDS):
+        assert len(get_catalog_books()) == 3
+    with query_budget(max_queries=1, max_seconds=MAX_SQL_SECONDS):
+        assert search_books_in_catalog("gatsby", "title")
+
+
+def test_borrow_and_return_query_budget(library_db, query_budget):
+    with query_budget(max_queries=4, max_seconds=MAX_SQL_SECONDS):
+        success, _ = borrow_book_by_patron("654321", 1)
+    assert success
+    with query_budget(max_queries=4, max_seconds=MAX_SQL_SECONDS):
+        success, _ = return_book_by_patron("654321", 1)
+    assert success
+
+
+def test_patron_status_report_does_not_query_per_record(library_db, query_budget):
+    now = datetime.now()
+    for n in range(3):
+        database.insert_book(f"Budget Book {n}", "Author", f"123456789012{n}", 1, 1)
+    for book_id in (1, 2, 4, 5, 6):
+        database.insert_borrow_record("123456", book_id, now - timedelta(days=30), now - timedelta(days=16))
+
+    with query_budget(max_queries=2, max_seconds=MAX_SQL_SECONDS):
+        report = get_patron_status_report("123456")
+    assert len(report['active_borrows']) == 6
+
+
+def test_patron_status_report_reads_the_archive_only_when_asked(library_db, query_budget):
+    now = datetime.now()
+    database.insert_borrow_record("123456", 1, now - timedelta(days=400), now - timedelta(days=386))
+    record = database.get_active_borrow_record("123456", 1)
+    database.update_borrow_record_return_date(record['id'], now - timedelta(days=380))
+    assert database.archive_returned_borrow_records(now - timedelta(days=365)) == 1
+
+    # One query for the hot records and one for their books
+    with query_budget(max_queries=2, max_seconds=MAX_SQL_SECONDS):
+        report = get_patron_status_report("123456")
+    assert (len(report['active_borrows']), report['returned_books']) == (1, [])
+    report = get_patron_status_report("123456", include_archived=True)
+    assert [book['book_id'] for book in report['returned_books']] == [1]
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import database
+import replicas
+from app import create_app
+
+
+class TestReadReplicas(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        database.DATABASE = os.path.join(self.tmpdir, 'library.db')
+        database.init_database()
+        database.add_sample_data()
+        self.replica = os.path.join(self.tmpdir, 'replica.db')
+        database.READ_REPLICAS = [self.replica]
+
+    def tearDown(self):
+        database.READ_REPLICAS = []
+        for name in os.listdir(self.tmpdir):
+            os.unlink(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def _add_book_to_primary(self):
+        database.insert_book("Primary Only", "Author", "1111111111111", 1, 1)
+
+    def test_reads_fall_back_to_primary_until_replica_exists(self):
+        self._add_book_to_primary()
+        self.assertEqual(len(database.get_all_books()), 4)
+
+    def test_reads_use_replica_snapshot_until_refreshed(self):
+        self.assertEqual(replicas.refresh_read_replicas(), 1)
+        self._add_book_to_primary()
+        self.assertIsNone(database.get_book_by_isbn("1111111111111"))
+        self.assertEqual(len(database.get_all_books()), 3)
+
+        with database.read_from_primary():
+            self.assertIsNotNone(database.get_book_by_isbn("1111111111111"))
+
+        replicas.refresh_read_replicas()
+        self.assertIsNotNone(database.get_book_by_isbn("1111111111111"))
+
+    def test_refresher_survives_a_locked_replica(self):
+        replicas.refresh_read_replicas()
+        self._add_book_to_primary()
+        real_replace = os.replace
+        calls = []
+
+        def replace(src, dst):
+            calls.append(dst)
+            if len(calls) == 1:
+                # What Windows raises while a reader has the replica open
+                raise PermissionError(13, 'The process cannot access the file', dst)
+            real_replace(src, dst)
+
+        refresher = replicas.ReplicaRefresher(interval=0.01)
+        with patch('replicas.os.replace', side_effect=replace), \
+                self.assertLogs('replicas', level='WARNING'):
+            refresher.start()
+            while len(calls) < 2 and refresher.is_alive():
+                refresher._stop_event.wait(0.01)
+            refresher.stop()
+            refresher.join()
+        self.assertEqual(refresher.failures, 1)
+        self.assertIsNotNone(database.get_book_by_isbn("1111111111111"))
+        self.assertFalse([name for name in os.listdir(self.tmpdir) if '.refresh-' in name])
+
+    def test_replica_connections_are_read_only(self):
+        replicas.refresh_read_replicas()
+        conn = database.get_read_connection()
+        with self.assertRaises(database.sqlite3.OperationalError):
+            conn.execute("DELETE FROM books")
+        conn.close()
+
+    def test_writes_and_counts_stay_on_primary(self):
+        replicas.refresh_read_replicas()
+        self.assertTrue(database.update_book_availability(1, -1))
+        conn = database.get_db_connection()
+        self.assertEqual(conn.execute("SELECT available_copies FROM books WHERE id = 1").fetchone()[0], 2)
+        conn.close()
+        self.assertEqual(database.get_book_by_id(1)['available_copies'], 3)
+
+    @patch.dict(os.environ, {'LIBRARY_REPLICA_REFRESH_SECONDS': '3600'})
+    def test_requests_read_their_own_writes(self):
+        app = create_app()
+        self.addCleanup(app.extensions['replica_refresher'].stop)
+        client = app.test_client()
+
+        # A stale GET from another client is served from the replica
+        self._add_book_to_primary()
+        self.assertNotIn(b'Primary Only', app.test_client().get('/catalog').data)
+        self.assertIn(b'Primary Only', app.test_client().get('/catalog?read_your_writes=1').data)
+
+        # After a write, the same client keeps reading from the primary
+        response = client.post('/borrow', data={'patron_id': '654321', 'book_id': '1'},
+                               follow_redirects=True)
+        self.assertIn(b'2/3 Available', response.data)
+        self.assertIn(b'Primary Only', client.get('/catalog').data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+import database
+from invalidation import get_bus, reset_bus
+from services.library_service import add_book_to_catalog, borrow_book_by_patron, search_books_in_catalog
+from services.search_cache import SearchCache, disable_search_cache, enable_search_cache
+
+
+def _titles(books):
+    return [(book['title'], book['available_copies']) for book in books]
+
+
+class TestSearchCache(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+        reset_bus()
+        # Only this process writes here, and its own writes skip the poll interval
+        get_bus().poll_interval = 60
+        self.cache = enable_search_cache()
+
+    def tearDown(self):
+        disable_search_cache()
+        reset_bus()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_repeated_searches_skip_sqlite(self):
+        expected = _titles(search_books_in_catalog('the', 'title'))
+        self.assertEqual(expected, [('The Great Gatsby', 3)])
+        with database.query_budget(max_queries=0):
+            self.assertEqual(_titles(search_books_in_catalog('  THE ', 'Title')), expected)
+        self.assertEqual((self.cache.hits, self.cache.misses, len(self.cache)), (1, 1, 1))
+
+    def test_availability_changes_keep_match_sets(self):
+        search_books_in_catalog('t', 'title')
+        search_books_in_catalog('lee', 'author')
+        borrow_book_by_patron('654321', 1)
+        self.assertEqual(_titles(search_books_in_catalog('t', 'title')),
+                         [('The Great Gatsby', 2), ('To Kill a Mockingbird', 2)])
+        self.assertEqual(self.cache.refreshed, 1)
+        # The other search doesn't hold book 1 and is served as it was
+        with database.query_budget(max_queries=0):
+            self.assertEqual(_titles(search_books_in_catalog('lee', 'author')), [('To Kill a Mockingbird', 2)])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_catalog_changes_recompute(self):
+        search_books_in_catalog('the', 'title')
+        search_books_in_catalog('kill', 'title')
+        add_book_to_catalog('The Hobbit', 'J. R. R. Tolkien', '9780547928227', 2)
+        self.assertEqual(_titles(search_books_in_catalog('the', 'title')),
+                         [('The Great Gatsby', 3), ('The Hobbit', 2)])
+        # Entries for the old catalog version are dropped, not left to age out
+        self.assertEqual((len(self.cache), self.cache.misses), (1, 3))
+
+    def test_limits(self):
+        books = database.get_all_books()
+        cache = SearchCache(get_bus(), max_entries=2)
+        for book in books:
+            cache.search(book['isbn'], 'isbn', lambda: [book])
+        self.assertEqual((len(cache), cache.evictions), (2, 1))
+        # The least recently used search went first
+        cache.search(books[0]['isbn'], 'isbn', lambda: [books[0]])
+        self.assertEqual(cache.misses, 4)
+
+        cache = SearchCache(get_bus(), max_bytes=2000)
+        for _ in range(2):
+            self.assertEqual(len(cache.search('', 'title', lambda: books)), 3)
+        self.assertEqual((len(cache), cache.misses), (0, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
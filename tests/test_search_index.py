@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import database
+from datagen import generate_library
+from services.library_service import add_book_to_catalog, search_books_in_catalog
+from services.search_index import (
+    TrigramIndex, disable_search_index, enable_search_index, get_search_index, trigrams)
+import app as app_module
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+
+    def tearDown(self):
+        disable_search_index()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('Harper'), {'har', 'arp', 'rpe', 'per'})
+        self.assertEqual(trigrams('Le'), set())
+
+    def test_posting_lists_are_sorted_arrays(self):
+        index = enable_search_index()
+        self.assertEqual(index.book_count, 3)
+        self.assertEqual(index.postings['title']['the'].typecode, 'I')
+        self.assertEqual(list(index.postings['title']['the']), [1])
+        self.assertEqual(index.candidates('title', 'gatsby'), [1])
+        self.assertEqual(index.candidates('title', 'zzz'), [])
+        self.assertIsNone(index.candidates('title', '19'))
+
+    def test_index_matches_linear_scan(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        os.unlink(database.DATABASE)
+        generate_library(database.DATABASE, 1000, 200, 0, seed=5)
+
+        queries = [('title', term) for term in ('the', 'RIVER', 'of riv', 'guide', 'a', 'ok, b', 'xyz')]
+        queries += [('author', term) for term in ('tanaka', 'mei t', 'an', 'smith')]
+        queries += [('isbn', '978000')]
+        expected = {query: search_books_in_catalog(query[1], query[0]) for query in queries}
+
+        enable_search_index()
+        for (search_type, term), books in expected.items():
+            with self.subTest(search_type=search_type, term=term):
+                self.assertEqual(sorted(book['id'] for book in search_books_in_catalog(term, search_type)),
+                                 sorted(book['id'] for book in books))
+
+    def test_indexed_search_queries_do_not_scan_catalog(self):
+        enable_search_index()
+        with database.query_budget(max_queries=2):
+            books = search_books_in_catalog('mockingbird', 'title')
+        self.assertEqual([book['id'] for book in books], [2])
+        self.assertEqual(books[0]['available_copies'], 2)
+
+    def test_new_books_are_indexed_incrementally(self):
+        index = enable_search_index()
+        success, _ = add_book_to_catalog('The Mockingbird Returns', 'New Author', '1234567890123', 1)
+        self.assertTrue(success)
+        self.assertEqual(index.last_book_id, 4)
+        self.assertEqual([book['title'] for book in search_books_in_catalog('mockingbird', 'title')],
+                         ['The Mockingbird Returns', 'To Kill a Mockingbird'])
+
+        # Rows written straight to the database (bulk import, other workers) are caught up
+        # on search once the catch-up interval has passed
+        database.insert_book('Bulk Loaded', 'Importer', '1234567890124', 1, 1)
+        self.assertEqual(search_books_in_catalog('importer', 'author'), [])
+        index._last_catch_up = 0
+        self.assertEqual([book['id'] for book in search_books_in_catalog('importer', 'author')], [5])
+        self.assertEqual(index.book_count, 5)
+
+    def test_catch_up_is_throttled(self):
+        enable_search_index()
+        # Each search only fetches its candidates, with no query for new books
+        with database.query_budget(max_queries=2):
+            search_books_in_catalog('mockingbird', 'title')
+            search_books_in_catalog('gatsby', 'title')
+
+    @patch('services.search_index.MIN_SCAN_CANDIDATES', 0)
+    def test_broad_terms_are_left_to_the_scan(self):
+        index = enable_search_index()
+        # 'the' is in 1 of 3 titles, 'george' in 1 of 3 authors
+        self.assertIsNone(index.search('title', 'the', max_share=0.2))
+        self.assertEqual([book['id'] for book in index.search('title', 'the', max_share=0.5)], [1])
+        self.assertEqual([book['id'] for book in search_books_in_catalog('george', 'author')], [3])
+        with patch('services.library_service.SCAN_SHARE', 0.2), database.query_budget(max_queries=1):
+            # One query for the whole catalog rather than the candidate fetch
+            self.assertEqual([book['id'] for book in search_books_in_catalog('george', 'author')], [3])
+
+    def test_add_books_skips_already_indexed(self):
+        index = TrigramIndex()
+        book = {'id': 1, 'title': 'Dune', 'author': 'Herbert'}
+        index.add_books([book, book, dict(book, id=2), dict(book, id=7)])
+        self.assertEqual(list(index.postings['title']['dun']), [1, 2, 7])
+        self.assertEqual(index.book_count, 3)
+
+    @patch.dict(os.environ, {'LIBRARY_SEARCH_INDEX': '1'})
+    def test_create_app_builds_index_when_enabled(self):
+        app_module.create_app()
+        self.assertIsNotNone(get_search_index())
+        self.assertEqual(get_search_index().book_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import runpy
+import tempfile
+import unittest
+from unittest.mock import patch
+import database
+import profiling
+
+CONFIG = os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py')
+
+
+class TestServing(unittest.TestCase):
+    @patch.dict(os.environ, {'LIBRARY_BIND': '127.0.0.1:8001', 'LIBRARY_WORKERS': '3',
+                             'LIBRARY_THREADS': '8', 'LIBRARY_MAX_REQUESTS': '1000'})
+    def test_gunicorn_config_reads_environment(self):
+        config = runpy.run_path(CONFIG)
+        self.assertEqual(config['bind'], '127.0.0.1:8001')
+        self.assertEqual(config['workers'], 3)
+        self.assertEqual(config['threads'], 8)
+        self.assertEqual(config['max_requests'], 1000)
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertTrue(config['preload_app'])
+
+    def test_enable_wal_mode(self):
+        db_fd, database.DATABASE = tempfile.mkstemp()
+        try:
+            database.init_database()
+            database.enable_wal_mode()
+            conn = database.get_db_connection()
+            self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            conn.close()
+        finally:
+            os.close(db_fd)
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(database.DATABASE + suffix):
+                    os.unlink(database.DATABASE + suffix)
+
+    def test_slow_request_sampler_restarts_in_forked_worker(self):
+        capture_dir = tempfile.mkdtemp()
+        middleware = profiling.ProfilingMiddleware(lambda environ, start_response: [],
+                                                   capture_dir, slow_threshold_ms=1000)
+        master_sampler = middleware._get_sampler()
+        self.assertIs(middleware._get_sampler(), master_sampler)
+        with patch('profiling.os.getpid', return_value=os.getpid() + 1):
+            worker_sampler = middleware._get_sampler()
+        self.assertIsNot(worker_sampler, master_sampler)
+        self.assertTrue(worker_sampler.is_alive())
+        os.rmdir(capture_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import database
+from services import library_service
+from services.library_service import get_patron_status_report, search_books_in_catalog
+from services.single_flight import (SingleFlight, disable_single_flight, enable_single_flight,
+                                    get_single_flight)
+
+CALLERS = 8
+
+
+def _run_together(fn, n=CALLERS):
+    """Call fn from n threads and return their results (or exceptions)."""
+    results = [None] * n
+
+    def run(i):
+        try:
+            results[i] = fn()
+        except Exception as error:
+            results[i] = error
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+class _Blocked:
+    """A function that counts its executions and blocks until released."""
+
+    def __init__(self, result=None, error=None):
+        self.executions = 0
+        self._lock = threading.Lock()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.result = result
+        self.error = error
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.executions += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.group = SingleFlight(['search'])
+
+    def _join_all(self, fn):
+        """Start CALLERS calls of fn under one key, release fn once every caller is waiting."""
+        threads, results = _run_together(lambda: self.group.do('search', 'the', fn))
+        fn.started.wait(5)
+        while self.group.stats()['search']['calls'] < CALLERS:
+            threading.Event().wait(0.001)
+        fn.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_execution(self):
+        fn = _Blocked(result=['book'])
+        results = self._join_all(fn)
+        self.assertEqual(fn.executions, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(self.group.stats(), {'search': {'calls': CALLERS, 'executions': 1,
+                                                         'collapsed': CALLERS - 1}})
+        # Nothing is kept afterwards
+        self.assertEqual(self.group.do('search', 'the', lambda: ['again']), ['again'])
+
+    def test_errors_reach_every_caller(self):
+        error = RuntimeError('database is locked')
+        results = self._join_all(_Blocked(error=error))
+        self.assertTrue(all(result is error for result in results))
+
+    def test_different_keys_run_separately(self):
+        fn = _Blocked(result=1)
+        fn.release.set()
+        self.group.do('search', 'the', fn)
+        self.group.do('search', 'a', fn)
+        self.assertEqual(fn.executions, 2)
+
+    def test_callers_after_a_write_do_not_join_older_calls(self):
+        fn = _Blocked(result='before')
+        threads, results = _run_together(lambda: self.group.do('search', 'the', fn), n=1)
+        fn.started.wait(5)
+        database._note_book_write()
+        self.assertEqual(self.group.do('search', 'the', lambda: 'after'), 'after')
+        fn.release.set()
+        threads[0].join()
+        self.assertEqual(results, ['before'])
+
+
+class TestCoalescedServiceCalls(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        database.init_database()
+        database.add_sample_data()
+
+    def tearDown(self):
+        disable_single_flight()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def _searches(self):
+        """Run concurrent identical searches against a slowed-down catalog read."""
+        books = database.get_all_books()
+        slow_read = _Blocked(result=books)
+        with patch.object(library_service, 'get_all_books', slow_read):
+            threads, results = _run_together(lambda: search_books_in_catalog('the', 'title'))
+            slow_read.started.wait(5)
+            group = get_single_flight()
+            if group is not None and 'search_books_in_catalog' in group.functions:
+                while group.stats()['search_books_in_catalog']['calls'] < CALLERS:
+                    threading.Event().wait(0.001)
+            slow_read.release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual([[book['title'] for book in result] for result in results],
+                         [['The Great Gatsby']] * CALLERS)
+        return slow_read.executions
+
+    def test_opt_in(self):
+        self.assertIsNone(get_single_flight())
+        self.assertEqual(self._searches(), CALLERS)
+
+        enable_single_flight()
+        self.assertEqual(self._searches(), 1)
+        self.assertEqual(get_single_flight().stats()['search_books_in_catalog'],
+                         {'calls': CALLERS, 'executions': 1, 'collapsed': CALLERS - 1})
+
+        enable_single_flight(['get_patron_status_report'])
+        self.assertEqual(self._searches(), CALLERS)
+        with self.assertRaises(ValueError):
+            enable_single_flight(['borrow_book_by_patron'])
+
+    def test_patron_sees_their_own_borrow(self):
+        enable_single_flight()
+        self.assertEqual(get_patron_status_report('654321')['active_borrows'], [])
+        library_service.borrow_book_by_patron('654321', 1)
+        self.assertEqual([record['book_id'] for record in get_patron_status_report('654321')['active_borrows']],
+                         [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import database
+import app as app_module
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+
+    def tearDown(self):
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_schema_version_is_recorded(self):
+        self.assertFalse(database.schema_is_current())
+        database.init_database()
+        self.assertTrue(database.schema_is_current())
+
+    @patch.dict(os.environ, {'LIBRARY_FAST_STARTUP': '1'})
+    def test_fast_startup_skips_setup_when_schema_is_current(self):
+        database.init_database()
+        with patch.object(app_module, 'init_database') as mock_init, \
+                patch.object(app_module, 'add_sample_data') as mock_seed:
+            app_module.create_app()
+        mock_init.assert_not_called()
+        mock_seed.assert_not_called()
+
+    @patch.dict(os.environ, {'LIBRARY_FAST_STARTUP': '1'})
+    def test_fast_startup_sets_up_new_database(self):
+        app_module.create_app()
+        self.assertTrue(database.schema_is_current())
+        self.assertEqual(len(database.get_all_books()), 3)
+
+    @patch.dict(os.environ, {'LIBRARY_FAST_STARTUP': ''})
+    def test_default_startup_always_runs_setup(self):
+        database.init_database()
+        with patch.object(app_module, 'init_database') as mock_init:
+            app_module.create_app()
+        mock_init.assert_called_once()
+
+    def test_app_import_does_not_import_requests(self):
+        code = "import sys, app; print('requests' in sys.modules)"
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=tempfile.gettempdir(),
+                                         env=dict(os.environ, PYTHONPATH=ROOT), text=True)
+        self.assertEqual(output.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+"""
+Storage backend conformance suite
+
+Every test runs once per backend in storage.BACKENDS, each against fresh,
+empty storage. A new backend only needs a `backend` fixture branch here.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pytest
+import database
+import storage
+from storage import InMemoryBackend, SQLiteBackend, StorageBackend, use_backend
+from unittest.mock import Mock
+from services.library_service import (
+    add_book_to_catalog, borrow_book_by_patron, return_book_by_patron,
+    get_catalog_books, get_patron_status_report, pay_late_fees)
+from services.payment_service import PaymentGateway
+
+
+@pytest.fixture(params=sorted(storage.BACKENDS))
+def backend(request):
+    if request.param == 'sqlite':
+        original = database.DATABASE
+        db_fd, database.DATABASE = tempfile.mkstemp()
+        backend = SQLiteBackend()
+        backend.init_database()
+        yield backend
+        os.close(db_fd)
+        os.unlink(database.DATABASE)
+        database.DATABASE = original
+    else:
+        backend = storage.create_backend(request.param)
+        backend.init_database()
+        yield backend
+
+
+def test_backends_implement_the_interface():
+    assert issubclass(SQLiteBackend, StorageBackend)
+    assert issubclass(InMemoryBackend, StorageBackend)
+    with pytest.raises(ValueError):
+        storage.create_backend('cassandra')
+
+
+def test_schema_is_current_after_init(backend):
+    assert backend.schema_is_current()
+
+
+def test_sample_data_is_added_once(backend):
+    backend.add_sample_data()
+    backend.add_sample_data()
+    books = backend.get_all_books()
+    assert [book['title'] for book in books] == ['1984', 'The Great Gatsby', 'To Kill a Mockingbird']
+    assert backend.get_book_by_isbn('9780451524935')['available_copies'] == 0
+    assert backend.get_patron_borrow_count('123456') == 1
+
+
+def test_insert_and_get_books(backend):
+    assert backend.insert_book('Zebra', 'Author Z', '1000000000001', 2, 2)
+    assert backend.insert_book('Apple', 'Author A', '1000000000002', 1, 1)
+    assert not backend.insert_book('Duplicate', 'Author D', '1000000000001', 1, 1)
+
+    books = backend.get_all_books()
+    assert [book['title'] for book in books] == ['Apple', 'Zebra']
+    assert set(books[0]) == {'id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'}
+
+    zebra = backend.get_book_by_isbn('1000000000001')
+    assert zebra['title'] == 'Zebra'
+    assert backend.get_book_by_id(zebra['id']) == zebra
+    assert backend.get_book_by_id(9999) is None
+    assert backend.get_book_by_isbn('9999999999999') is None
+
+    by_id = backend.get_books_by_ids([zebra['id'], zebra['id'], 9999])
+    assert by_id == {zebra['id']: zebra}
+    assert backend.get_books_by_ids([]) == {}
+
+
+def test_returned_rows_are_copies(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 1, 1)
+    book = backend.get_book_by_isbn('1000000000001')
+    book['title'] = 'Changed'
+    assert backend.get_book_by_id(book['id'])['title'] == 'Title'
+
+
+def test_update_book_availability(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 3, 3)
+    book_id = backend.get_book_by_isbn('1000000000001')['id']
+    assert backend.update_book_availability(book_id, -1)
+    assert backend.update_book_availability(book_id, -1)
+    assert backend.update_book_availability(book_id, 1)
+    assert backend.get_book_by_id(book_id)['available_copies'] == 2
+    # Never above total_copies or below 0, and an unknown book is not updated
+    assert backend.update_book_availability(book_id, 1)
+    assert not backend.update_book_availability(book_id, 1)
+    assert not backend.update_book_availability(book_id, -4)
+    assert not backend.update_book_availability(book_id + 1, 1)
+    assert backend.get_book_by_id(book_id)['available_copies'] == 3
+
+
+def test_borrow_records(backend):
+    backend.insert_book('First', 'Author', '1000000000001', 1, 1)
+    backend.insert_book('Second', 'Author', '1000000000002', 1, 1)
+    now = datetime.now()
+    assert backend.insert_borrow_record('111111', 1, now - timedelta(days=20), now - timedelta(days=6))
+    assert backend.insert_borrow_record('111111', 2, now - timedelta(days=1), now + timedelta(days=13))
+    assert backend.insert_borrow_record('222222', 1, now - timedelta(days=2), now + timedelta(days=12))
+
+    records = backend.get_patron_borrow_records('111111')
+    assert [record['book_id'] for record in records] == [2, 1]
+    assert set(records[0]) == {'id', 'book_id', 'borrow_date', 'due_date', 'return_date'}
+    assert records[0]['borrow_date'] == (now - timedelta(days=1)).isoformat()
+    assert all(record['return_date'] is None for record in records)
+    assert backend.get_patron_borrow_count('111111') == 2
+
+    borrowed = backend.get_patron_borrowed_books('111111')
+    assert [(book['book_id'], book['title'], book['is_overdue']) for book in borrowed] == \
+        [(1, 'First', True), (2, 'Second', False)]
+    assert borrowed[0]['due_date'] == now - timedelta(days=6)
+
+    overdue = next(record for record in records if record['book_id'] == 1)
+    assert backend.update_borrow_record_return_date(overdue['id'], now)
+    assert backend.get_patron_borrow_count('111111') == 1
+    assert [book['book_id'] for book in backend.get_patron_borrowed_books('111111')] == [2]
+    returned = next(record for record in backend.get_patron_borrow_records('111111') if record['book_id'] == 1)
+    assert returned['return_date'] == now.isoformat()
+
+    # A returned record keeps its first return date
+    backend.update_borrow_record_return_date(overdue['id'], now + timedelta(days=1))
+    returned = next(record for record in backend.get_patron_borrow_records('111111') if record['book_id'] == 1)
+    assert returned['return_date'] == now.isoformat()
+
+    assert backend.get_patron_borrow_count('222222') == 1
+    assert backend.get_patron_borrow_records('333333') == []
+    assert backend.get_patron_borrowed_books('333333') == []
+
+
+def test_decrement_book_availability(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 2, 2)
+    assert backend.decrement_book_availability(1)
+    assert backend.decrement_book_availability(1)
+    assert not backend.decrement_book_availability(1)
+    assert backend.get_book_by_id(1)['available_copies'] == 0
+    assert not backend.decrement_book_availability(99)
+
+
+def test_active_borrow_record(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 2, 2)
+    now = datetime.now()
+    assert backend.get_active_borrow_record('111111', 1) is None
+    assert backend.insert_borrow_record('111111', 1, now, now + timedelta(days=14))
+    assert backend.insert_borrow_record('222222', 1, now, now + timedelta(days=14))
+
+    # One active loan per patron and book
+    assert not backend.insert_borrow_record('111111', 1, now, now + timedelta(days=14))
+    active = backend.get_active_borrow_record('111111', 1)
+    assert active == backend.get_patron_borrow_records('111111')[0]
+    assert active['return_date'] is None
+
+    backend.update_borrow_record_return_date(active['id'], now)
+    assert backend.get_active_borrow_record('111111', 1) is None
+    assert backend.get_active_borrow_record('222222', 1)['id'] != active['id']
+    assert backend.insert_borrow_record('111111', 1, now, now + timedelta(days=14))
+    assert backend.get_active_borrow_record('111111', 1)['id'] > active['id']
+
+
+def test_archive_returned_borrow_records(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 2, 2)
+    now = datetime.now()
+    backend.insert_borrow_record('111111', 1, now - timedelta(days=400), now - timedelta(days=386))
+    old = backend.get_active_borrow_record('111111', 1)
+    backend.update_borrow_record_return_date(old['id'], now - timedelta(days=380))
+    backend.insert_borrow_record('111111', 1, now - timedelta(days=30), now - timedelta(days=16))
+    recent = backend.get_active_borrow_record('111111', 1)
+    backend.update_borrow_record_return_date(recent['id'], now - timedelta(days=15))
+    backend.insert_borrow_record('111111', 1, now - timedelta(days=2), now + timedelta(days=12))
+    active = backend.get_active_borrow_record('111111', 1)
+    history = backend.get_patron_borrow_records('111111')
+
+    assert backend.archive_returned_borrow_records(now - timedelta(days=365), batch_size=1) == 1
+    assert backend.archive_returned_borrow_records(now - timedelta(days=365)) == 0
+    assert [record['id'] for record in backend.get_patron_borrow_records('111111', include_archived=False)] == \
+        [active['id'], recent['id']]
+    assert backend.get_patron_borrow_records('111111') == history
+    assert backend.get_patron_borrow_count('111111') == 1
+    # A limit the hot table fills leaves the archive out; a larger one reads it after the hot records
+    assert backend.get_patron_borrow_records('111111', limit=2) == history[:2]
+    assert backend.get_patron_borrow_records('111111', limit=5) == history
+    assert backend.get_patron_borrow_records('111111', include_archived=False, limit=5) == history[:2]
+
+
+def test_borrow_counts_after(backend):
+    backend.insert_book('One', 'Author', '1000000000001', 2, 2)
+    backend.insert_book('Two', 'Author', '1000000000002', 2, 2)
+    now = datetime.now()
+    assert backend.get_borrow_counts_after(0) == (0, {})
+    backend.insert_borrow_record('111111', 1, now - timedelta(days=400), now - timedelta(days=386))
+    old = backend.get_active_borrow_record('111111', 1)
+    backend.update_borrow_record_return_date(old['id'], now - timedelta(days=380))
+    backend.insert_borrow_record('111112', 2, now, now + timedelta(days=14))
+    cursor, counts = backend.get_borrow_counts_after(0)
+    assert counts == {1: 1, 2: 1} == backend.get_borrow_counts()
+
+    # Archived records keep their IDs, so nothing is counted twice
+    backend.archive_returned_borrow_records(now - timedelta(days=365))
+    backend.insert_borrow_record('111113', 2, now, now + timedelta(days=14))
+    assert backend.get_borrow_counts_after(cursor) == (cursor + 1, {2: 1})
+    assert backend.get_borrow_counts_after(cursor + 1) == (cursor + 1, {})
+    assert backend.get_borrow_counts_after(0)[1] == {1: 1, 2: 2}
+
+
+def test_payments(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 1, 1)
+    now = datetime.now()
+    assert backend.insert_payment('111111', 1, 2.5, 'txn_1', now - timedelta(days=1))
+    assert backend.insert_payment('111111', 1, 1.0, 'txn_2', now)
+    assert not backend.insert_payment('222222', 1, 1.0, 'txn_2', now)
+
+    payments = backend.get_patron_payments('111111')
+    assert [(payment['transaction_id'], payment['amount']) for payment in payments] == \
+        [('txn_2', 1.0), ('txn_1', 2.5)]
+    assert set(payments[0]) == {'id', 'patron_id', 'book_id', 'amount', 'transaction_id', 'paid_at'}
+    assert payments[0]['paid_at'] == now.isoformat()
+    assert backend.get_patron_payments('222222') == []
+
+
+def test_paid_late_fees_are_recorded(backend):
+    backend.insert_book('Title', 'Author', '1000000000001', 1, 0)
+    now = datetime.now()
+    backend.insert_borrow_record('111111', 1, now - timedelta(days=20), now - timedelta(days=6))
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, 'txn_1', 'Success')
+    with use_backend(backend):
+        success, message, transaction_id = pay_late_fees('111111', 1, gateway)
+        assert (success, transaction_id) == (True, 'txn_1')
+        payments = backend.get_patron_payments('111111')
+        assert [(payment['transaction_id'], payment['book_id'], payment['amount']) for payment in payments] == \
+            [('txn_1', 1, 3.0)]
+
+        # Charged but not recorded (the gateway reused an ID): still paid, with the ID to keep
+        success, message, transaction_id = pay_late_fees('111111', 1, gateway)
+        assert (success, transaction_id) == (True, 'txn_1')
+        assert 'could not be recorded' in message
+        assert len(backend.get_patron_payments('111111')) == 1
+
+        gateway.process_payment.return_value = (False, None, 'Declined')
+        assert not pay_late_fees('111111', 1, gateway)[0]
+        assert len(backend.get_patron_payments('111111')) == 1
+
+
+def test_service_layer_runs_on_backend(backend):
+    with use_backend(backend):
+        backend.add_sample_data()
+        assert add_book_to_catalog('New Book', 'New Author', '1000000000001', 1)[0]
+        book_id = backend.get_book_by_isbn('1000000000001')['id']
+
+        assert borrow_book_by_patron('654321', book_id)[0]
+        assert not next(book for book in get_catalog_books() if book['id'] == book_id)['borrowable']
+        report = get_patron_status_report('654321')
+        assert [borrow['book_title'] for borrow in report['active_borrows']] == ['New Book']
+
+        assert return_book_by_patron('654321', book_id)[0]
+        assert backend.get_book_by_id(book_id)['available_copies'] == 1
+
+        assert borrow_book_by_patron('654321', 1)[0]
+        assert borrow_book_by_patron('654321', 1) == (False, "You have already borrowed this book.")
+        assert backend.get_book_by_id(1)['available_copies'] == 2
+    assert storage.get_backend() is not backend
+
+
+def test_backend_selected_from_environment(monkeypatch):
+    monkeypatch.setenv('LIBRARY_STORAGE_BACKEND', 'memory')
+    previous = storage.set_backend(None)
+    try:
+        assert isinstance(storage.get_backend(), InMemoryBackend)
+    finally:
+        storage.set_backend(previous)
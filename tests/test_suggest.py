@@ -0,0 +1,151 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import database
+from app import create_app
+from services import suggest_index
+from services.library_service import add_book_to_catalog, suggest_books
+from services.suggest_index import PENDING_LIMIT, PrefixIndex, get_suggest_index, normalize, reset_suggest_index
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize('  The   Great Gatsby'), 'the great gatsby')
+        self.assertEqual(normalize('The '), 'the ')
+        self.assertEqual(normalize('   '), '')
+
+    def test_prefix_ranked_by_borrows_then_alphabetically(self):
+        index = PrefixIndex()
+        index.add('The River', 1, borrows=3)
+        index.add('The Road', 2, borrows=7)
+        index.add('the river', 3, borrows=2)
+        index.add('Theory of Games', 4, borrows=0)
+        index.add('A River', 5, borrows=9)
+        self.assertEqual(index.suggest('THE R'), [('The Road', 7), ('The River', 5)])
+        self.assertEqual(index.suggest('the'), [('The Road', 7), ('The River', 5), ('Theory of Games', 0)])
+        self.assertEqual(index.suggest('the '), [('The Road', 7), ('The River', 5)])
+        self.assertEqual(index.suggest('the', limit=1), [('The Road', 7)])
+        self.assertEqual(index.suggest('x'), [])
+
+    def test_large_prefix_ranges_are_cached_and_invalidated(self):
+        index = PrefixIndex()
+        for i in range(600):
+            index.add(f'Book {i:03d}', i, borrows=i % 50)
+        first = index.suggest('book', limit=3)
+        self.assertEqual([text for text, _ in first], ['Book 049', 'Book 099', 'Book 149'])
+        self.assertIn('book', index._top)
+
+        index.add('Book of Records', 1000, borrows=100)
+        self.assertNotIn('book', index._top)
+        self.assertEqual(index.suggest('book', limit=1), [('Book of Records', 100)])
+
+    def test_borrow_changes_invalidate_cached_rankings(self):
+        index = PrefixIndex()
+        for i in range(600):
+            index.add(f'Book {i:03d}', i, borrows=i % 50)
+        index.suggest('book', limit=3)
+        index.suggest('box', limit=3)
+        # Another book with the same title adds its borrows to an existing key
+        index.add('Book 000', 1000, borrows=80)
+        self.assertNotIn('book', index._top)
+        self.assertEqual(index.suggest('book', limit=1), [('Book 000', 80)])
+
+        index.add_borrows(7, 200)
+        self.assertEqual(index.suggest('book', limit=2), [('Book 007', 207), ('Book 000', 80)])
+        # A count that stays below the cached top 20 keeps the cached ranking
+        index.add_borrows(1, 1)
+        self.assertIn('book', index._top)
+        index.add_borrows(1, 300)
+        self.assertNotIn('book', index._top)
+        self.assertEqual(index.suggest('book', limit=1), [('Book 001', 302)])
+
+    def test_new_keys_are_pending_until_merged(self):
+        index = PrefixIndex()
+        index.add_many((f'Book {i:04d}', i, 0) for i in range(2000))
+        self.assertEqual((len(index.keys), index.pending), (2000, []))
+        for i in range(4200, 2000, -1):
+            index.add(f'Book {i:04d}', i, borrows=i % 7)
+        self.assertLessEqual(len(index.pending), PENDING_LIMIT)
+        self.assertEqual(index.keys, sorted(index.keys))
+        self.assertEqual(index.pending, sorted(index.pending))
+        self.assertEqual((len(index.keys), len(index.pending)), (4050, 150))
+        # Book 2101-2150 are still pending, the rest of them merged; both are ranked together
+        self.assertEqual([text for text, _ in index.suggest('book 21')][6:9], ['Book 2148', 'Book 2155', 'Book 2162'])
+
+
+class TestSuggestApi(unittest.TestCase):
+    def setUp(self):
+        self.db_fd, database.DATABASE = tempfile.mkstemp()
+        reset_suggest_index()
+        self.app = create_app()
+        self.client = self.app.test_client()
+        now = datetime.now()
+        for patron_id in ('111111', '111112', '111113'):
+            database.insert_borrow_record(patron_id, 2, now - timedelta(days=40), now - timedelta(days=26))
+
+    def tearDown(self):
+        reset_suggest_index()
+        os.close(self.db_fd)
+        os.unlink(database.DATABASE)
+
+    def test_suggest_endpoint(self):
+        response = self.client.get('/api/suggest?q=t')
+        self.assertEqual(response.status_code, 200)
+        suggestions = response.get_json()['suggestions']
+        self.assertEqual(suggestions, [
+            {'text': 'To Kill a Mockingbird', 'type': 'title', 'borrows': 3},
+            {'text': 'The Great Gatsby', 'type': 'title', 'borrows': 0},
+        ])
+
+        response = self.client.get('/api/suggest?q=har&type=author')
+        self.assertEqual(response.get_json()['suggestions'],
+                         [{'text': 'Harper Lee', 'type': 'author', 'borrows': 3}])
+
+    def test_suggest_endpoint_validation(self):
+        self.assertEqual(self.client.get('/api/suggest?q=').status_code, 400)
+        self.assertEqual(self.client.get('/api/suggest?q=the&type=isbn').status_code, 400)
+
+    def test_suggestions_do_not_query_the_database(self):
+        suggest_books('the')
+        get_suggest_index()._last_catch_up = time.monotonic()
+        with database.query_budget(max_queries=0):
+            self.assertEqual(suggest_books('the great')[0]['text'], 'The Great Gatsby')
+
+    def test_new_books_are_suggested(self):
+        suggest_books('the')
+        add_book_to_catalog('The Hobbit', 'J. R. R. Tolkien', '1234567890123', 1)
+        self.assertIn('The Hobbit', [s['text'] for s in suggest_books('the h')])
+
+        # Books inserted elsewhere show up after the catch-up interval
+        database.insert_book('The Hours', 'Michael Cunningham', '1234567890124', 1, 1)
+        get_suggest_index()._last_catch_up = 0
+        self.assertEqual([s['text'] for s in suggest_books('the hou')], ['The Hours'])
+
+    def test_index_is_built_on_first_use(self):
+        self.assertIsNone(suggest_index._index)
+        suggest_books('the')
+        self.assertEqual(suggest_index._index.last_book_id, 3)
+
+    @patch.dict(os.environ, {'LIBRARY_SUGGEST_INDEX': '1'})
+    def test_index_is_built_with_the_app_on_request(self):
+        create_app()
+        self.assertEqual(suggest_index._index.last_book_id, 3)
+
+    def test_refresh_popularity(self):
+        index = get_suggest_index()
+        index.refresh_interval = 0.01
+        self.assertEqual(suggest_books('the great')[0]['borrows'], 0)
+        database.insert_borrow_record('222222', 1, datetime.now(), datetime.now() + timedelta(days=14))
+        # The background refresh picks the loan up without a manual call
+        deadline = time.monotonic() + 5
+        while suggest_books('the great')[0]['borrows'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(suggest_books('the great')[0]['borrows'], 1)
+        self.assertFalse(index.refresh_popularity())
+
+
+if __name__ == '__main__':
+    unittest.main()
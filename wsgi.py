@@ -0,0 +1,20 @@
+"""
+WSGI entry point for production serving.
+
+Run it under gunicorn with the settings in gunicorn.conf.py:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is created once in the master process (preload) and inherited by the
+forked workers. database.py opens a fresh SQLite connection for every call
+and closes it before returning, so no connection is ever shared across the
+fork; each worker opens its own on first use.
+"""
+
+from app import create_app
+from database import enable_wal_mode
+
+app = create_app()
+
+# Let readers in one worker proceed while another worker is writing
+enable_wal_mode()